@@ -0,0 +1,4 @@
+"""
+DeepContext 基准测试
+用法: 在项目根目录执行 python -m benchmarks.<模块名>
+"""
@@ -0,0 +1,110 @@
+"""
+批量查询基准测试：同一进程内并发运行的 Agent 数对吞吐的影响
+
+大模型和 MCP 会话都用进程内的桩对象代替 (按设定延迟返回)：每个问题先调用一次工具再给出回答，
+桩大模型按 --error-rate 随机返回 429，用来验证重试与限速。
+用法: python -m benchmarks.bench_batch [--queries 64] [--llm-ms 200] [--rps 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from benchmarks.bench_parallel_tools import StubSession
+from benchmarks.common import print_table
+from core.agent import DeepContextAgent
+from core.batch import run_batch
+from core.llm_client import LLMClient
+
+
+class StubCompletions:
+    """模拟 chat.completions：第一轮返回一个工具调用，看到工具结果后返回最终回答"""
+
+    def __init__(self, delay_s: float, error_rate: float, seed: int = 42):
+        self.delay_s = delay_s
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    async def create(self, model, messages, tools=None):
+        await asyncio.sleep(self.delay_s)
+        if self.rng.random() < self.error_rate:
+            response = httpx.Response(429, request=httpx.Request("POST", "http://stub/chat/completions"))
+            raise openai.RateLimitError("stub rate limit", response=response, body=None)
+        usage = SimpleNamespace(prompt_tokens=sum(len(str(m.get("content") or "")) for m in messages))
+        if not any(m["role"] == "tool" for m in messages):
+            call = SimpleNamespace(id="call_0", function=SimpleNamespace(
+                name="query_knowledge_graph_tool", arguments=json.dumps({"filepath": "stub"})))
+            message = SimpleNamespace(content=None, tool_calls=[call])
+        else:
+            message = SimpleNamespace(content="stub answer", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class StubConnection:
+    def __init__(self, delay_s: float):
+        self.session = StubSession(delay_s)
+        self.tools = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StubAgent(DeepContextAgent):
+    def __init__(self, llm_client, tool_delay_s):
+        super().__init__(llm_client=llm_client, verbose=False, streaming=False)
+        self.tool_delay_s = tool_delay_s
+
+    def connect(self):
+        return StubConnection(self.tool_delay_s)
+
+
+def write_queries(path: str, n: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": i, "query": f"问题 {i}"}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量查询基准测试")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--llm-ms", type=float, default=200, help="每次大模型调用的模拟延迟")
+    parser.add_argument("--tool-ms", type=float, default=20, help="每次工具调用的模拟延迟")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="模拟 429 的概率")
+    parser.add_argument("--rps", type=float, default=0, help="令牌桶速率 (0 不限速)")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="deepcontext_bench_") as tmpdir:
+        input_path = os.path.join(tmpdir, "queries.jsonl")
+        output_path = os.path.join(tmpdir, "answers.jsonl")
+        write_queries(input_path, args.queries)
+        for concurrency in (1, 4, 16, 64):
+            stub = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions(args.llm_ms / 1000, args.error_rate)))
+            llm = LLMClient(stub, requests_per_second=args.rps, burst=max(1, args.rps), max_retries=5)
+            agent = StubAgent(llm, args.tool_ms / 1000)
+            stats = asyncio.run(run_batch(input_path, output_path, concurrency, agent=agent))
+            rows.append({
+                "concurrency": concurrency,
+                "succeeded": stats["succeeded"],
+                "failed": stats["failed"],
+                "retries": stats["llm_retries"],
+                "elapsed s": stats["elapsed_s"],
+                "queries/s": stats["queries_per_s"],
+            })
+
+    limit = f"限速 {args.rps:g} 请求/秒" if args.rps > 0 else "不限速"
+    print_table(f"{args.queries} 个问题 (大模型 {args.llm_ms:g} ms/次，工具 {args.tool_ms:g} ms/次，{limit})", rows)
+
+
+if __name__ == "__main__":
+    main()
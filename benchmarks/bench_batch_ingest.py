@@ -0,0 +1,101 @@
+"""
+批量写入基准测试
+1. 每次调用写入 1 / 10 / 100 / 1000 条三元组时的吞吐
+2. 多线程并发单条写入时，组提交 vs 每条独立提交
+
+用法: python -m benchmarks.bench_batch_ingest [--total 10000] [--threads 8]
+"""
+
+import argparse
+import threading
+
+from benchmarks.common import print_table, temp_db_path, timer
+from database.connection import init_manager, close_manager, get_manager
+from database.group_commit import close_group_writer
+from database.sqlite_db import init_db, add_knowledge_triplet, add_knowledge_triplets_batch, insert_triplet_rows
+
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def _triplet(i):
+    return {
+        "source_entity": f"entity_{i}",
+        "relation": f"relation_{i % 7}",
+        "target_entity": f"entity_{i + 1}",
+        "source_file": f"note_{i % 20}.md",
+    }
+
+
+def bench_batch_sizes(total):
+    rows = []
+    for size in BATCH_SIZES:
+        calls = max(1, total // size)
+        with temp_db_path() as db_path:
+            init_manager(db_path)
+            init_db()
+            with timer() as t:
+                for c in range(calls):
+                    add_knowledge_triplets_batch([_triplet(c * size + i) for i in range(size)])
+            close_manager()
+        written = calls * size
+        rows.append({
+            "triplets/call": size,
+            "calls": calls,
+            "triplets/s": written / t["elapsed"],
+            "ms/call": t["elapsed"] / calls * 1000,
+        })
+    return rows
+
+
+def _direct_insert(source_entity, relation, target_entity, source_file):
+    """对照组：每条写入独立占用写锁并提交"""
+    with get_manager().writer() as conn:
+        insert_triplet_rows(conn, [(source_entity, relation, target_entity, source_file)])
+
+
+def bench_concurrent_singles(total, threads, synchronous):
+    rows = []
+    per_thread = total // threads
+    for name, insert in (("commit per call", _direct_insert), ("group commit", add_knowledge_triplet)):
+        with temp_db_path() as db_path:
+            init_manager(db_path, synchronous=synchronous)
+            init_db()
+
+            def worker(offset):
+                for i in range(per_thread):
+                    t = _triplet(offset + i)
+                    insert(t["source_entity"], t["relation"], t["target_entity"], t["source_file"])
+
+            workers = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+            with timer() as t:
+                for w in workers:
+                    w.start()
+                for w in workers:
+                    w.join()
+            close_group_writer()
+            close_manager()
+        rows.append({
+            "mode": name,
+            "synchronous": synchronous,
+            "threads": threads,
+            "triplets/s": per_thread * threads / t["elapsed"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量写入与组提交基准测试")
+    parser.add_argument("--total", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    print_table(f"批量写入吞吐 (共约 {args.total} 条)", bench_batch_sizes(args.total))
+    # 组提交的收益取决于单次提交的成本：FULL 模式下每次提交都要 fsync
+    rows = []
+    for synchronous in ("NORMAL", "FULL"):
+        rows.extend(bench_concurrent_singles(args.total, args.threads, synchronous))
+    print_table("并发单条写入", rows)
+
+
+if __name__ == "__main__":
+    main()
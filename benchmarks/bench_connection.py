@@ -0,0 +1,100 @@
+"""
+连接层基准测试：每次调用都 connect 的旧路径 vs 长连接 + WAL 的连接池路径
+
+用法: python -m benchmarks.bench_connection [--inserts 2000] [--queries 500]
+"""
+
+import argparse
+import sqlite3
+
+from benchmarks.common import print_table, summarize, temp_db_path, timer
+from database.connection import init_manager, close_manager
+from database.sqlite_db import init_db, add_knowledge_triplet, query_knowledge_graph
+from database.tokenizer import register_sql_functions
+
+QUERY_SQL = "SELECT * FROM knowledge_triplets WHERE source_entity = 'entity_7'"
+
+
+def legacy_insert(db_path, source_entity, relation, target_entity, source_file):
+    """旧实现：每条三元组都新建连接、提交、关闭"""
+    conn = sqlite3.connect(db_path)
+    register_sql_functions(conn)
+    conn.execute(
+        "INSERT INTO knowledge_triplets (source_entity, relation, target_entity, source_file) VALUES (?, ?, ?, ?)",
+        (source_entity, relation, target_entity, source_file),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_query(db_path, sql_query):
+    """旧实现：每次查询都新建连接"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.execute(sql_query)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def _triplet(i):
+    return (f"entity_{i % 100}", f"relation_{i % 7}", f"entity_{(i * 31) % 100}", f"note_{i % 20}.md")
+
+
+def run_legacy(inserts, queries):
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        close_manager()
+        # 旧路径使用默认的 rollback journal
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+        with timer() as t:
+            for i in range(inserts):
+                legacy_insert(db_path, *_triplet(i))
+        latencies = []
+        for _ in range(queries):
+            with timer() as q:
+                legacy_query(db_path, QUERY_SQL)
+            latencies.append(q["elapsed"])
+    return t["elapsed"], latencies
+
+
+def run_pooled(inserts, queries):
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        with timer() as t:
+            for i in range(inserts):
+                add_knowledge_triplet(*_triplet(i))
+        latencies = []
+        for _ in range(queries):
+            with timer() as q:
+                query_knowledge_graph(QUERY_SQL)
+            latencies.append(q["elapsed"])
+        close_manager()
+    return t["elapsed"], latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 连接层基准测试")
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = []
+    for name, runner in (("per-call connect", run_legacy), ("pooled + WAL", run_pooled)):
+        elapsed, latencies = runner(args.inserts, args.queries)
+        stats = summarize(latencies)
+        rows.append({
+            "path": name,
+            "inserts/s": args.inserts / elapsed,
+            "query p50 ms": stats["p50_ms"],
+            "query p99 ms": stats["p99_ms"],
+        })
+    print_table(f"{args.inserts} 次单条插入 / {args.queries} 次查询", rows)
+
+
+if __name__ == "__main__":
+    main()
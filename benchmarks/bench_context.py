@@ -0,0 +1,84 @@
+"""
+上下文管理基准测试：模拟一次多轮 Agent 运行 (每轮读取若干篇笔记)，
+对比 "全部追加" 与 HistoryManager 在每轮发送的 prompt token 数，以及与上一轮请求可复用的前缀长度
+
+用法: python -m benchmarks.bench_context [--turns 20] [--calls 3] [--paragraphs 12]
+"""
+
+import argparse
+import json
+import random
+
+from benchmarks.common import print_table
+from benchmarks.generators import generate_note_text
+from core.context import HistoryManager, estimate_tokens
+from core.prompt import SYSTEM_PROMPT
+
+
+def simulate_turns(turns: int, calls: int, paragraphs: int, seed: int = 42):
+    """生成一段 "录制" 的运行：每轮一条带工具调用的 assistant 消息和对应的工具返回"""
+    rng = random.Random(seed)
+    recorded = []
+    for turn in range(turns):
+        tool_calls, results = [], []
+        for i in range(calls):
+            call_id = f"call_{turn}_{i}"
+            arguments = json.dumps({"filepath": f"notes/note_{turn}_{i}.md"})
+            tool_calls.append({"id": call_id, "type": "function",
+                               "function": {"name": "read_note_content_tool", "arguments": arguments}})
+            results.append({"role": "tool", "tool_call_id": call_id, "name": "read_note_content_tool",
+                            "content": generate_note_text(rng, paragraphs=rng.randint(1, paragraphs))})
+        recorded.append(({"role": "assistant", "content": None, "tool_calls": tool_calls}, results))
+    return recorded
+
+
+def _tokens(message) -> int:
+    return estimate_tokens(message.get("content")) + estimate_tokens(json.dumps(message.get("tool_calls") or ""))
+
+
+def _shared_prefix_tokens(previous, current) -> int:
+    """当前请求与上一轮请求完全相同的前缀消息的 token 数 (服务端前缀缓存可命中的上限)"""
+    shared = 0
+    for a, b in zip(previous, current):
+        if a != b:
+            break
+        shared += _tokens(b)
+    return shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上下文管理基准测试")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=3, help="每轮读取的笔记数")
+    parser.add_argument("--paragraphs", type=int, default=12, help="每篇笔记最多的段落数")
+    args = parser.parse_args()
+
+    recorded = simulate_turns(args.turns, args.calls, args.paragraphs)
+    naive = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "整理这些笔记"}]
+    history = HistoryManager(SYSTEM_PROMPT)
+    history.add_user("整理这些笔记")
+
+    rows = []
+    previous = []
+    for turn, (assistant, results) in enumerate(recorded, 1):
+        request = history.build()
+        rows.append({
+            "turn": turn,
+            "append-all tokens": sum(_tokens(m) for m in naive),
+            "managed tokens": sum(_tokens(m) for m in request),
+            "cacheable prefix": _shared_prefix_tokens(previous, request),
+        })
+        previous = request
+        naive.append(assistant)
+        naive.extend(results)
+        history.add_assistant(assistant)
+        history.add_tool_results(results)
+
+    print_table(f"{args.turns} 轮 x 每轮 {args.calls} 篇笔记的 prompt 大小 (估算 token)", rows)
+    total_naive = sum(r["append-all tokens"] for r in rows)
+    total_managed = sum(r["managed tokens"] for r in rows)
+    print(f"\n合计：全部追加 {total_naive}，上下文管理 {total_managed}，减少 {1 - total_managed / total_naive:.0%}")
+
+
+if __name__ == "__main__":
+    main()
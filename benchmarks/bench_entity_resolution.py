@@ -0,0 +1,197 @@
+"""
+实体消歧基准测试
+
+1. 准确率：已有实体的各种改写 (全角 / 大小写 / 空格、错一个字) 能否归并到原实体，
+   以及相近但不同的名字 (版本号不同、多一个词) 是否被误合并
+2. 写入吞吐：库中已有 10k - 200k 个实体时，开启 / 关闭消歧的批量写入速度，
+   以及每个实体名的平均消歧耗时 (倒排分块让它基本不随实体数增长)
+3. recanonicalize：整理一个含 10% 重复实体的旧库所需的时间
+
+用法: python -m benchmarks.bench_entity_resolution [--entities 100000] [--sizes 10000,100000,200000] [--triplets 20000]
+"""
+
+import argparse
+import random
+
+import database.sqlite_db as sqlite_db
+from benchmarks.common import print_table, temp_db_path, timer
+from database.connection import init_manager, close_manager, get_manager
+from database.entity_resolution import get_entity_resolver, recanonicalize_entities
+from database.sqlite_db import init_db, insert_triplet_rows
+from database.tokenizer import entity_key
+
+_SYLLABLES = [c + v for c in "bcdfghjklmnprstvwxz" for v in ("a", "e", "i", "o", "u", "ai", "ou", "an")]
+_HANZI = [chr(c) for c in range(0x4E00, 0x4E00 + 2000, 3)]
+_FULLWIDTH = {c: chr(ord(c) + 0xFEE0) for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"}
+_BATCH = 1000
+
+
+def _word(rng):
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_name(rng) -> str:
+    """英文词组、中文词或中英混合的实体名"""
+    kind = rng.random()
+    if kind < 0.35:
+        return " ".join(_word(rng) for _ in range(rng.randint(1, 3)))
+    if kind < 0.7:
+        return "".join(rng.choice(_HANZI) for _ in range(rng.randint(3, 7)))
+    return _word(rng) + "".join(rng.choice(_HANZI) for _ in range(rng.randint(2, 4)))
+
+
+def unique_names(rng, count: int) -> list:
+    names, keys = [], set()
+    while len(names) < count:
+        name = make_name(rng)
+        if entity_key(name) not in keys:
+            keys.add(entity_key(name))
+            names.append(name)
+    return names
+
+
+def _typo(name: str, rng) -> str:
+    """把中间的一个字符换成另一个同类字符"""
+    positions = [i for i in range(1, len(name) - 1) if not name[i].isspace()]
+    i = rng.choice(positions)
+    pool = _HANZI if name[i] in _HANZI else "abcdefghijklmnopqrstuvwxyz"
+    return name[:i] + rng.choice([c for c in pool[:50] if c != name[i].lower()]) + name[i + 1:]
+
+
+VARIANTS = {
+    "全角 / 大小写 / 空格": (True, lambda n, rng: "".join(_FULLWIDTH.get(c, c) for c in n.upper()).replace(" ", "  ")),
+    "错一个字": (True, _typo),
+    "版本号不同": (False, lambda n, rng: f"{n} {rng.randint(2, 9)}"),
+    "多一个词": (False, lambda n, rng: n + rng.choice(["框架", "协议", " Engine", "模式"])),
+}
+
+
+def _seed_entities(names):
+    """直接写入实体和别名 (绕过消歧，快速构造大库)"""
+    with get_manager().writer() as conn:
+        conn.executemany("INSERT INTO entities (id, name) VALUES (?, ?)", enumerate(names, 1))
+        conn.execute("INSERT INTO entity_aliases (alias_key, entity_id) SELECT dc_entity_key(name), id FROM entities")
+
+
+def accuracy(num_entities: int, queries: int):
+    rng = random.Random(3)
+    names = unique_names(rng, num_entities)
+    rows = []
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        _seed_entities(names)
+        resolver = get_entity_resolver()
+        for variant, (should_merge, make) in VARIANTS.items():
+            # 错一个字只对足够长的名字有意义 (短名字只做精确匹配)
+            pool = [n for n in names if len(entity_key(n)) >= 8] if variant == "错一个字" else names
+            merged = 0
+            for name in rng.sample(pool, queries):
+                with get_manager().writer() as conn:
+                    merged += resolver.resolve(conn, make(name, rng)) == name
+                    conn.rollback()
+            rows.append({
+                "variant": variant,
+                "expected": "合并" if should_merge else "新实体",
+                "merged into original": merged / queries,
+                "correct": (merged if should_merge else queries - merged) / queries,
+            })
+        close_manager()
+    print_table(f"消歧准确率 ({num_entities} 个已有实体，每种 {queries} 个名字)", rows)
+
+
+def _triplet_rows(rng, names, count: int):
+    """一半引用已有实体 (部分写法被改过)，一半是新实体"""
+    rows = []
+    for i in range(count):
+        ends = []
+        for _ in range(2):
+            if rng.random() < 0.5:
+                name = rng.choice(names)
+                ends.append(name.lower() if rng.random() < 0.3 else name)
+            else:
+                ends.append(make_name(rng) + str(rng.randint(0, 10 ** 6)))
+        rows.append((ends[0], f"关系_{i % 20}", ends[1], f"note_{i % 100}.md"))
+    return rows
+
+
+def throughput(sizes, total: int):
+    rows = []
+    for size in sizes:
+        rng = random.Random(size)
+        names = unique_names(rng, size)
+        triplets = _triplet_rows(rng, names, total)
+        for enabled in (False, True):
+            sqlite_db.ENTITY_RESOLUTION = enabled
+            with temp_db_path() as db_path:
+                init_manager(db_path)
+                init_db()
+                _seed_entities(names)
+                with timer() as load:
+                    get_entity_resolver()
+                with timer() as t:
+                    for i in range(0, total, _BATCH):
+                        with get_manager().writer() as conn:
+                            insert_triplet_rows(conn, triplets[i:i + _BATCH])
+                with get_manager().reader() as conn:
+                    entities = conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+                close_manager()
+            rows.append({
+                "existing entities": size,
+                "resolution": "on" if enabled else "off",
+                "alias load s": load["elapsed"] if enabled else 0.0,
+                "triplets/s": total / t["elapsed"],
+                "us/name": t["elapsed"] / (2 * total) * 1e6,
+                "entities after": entities,
+            })
+    sqlite_db.ENTITY_RESOLUTION = True
+    print_table(f"写入吞吐 ({total} 条三元组，每批 {_BATCH} 条)", rows)
+
+
+def recanonicalize(sizes):
+    rows = []
+    for size in sizes:
+        rng = random.Random(size)
+        names = unique_names(rng, size)
+        long_names = [n for n in names if len(entity_key(n)) >= 8]
+        duplicates = [n.lower().replace(" ", "") for n in rng.sample(names, size // 20)]
+        duplicates += [_typo(n, rng) for n in rng.sample(long_names, min(len(long_names), size // 20))]
+        all_names = list(dict.fromkeys(names + duplicates))
+        with temp_db_path() as db_path:
+            init_manager(db_path)
+            init_db()
+            with get_manager().writer() as conn:
+                conn.executemany("INSERT INTO entities (id, name) VALUES (?, ?)", enumerate(all_names, 1))
+                conn.execute("INSERT INTO relations (id, name) VALUES (1, '相关')")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO triplets (source_id, relation_id, target_id, source_file) VALUES (?, 1, ?, 'x.md')",
+                    ((rng.randint(1, len(all_names)), rng.randint(1, len(all_names))) for _ in range(size * 2)),
+                )
+            with timer() as t:
+                stats = recanonicalize_entities()
+            close_manager()
+        rows.append({
+            "entities": stats["entities"],
+            "injected duplicates": len(all_names) - len(names),
+            "merged": stats["merged"],
+            "seconds": t["elapsed"],
+        })
+    print_table("recanonicalize 整理旧库", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="实体消歧基准测试")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--sizes", default="10000,100000,200000")
+    parser.add_argument("--triplets", type=int, default=20000)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    accuracy(args.entities, args.queries)
+    throughput(sizes, args.triplets)
+    recanonicalize(sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+离线入库流水线基准测试 (使用本地桩模型，不联网)
+
+1. 吞吐：模拟每次调用有固定网络延迟的大模型，不同并发数下的 notes/s、triplets/s
+   (对照：ReAct 循环里一次只处理一个分块，相当于并发 1)
+2. 断点续跑：处理到一半时取消任务，再次运行，统计第二次的大模型调用数，
+   并确认最终三元组数与不中断的运行一致
+
+用法: python -m benchmarks.bench_ingest [--notes 100] [--latency 0.2] [--concurrency 1,8,32]
+"""
+
+import argparse
+import asyncio
+import os
+
+from benchmarks.common import print_table, temp_db_path
+from benchmarks.generators import generate_vault
+from benchmarks.stub_llm import StubLLMClient
+from core.ingest import IngestPipeline
+from database.connection import init_manager, close_manager, get_manager
+from database.sqlite_db import init_db
+
+
+def _count(sql: str) -> int:
+    with get_manager().reader() as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+async def _run(vault: str, concurrency: int, latency: float, cancel_after: int = 0):
+    """运行一次流水线；cancel_after > 0 时在桩模型被调用这么多次后取消 (模拟进程被中断)"""
+    llm = StubLLMClient(latency)
+    pipeline = IngestPipeline(llm, concurrency, verbose=False)
+    task = asyncio.create_task(pipeline.run(vault))
+    if cancel_after:
+        while llm.calls < cancel_after and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return None, llm.calls
+    return await task, llm.calls
+
+
+def throughput(vault: str, levels, latency: float):
+    rows = []
+    for concurrency in levels:
+        with temp_db_path() as db_path:
+            init_manager(db_path)
+            init_db()
+            stats, calls = asyncio.run(_run(vault, concurrency, latency))
+            close_manager()
+        rows.append({
+            "concurrency": concurrency,
+            "notes": stats["notes_done"],
+            "llm calls": calls,
+            "seconds": stats["elapsed_s"],
+            "notes/s": stats["notes_per_s"],
+            "triplets/s": stats["triplets_per_s"],
+        })
+    print_table(f"离线入库吞吐 (桩模型每次调用延迟 {latency * 1000:.0f} ms)", rows)
+
+
+def resume(vault: str, concurrency: int, latency: float):
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        full, full_calls = asyncio.run(_run(vault, concurrency, latency))
+        expected = _count("SELECT COUNT(*) FROM triplets")
+        close_manager()
+
+    rows = []
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        _, first_calls = asyncio.run(_run(vault, concurrency, latency, cancel_after=full_calls // 2))
+        rows.append({
+            "run": "中断的第一次",
+            "llm calls": first_calls,
+            "notes done": _count("SELECT COUNT(*) FROM note_manifest"),
+            "checkpoints": _count("SELECT COUNT(*) FROM extraction_checkpoints"),
+            "triplets": _count("SELECT COUNT(*) FROM triplets"),
+        })
+        stats, second_calls = asyncio.run(_run(vault, concurrency, latency))
+        rows.append({
+            "run": "续跑",
+            "llm calls": second_calls,
+            "notes done": _count("SELECT COUNT(*) FROM note_manifest"),
+            "checkpoints": _count("SELECT COUNT(*) FROM extraction_checkpoints"),
+            "triplets": _count("SELECT COUNT(*) FROM triplets"),
+        })
+        close_manager()
+    rows.append({"run": "不中断 (对照)", "llm calls": full_calls, "notes done": full["notes_done"],
+                 "checkpoints": 0, "triplets": expected})
+    print_table(f"断点续跑 (并发 {concurrency})", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线入库流水线基准测试")
+    parser.add_argument("--notes", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", default="1,8,32")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    with temp_db_path() as db_path:
+        vault = os.path.join(os.path.dirname(db_path), "vault")
+        generate_vault(vault, args.notes, paragraphs=12)
+        throughput(vault, levels, args.latency)
+        resume(vault, max(levels), args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+大模型响应缓存基准测试 (桩模型 + 桩 MCP 会话，不联网)
+
+1. 重复问题：同一批问题跑两遍，对比不缓存、首次 (未命中) 与再次 (命中) 的单问题延迟
+2. 录制 / 回放：桩模型的回答带随机成分，先 record 一次，再用一个被调用就报错的模型 replay，
+   确认回放不联网且每个问题的回答与录制时完全一致
+3. 容量淘汰：缓存上限远小于全部响应时，按 Zipf 分布重复提问的命中率与缓存大小
+
+用法: python -m benchmarks.bench_llm_cache [--queries 50] [--llm-ms 300] [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import zlib
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from benchmarks.bench_batch import StubAgent, write_queries
+from benchmarks.common import print_table, summarize, timer
+from core.batch import run_batch
+from core.llm_cache import ResponseCache, request_key
+from core.llm_client import LLMClient
+
+
+class RandomCompletions:
+    """模拟 chat.completions：第一轮调用一次工具，看到工具结果后给出带随机数的回答 (两次运行结果不同)"""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.calls = 0
+        self.rng = random.Random()
+
+    async def create(self, model, messages, tools=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if not any(m["role"] == "tool" for m in messages):
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{self.rng.getrandbits(32):08x}", "type": "function",
+                "function": {"name": "query_knowledge_graph_tool", "arguments": json.dumps({"filepath": "stub"})},
+            }]}
+            finish = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": f"answer {self.rng.random():.12f}"}
+            finish = "stop"
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages)
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-{self.calls}", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": finish, "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20},
+        })
+
+
+class OfflineCompletions:
+    """回放时使用：任何一次调用都说明请求没有被缓存拦下"""
+
+    async def create(self, **kwargs):
+        raise RuntimeError("回放模式下不应联网")
+
+
+def _agent(completions, mode: str, cache):
+    stub = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    llm = LLMClient(stub, requests_per_second=0, cache_mode=mode, cache=cache)
+    return StubAgent(llm, 0.005)
+
+
+def _batch(agent, input_path: str, output_path: str):
+    """逐个 (并发 1) 运行，返回 (汇总统计, {问题: 结果})"""
+    stats = asyncio.run(run_batch(input_path, output_path, 1, agent=agent))
+    with open(output_path, encoding="utf-8") as f:
+        records = {r["query"]: r for r in map(json.loads, f)}
+    return stats, records
+
+
+def repeated(tmpdir: str, queries: int, delay_s: float):
+    input_path = os.path.join(tmpdir, "queries.jsonl")
+    output_path = os.path.join(tmpdir, "answers.jsonl")
+    write_queries(input_path, queries)
+    cache = ResponseCache(os.path.join(tmpdir, "repeat_cache.db"))
+    rows = []
+    for label, mode in (("不缓存", "off"), ("cache 首次", "cache"), ("cache 再次", "cache")):
+        completions = RandomCompletions(delay_s)
+        _, records = _batch(_agent(completions, mode, cache), input_path, output_path)
+        latency = summarize([r["elapsed_s"] for r in records.values()])
+        rows.append({"run": label, "llm calls": completions.calls, "p50 ms": latency["p50_ms"],
+                     "p95 ms": latency["p95_ms"]})
+    stats = cache.stats()
+    cache.close()
+    print_table(f"重复问题 ({queries} 个问题，每个 2 次模型调用，模型 {delay_s * 1000:.0f} ms/次，"
+                f"缓存 {stats['entries']} 条 / {stats['bytes'] / 1024:.0f} KB)", rows)
+
+
+def record_replay(tmpdir: str, queries: int, delay_s: float):
+    input_path = os.path.join(tmpdir, "queries.jsonl")
+    output_path = os.path.join(tmpdir, "replay.jsonl")
+    write_queries(input_path, queries)
+    cache = ResponseCache(os.path.join(tmpdir, "replay_cache.db"))
+    completions = RandomCompletions(delay_s)
+    recorded_stats, recorded = _batch(_agent(completions, "record", cache), input_path, output_path)
+    rerun_stats, rerun = _batch(_agent(RandomCompletions(0), "off", cache), input_path, output_path)
+    replay_stats, replayed = _batch(_agent(OfflineCompletions(), "replay", cache), input_path, output_path)
+    cache.close()
+
+    def same(a, b):
+        return sum(a[i]["answer"] == b[i]["answer"] for i in a)
+
+    print_table(f"录制 / 回放 ({queries} 个问题)", [
+        {"run": "record", "llm calls": completions.calls, "failed": recorded_stats["failed"],
+         "cache hits": recorded_stats["llm_cache_hits"], "answers = record": queries, "elapsed s": recorded_stats["elapsed_s"]},
+        {"run": "重新联网 (对照)", "llm calls": 2 * queries, "failed": rerun_stats["failed"],
+         "cache hits": 0, "answers = record": same(recorded, rerun), "elapsed s": rerun_stats["elapsed_s"]},
+        {"run": "replay (离线)", "llm calls": 0, "failed": replay_stats["failed"],
+         "cache hits": replay_stats["llm_cache_hits"], "answers = record": same(recorded, replayed),
+         "elapsed s": replay_stats["elapsed_s"]},
+    ])
+
+
+def eviction(tmpdir: str, requests: int):
+    """直接读写缓存：1000 种不同的请求按 Zipf 分布出现，未命中时写入一条约 2 KB 的响应"""
+    rng = random.Random(7)
+    distinct = 1000
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    body = json.dumps({"content": "".join(rng.choice("知识图谱笔记实体关系abcdef ") for _ in range(2000))},
+                      ensure_ascii=False)
+    raw_size = len(body.encode("utf-8"))
+    stored_size = len(zlib.compress(body.encode("utf-8")))
+    keys = [request_key({"model": "m", "messages": [{"role": "user", "content": str(i)}]}) for i in range(distinct)]
+    rows = []
+    for fraction in (1.0, 0.3, 0.1):
+        cache = ResponseCache(os.path.join(tmpdir, f"evict_{fraction}.db"), max_bytes=int(distinct * stored_size * fraction))
+        with timer() as t:
+            for i in rng.choices(range(distinct), weights, k=requests):
+                if cache.get(keys[i]) is None:
+                    cache.put(keys[i], "m", body)
+        stats = cache.stats()
+        cache.close()
+        rows.append({
+            "capacity": f"{fraction:.0%}",
+            "hit rate": stats["hits"] / requests,
+            "entries": stats["entries"],
+            "KB": stats["bytes"] / 1024,
+            "evictions": stats["evictions"],
+            "us/request": t["elapsed"] / requests * 1e6,
+        })
+    print_table(f"容量淘汰 ({requests} 次请求，{distinct} 种不同请求，Zipf 分布，"
+                f"响应 {raw_size / 1024:.1f} KB，压缩后 {stored_size / 1024:.1f} KB)", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大模型响应缓存基准测试")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--llm-ms", type=float, default=300, help="每次大模型调用的模拟延迟")
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="deepcontext_bench_") as tmpdir:
+        repeated(tmpdir, args.queries, args.llm_ms / 1000)
+        record_replay(tmpdir, args.queries, args.llm_ms / 1000)
+        eviction(tmpdir, args.requests)
+
+
+if __name__ == "__main__":
+    main()
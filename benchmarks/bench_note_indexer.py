@@ -0,0 +1,70 @@
+"""
+增量笔记索引基准测试：无变化重扫应只靠 stat 完成
+
+用法: python -m benchmarks.bench_note_indexer [--notes 5000]
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import print_table, temp_db_path, timer
+from benchmarks.generators import generate_vault
+from database.connection import init_manager, close_manager
+from database.sqlite_db import init_db
+from tools.note_indexer import scan_note_changes, mark_notes_ingested
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量笔记索引基准测试")
+    parser.add_argument("--notes", type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = []
+    with temp_db_path() as db_path, tempfile.TemporaryDirectory(prefix="deepcontext_vault_") as vault:
+        init_manager(db_path)
+        init_db()
+        paths = generate_vault(vault, args.notes, max_depth=0)
+
+        def record(step, elapsed, changes):
+            rows.append({
+                "step": step,
+                "ms": elapsed * 1000,
+                "new": len(changes["new"]) if changes else "-",
+                "changed": len(changes["changed"]) if changes else "-",
+                "unchanged": changes["unchanged"] if changes else "-",
+            })
+
+        with timer() as t:
+            changes = scan_note_changes(vault)
+        record("首次扫描", t["elapsed"], changes)
+
+        with timer() as t:
+            mark_notes_ingested(paths)
+        record("全部标记入库", t["elapsed"], None)
+
+        with timer() as t:
+            changes = scan_note_changes(vault)
+        record("无变化重扫 (仅 stat)", t["elapsed"], changes)
+
+        step = 100  # 每 100 篇取 1 篇，即 1%
+        for path in paths[::step]:
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        with timer() as t:
+            changes = scan_note_changes(vault)
+        record("1% 仅 touch (需哈希)", t["elapsed"], changes)
+
+        for path in paths[1::step]:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n新增的一行。\n")
+        with timer() as t:
+            changes = scan_note_changes(vault)
+        record("1% 内容修改", t["elapsed"], changes)
+        close_manager()
+
+    print_table(f"{args.notes} 篇笔记的增量扫描", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+目录扫描基准测试：Path.iterdir + 逐个 is_file() vs os.scandir 递归扫描器
+
+用法: python -m benchmarks.bench_note_scanner [--notes 20000]
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import print_table, timer
+from benchmarks.generators import generate_vault
+from tools.note_scanner import iter_markdown_files, scan_page
+
+
+def legacy_list(directory):
+    """原实现：只看顶层，逐个 is_file()，再拼接成一个大字符串"""
+    md_files = [f.name for f in Path(directory).iterdir() if f.is_file() and f.suffix == '.md']
+    result = f"成功读取目录 '{directory}'，包含以下笔记：\n"
+    for i, file in enumerate(md_files, 1):
+        result += f"{i}. {file}\n"
+    return result
+
+
+def legacy_walk(directory):
+    """用原实现的写法递归：Path.iterdir + is_dir()/is_file() 各触发一次 stat"""
+    found = []
+    stack = [Path(directory)]
+    while stack:
+        for f in stack.pop().iterdir():
+            if f.is_dir():
+                stack.append(f)
+            elif f.is_file() and f.suffix == '.md':
+                found.append(f)
+    return found
+
+
+def best_of(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        with timer() as t:
+            result = fn()
+        best = t["elapsed"] if best is None else min(best, t["elapsed"])
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目录扫描基准测试")
+    parser.add_argument("--notes", type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="deepcontext_vault_") as flat:
+        generate_vault(flat, args.notes, max_depth=0, paragraphs=1)
+        elapsed, text = best_of(lambda: legacy_list(flat))
+        rows.append({"scenario": "平铺目录", "impl": "Path.iterdir (原实现)", "ms": elapsed * 1000,
+                     "files": text.count("\n") - 1, "response KB": len(text.encode()) / 1024})
+        elapsed, (page, _) = best_of(lambda: scan_page(flat, 200))
+        text = "\n".join(page)
+        rows.append({"scenario": "平铺目录", "impl": "scandir 首页 (200)", "ms": elapsed * 1000,
+                     "files": len(page), "response KB": len(text.encode()) / 1024})
+
+    with tempfile.TemporaryDirectory(prefix="deepcontext_vault_") as nested:
+        generate_vault(nested, args.notes, max_depth=4, paragraphs=1)
+        elapsed, found = best_of(lambda: legacy_walk(nested))
+        rows.append({"scenario": "嵌套目录", "impl": "Path.iterdir 递归", "ms": elapsed * 1000,
+                     "files": len(found), "response KB": "-"})
+        elapsed, found = best_of(lambda: list(iter_markdown_files(nested)))
+        rows.append({"scenario": "嵌套目录", "impl": "scandir 全量", "ms": elapsed * 1000,
+                     "files": len(found), "response KB": "-"})
+        elapsed, (page, cursor) = best_of(lambda: scan_page(nested, 200))
+        rows.append({"scenario": "嵌套目录", "impl": "scandir 首页 (200)", "ms": elapsed * 1000,
+                     "files": len(page), "response KB": len("\n".join(page).encode()) / 1024})
+        middle = [p for p, _ in iter_markdown_files(nested)][len(found) // 2]
+        elapsed, (page, _) = best_of(lambda: scan_page(nested, 200, "/".join(middle)))
+        rows.append({"scenario": "嵌套目录", "impl": "scandir 中间页 (游标)", "ms": elapsed * 1000,
+                     "files": len(page), "response KB": "-"})
+
+    print_table(f"{args.notes} 篇笔记的目录扫描", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+并发工具调用基准测试：一轮中包含多个 tool_calls 时，逐个执行 vs 并发执行的端到端耗时
+
+使用进程内的桩 MCP 会话 (call_tool 按设定延迟 sleep 后返回)，不依赖真实的 MCP Server 和大模型。
+用法: python -m benchmarks.bench_parallel_tools [--calls 8] [--delay-ms 50] [--turns 20]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+
+from benchmarks.common import print_table, summarize, timer
+from core.tool_executor import execute_tool_calls
+
+
+class StubSession:
+    """模拟 MCP ClientSession.call_tool：每次调用有人为延迟，名为 fail 的工具会抛出异常"""
+
+    def __init__(self, delay_s: float, jitter: float = 0.2, seed: int = 42):
+        self.delay_s = delay_s
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def call_tool(self, name, arguments=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay_s * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+            if name == "fail":
+                raise RuntimeError("stub failure")
+            return SimpleNamespace(content=[SimpleNamespace(text=f"{name}:{arguments['filepath']}")])
+        finally:
+            self.in_flight -= 1
+
+
+def make_tool_calls(n: int, failing: int = 1):
+    calls = []
+    for i in range(n):
+        name = "fail" if i < failing else "read_note_content_tool"
+        calls.append(SimpleNamespace(
+            id=f"call_{i}",
+            function=SimpleNamespace(name=name, arguments=json.dumps({"filepath": f"note_{i}.md"})),
+        ))
+    return calls
+
+
+async def run_turns(concurrency: int, calls: int, delay_s: float, turns: int):
+    session = StubSession(delay_s)
+    tool_calls = make_tool_calls(calls)
+    samples = []
+    for _ in range(turns):
+        with timer() as t:
+            messages = await execute_tool_calls(session, tool_calls, concurrency=concurrency, verbose=False)
+        samples.append(t["elapsed"])
+        # 结果顺序与 tool_calls 一致，失败的调用不影响其它调用
+        assert [m["tool_call_id"] for m in messages] == [c.id for c in tool_calls]
+        assert messages[0]["content"].startswith("工具调用失败")
+        assert all(m["content"].startswith("read_note_content_tool:") for m in messages[1:])
+    return summarize(samples), session.max_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发工具调用基准测试")
+    parser.add_argument("--calls", type=int, default=8, help="每轮的工具调用数")
+    parser.add_argument("--delay-ms", type=float, default=50, help="每次工具调用的模拟延迟")
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for concurrency in sorted({1, 2, 4, args.calls}):
+        stats, peak = asyncio.run(run_turns(concurrency, args.calls, args.delay_ms / 1000, args.turns))
+        rows.append({
+            "concurrency": concurrency,
+            "peak in-flight": peak,
+            "turn p50 ms": stats["p50_ms"],
+            "turn p95 ms": stats["p95_ms"],
+        })
+    print_table(f"每轮 {args.calls} 个工具调用 (含 1 个失败)，单次延迟约 {args.delay_ms:g} ms", rows)
+
+
+if __name__ == "__main__":
+    main()
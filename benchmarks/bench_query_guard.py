@@ -0,0 +1,73 @@
+"""
+查询守卫基准测试：EXPLAIN 检查 + progress handler 带来的额外开销，以及失控查询被拦截/中断所需的时间
+
+用法: python -m benchmarks.bench_query_guard [--edges 200000] [--queries 300]
+"""
+
+import argparse
+import random
+
+from benchmarks.common import print_table, summarize, temp_db_path, timer
+from benchmarks.generators import generate_graph
+from database.connection import init_manager, close_manager, get_manager
+from database.query_guard import inspect_query, execution_budget
+from database.sqlite_db import init_db, query_knowledge_graph
+
+RUNAWAY = {
+    "笛卡尔积": "SELECT COUNT(*) FROM knowledge_triplets a, knowledge_triplets b",
+    "无选择性的自连接": "SELECT COUNT(*) FROM knowledge_triplets a JOIN knowledge_triplets b ON a.source_file = b.source_file",
+    "无限递归": "SELECT COUNT(*) FROM (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c)",
+}
+
+
+def raw_query(sql: str):
+    with get_manager().reader() as conn:
+        return conn.execute(sql).fetchmany(200)
+
+
+def guarded_query(sql: str):
+    with get_manager().reader() as conn:
+        inspect_query(conn, sql)
+        with execution_budget(conn):
+            return conn.execute(sql).fetchmany(200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询守卫基准测试")
+    parser.add_argument("--edges", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        init_manager(db_path)
+        init_db()
+        with get_manager().writer() as conn:
+            num_entities = generate_graph(conn, args.edges)
+
+        rng = random.Random(3)
+        sqls = [f"SELECT * FROM knowledge_triplets WHERE source_entity = '实体_{rng.randint(1, num_entities)}'"
+                for _ in range(args.queries)]
+        overhead_rows = []
+        for name, fn in (("不检查", raw_query), ("EXPLAIN 检查 + 执行预算", guarded_query)):
+            samples = []
+            for sql in sqls:
+                with timer() as t:
+                    fn(sql)
+                samples.append(t["elapsed"])
+            stats = summarize(samples)
+            overhead_rows.append({"mode": name, "p50 ms": stats["p50_ms"], "p95 ms": stats["p95_ms"]})
+
+        runaway_rows = []
+        for name, sql in RUNAWAY.items():
+            with timer() as t:
+                result = query_knowledge_graph(sql)
+            outcome = "拒绝" if "查询被拒绝" in result else "中断" if "已被中断" in result else "完成"
+            runaway_rows.append({"query": name, "outcome": outcome, "returned after ms": t["elapsed"] * 1000})
+        close_manager()
+
+    print_table(f"{args.queries} 次索引等值查询 ({args.edges} 条三元组)", overhead_rows)
+    print_table("失控查询", runaway_rows)
+
+
+if __name__ == "__main__":
+    main()
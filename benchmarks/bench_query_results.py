@@ -0,0 +1,70 @@
+"""
+查询结果序列化基准测试：旧实现 (fetchall + 字符串反复拼接) vs 分批读取 + 行/字符预算
+
+对整张 knowledge_triplets 执行 SELECT *，比较耗时、Python 堆内存峰值 (tracemalloc) 和返回文本长度；
+再比较 table / tsv / compact 三种格式同样一页结果的长度。
+用法: python -m benchmarks.bench_query_results [--edges 200000,1000000]
+"""
+
+import argparse
+import tracemalloc
+
+from benchmarks.common import print_table, temp_db_path, timer
+from benchmarks.generators import generate_graph
+from database.connection import init_manager, close_manager, get_manager
+from database.sqlite_db import init_db, query_knowledge_graph
+
+SQL = "SELECT * FROM knowledge_triplets"
+PAGE_SQL = "SELECT * FROM knowledge_triplets WHERE source_file = 'synthetic.md' AND relation = '关系_3'"
+
+
+def legacy_query(sql_query: str) -> str:
+    """改造前的实现 (保留用于对比)"""
+    with get_manager().reader() as conn:
+        cursor = conn.execute(sql_query)
+        results = cursor.fetchall()
+        column_names = [description[0] for description in cursor.description]
+    output = f"SQL执行成功: '{sql_query}'\n找到 {len(results)} 条记录：\n"
+    output += " | ".join(column_names) + "\n"
+    output += "-" * 50 + "\n"
+    for row in results:
+        output += " | ".join(str(item) for item in row) + "\n"
+    return output
+
+
+def measure(fn):
+    tracemalloc.start()
+    with timer() as t:
+        text = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": t["elapsed"] * 1000, "peak MB": peak / 1024 / 1024, "chars": len(text)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询结果序列化基准测试")
+    parser.add_argument("--edges", default="200000,1000000", help="逗号分隔的三元组数量")
+    args = parser.parse_args()
+
+    rows, format_rows = [], []
+    for num_edges in (int(n) for n in args.edges.split(",")):
+        with temp_db_path() as db_path:
+            init_manager(db_path)
+            init_db()
+            with get_manager().writer() as conn:
+                generate_graph(conn, num_edges)
+            for name, fn in (("fetchall + concat", lambda: legacy_query(SQL)),
+                             ("fetchmany + budget", lambda: query_knowledge_graph(SQL))):
+                rows.append({"edges": num_edges, "method": name, **measure(fn)})
+            if not format_rows:
+                for fmt in ("table", "tsv", "compact"):
+                    text = query_knowledge_graph(PAGE_SQL, output_format=fmt)
+                    format_rows.append({"format": fmt, "chars": len(text), "lines": text.count("\n") + 1})
+            close_manager()
+
+    print_table(f"{SQL} 的耗时与内存", rows)
+    print_table("同一页结果 (≤200 行) 不同格式的长度", format_rows)
+
+
+if __name__ == "__main__":
+    main()
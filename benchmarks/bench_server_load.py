@@ -0,0 +1,138 @@
+"""
+Server 负载测试：多个 MCP 客户端并发调用同一个 streamable-http Server
+
+每个客户端使用自己的会话，顺序发出调用，其中约 1/5 是需要全表扫描的聚合查询 (慢)，
+其余是图邻居查询和笔记范围读取 (快)。比较两种工具执行方式：
+  inline       工具直接在事件循环中执行 (旧行为，一个慢查询会挡住所有客户端)
+  thread-pool  工具在有界线程池中执行，按工具限制并发
+
+Server 与客户端运行在同一进程 (Server 在后台线程的事件循环中)，数据库和笔记都放在临时目录里。
+
+用法: python -m benchmarks.bench_server_load [--clients 16] [--calls 40] [--edges 200000] [--port 8798]
+需要安装 mcp。
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from config import TOOL_THREAD_POOL_SIZE
+from benchmarks.common import print_table, summarize, temp_db_path
+from benchmarks.generators import generate_graph, generate_note_text
+from core.session import MCPConnection
+
+SLOW_EVERY = 5
+
+
+def _wait_listening(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+        except urllib.error.HTTPError:
+            return  # 已在监听 (GET 没有会话时返回 4xx)
+        except OSError:
+            time.sleep(0.1)
+            continue
+        return
+    raise RuntimeError("Server 启动超时")
+
+
+def _call(kind: str, client_id: int, i: int, num_entities: int, note_path: str, note_lines: int, rng):
+    if kind == "slow":
+        # 每次的条件都不同，不会命中结果缓存
+        sql = (f"SELECT relation, COUNT(*) FROM knowledge_triplets "
+               f"WHERE target_entity != '实体_{client_id}_{i}' GROUP BY relation")
+        return "query_knowledge_graph_tool", {"sql_query": sql}
+    if i % 2:
+        return "graph_neighbors_tool", {"entity": f"实体_{rng.randint(1, num_entities)}", "limit": 20}
+    start = rng.randint(1, max(1, note_lines - 40))
+    return "read_note_range_tool", {"filepath": note_path, "start": start, "end": start + 40}
+
+
+async def run_clients(url: str, clients: int, calls: int, num_entities: int, note_path: str, note_lines: int):
+    samples = {"fast": [], "slow": []}
+    interrupted = []
+
+    async def client(client_id: int):
+        rng = random.Random(client_id)
+        async with MCPConnection(url) as conn:
+            for i in range(calls):
+                kind = "slow" if (i + client_id) % SLOW_EVERY == 0 else "fast"
+                name, arguments = _call(kind, client_id, i, num_entities, note_path, note_lines, rng)
+                start = time.perf_counter()
+                result = await conn.session.call_tool(name, arguments=arguments)
+                samples[kind].append(time.perf_counter() - start)
+                if result.isError:
+                    raise RuntimeError(result.content[0].text)
+                if "已被中断" in result.content[0].text:
+                    interrupted.append(name)  # 超出查询守卫的执行预算
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return samples, len(interrupted), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server 负载测试")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=40, help="每个客户端的调用次数")
+    parser.add_argument("--edges", type=int, default=200000)
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        # server.py 在导入时按相对路径 DB_PATH 建库，切到临时目录，避免改动仓库里的数据库
+        workdir = os.path.dirname(db_path)
+        os.chdir(workdir)
+        import server
+        logging.disable(logging.WARNING)  # 屏蔽 mcp / httpx 的逐请求日志
+        from database.connection import get_manager, close_manager
+        from tools.async_runner import init_tool_runner
+        from tools.result_cache import get_result_cache
+
+        with get_manager().writer() as conn:
+            num_entities = generate_graph(conn, args.edges)
+        note_path = os.path.join(workdir, "big_note.md")
+        with open(note_path, "w", encoding="utf-8") as f:
+            f.write(generate_note_text(random.Random(1), paragraphs=2000))
+        with open(note_path, encoding="utf-8") as f:
+            note_lines = sum(1 for _ in f)
+
+        server.mcp.settings.port = args.port
+        server.mcp.settings.log_level = "WARNING"
+        threading.Thread(target=lambda: asyncio.run(server.mcp.run_streamable_http_async()), daemon=True).start()
+        url = f"http://127.0.0.1:{args.port}/mcp"
+        _wait_listening(url)
+
+        rows = []
+        for mode, pool_size in (("inline", 0), ("thread-pool", TOOL_THREAD_POOL_SIZE)):
+            runner = init_tool_runner(pool_size)
+            get_result_cache().clear()
+            samples, interrupted, elapsed = asyncio.run(
+                run_clients(url, args.clients, args.calls, num_entities, note_path, note_lines))
+            fast, slow = summarize(samples["fast"]), summarize(samples["slow"])
+            rows.append({
+                "mode": mode,
+                "calls/s": (fast["count"] + slow["count"]) / elapsed,
+                "fast p50 ms": fast["p50_ms"],
+                "fast p99 ms": fast["p99_ms"],
+                "slow p50 ms": slow["p50_ms"],
+                "slow p99 ms": slow["p99_ms"],
+                "interrupted": interrupted,
+            })
+        runner.shutdown()
+        close_manager()
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    print_table(f"{args.clients} 个客户端 x {args.calls} 次调用 ({args.edges} 条三元组)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+MCP 会话启动基准测试：每次查询冷启动 server.py 子进程 vs 连接常驻的 streamable-http Server
+
+每个 "查询" 执行一次 query_knowledge_graph_tool，比较三种方式的单次耗时：
+  cold-spawn       每次启动 stdio 子进程 + initialize + list_tools (旧行为)
+  attach-per-query 常驻 Server，每次新建 HTTP 会话 (工具列表走缓存)
+  warm-session     常驻 Server，所有查询复用同一个会话
+
+用法: python -m benchmarks.bench_session [--queries 20] [--port 8799]
+需要安装 mcp。
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import print_table, summarize, timer
+from core.session import MCPConnection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL = "query_knowledge_graph_tool"
+ARGS = {"sql_query": "SELECT COUNT(*) FROM knowledge_triplets"}
+
+
+async def _one_query(conn):
+    await conn.session.call_tool(TOOL, arguments=ARGS)
+
+
+async def cold_spawn(queries):
+    samples = []
+    for _ in range(queries):
+        with timer() as t:
+            async with MCPConnection() as conn:
+                await conn.load_tools(refresh=True)
+                await _one_query(conn)
+        samples.append(t["elapsed"])
+    return samples
+
+
+async def attach_per_query(url, queries):
+    samples = []
+    for _ in range(queries):
+        with timer() as t:
+            async with MCPConnection(url) as conn:
+                await _one_query(conn)
+        samples.append(t["elapsed"])
+    return samples
+
+
+async def warm_session(url, queries):
+    samples = []
+    async with MCPConnection(url) as conn:
+        for _ in range(queries):
+            with timer() as t:
+                await _one_query(conn)
+            samples.append(t["elapsed"])
+    return samples
+
+
+def start_http_server(port: int):
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", "--transport", "streamable-http", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+        except urllib.error.HTTPError:
+            return proc, url  # 已在监听 (GET 没有会话时返回 4xx)
+        except OSError:
+            time.sleep(0.1)
+            continue
+        return proc, url
+    proc.terminate()
+    raise RuntimeError("常驻 Server 启动超时")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 会话启动基准测试")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    rows = []
+    rows.append({"mode": "cold-spawn", **summarize(asyncio.run(cold_spawn(args.queries)))})
+    proc, url = start_http_server(args.port)
+    try:
+        rows.append({"mode": "attach-per-query", **summarize(asyncio.run(attach_per_query(url, args.queries)))})
+        rows.append({"mode": "warm-session", **summarize(asyncio.run(warm_session(url, args.queries)))})
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print_table(f"{args.queries} 次查询的单次耗时", [
+        {"mode": r["mode"], "p50 ms": r["p50_ms"], "p95 ms": r["p95_ms"]} for r in rows
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+图谱快照基准测试
+
+0. 一致性检查 (小图，每次都先运行)：空库还原后三元组视图 (含 id 和创建时间)、别名、归并记录、全文索引与原库逐行一致；
+   合并进已有数据的库后三元组是两边的并集且没有重复，别名和归并记录指向同名实体，全文索引覆盖全部三元组
+1. 导出：导出耗时、快照文件与 SQLite 数据库的体积
+2. 加载：把整张图读进内存的耗时，SQLite 全表扫描 / 建内存邻接索引 vs 内存映射加载快照；
+   以及一个分析查询 (出度最高的 10 个实体) 在两边的耗时
+3. 导入：快照还原到空库 (单个事务) 的耗时，并逐行比对还原后的三元组视图、别名表、归并记录和全文索引与原库一致
+任何一项不一致时以退出码 1 结束。
+
+用法: python -m benchmarks.bench_snapshot [--edges 1000000] [--runs 5] [--check-only]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from benchmarks.common import print_table, summarize, temp_db_path, timer
+from benchmarks.generators import generate_graph
+from database.connection import init_manager, close_manager, get_manager
+from database.entity_resolution import register_alias
+from database.snapshot import export_snapshot, import_snapshot, load_snapshot
+from database.sqlite_db import init_db, insert_triplet_rows
+from tools.graph_traversal import GraphIndex
+
+_TOP_DEGREE_SQL = "SELECT source_id, COUNT(*) AS n FROM triplets GROUP BY source_id ORDER BY n DESC LIMIT 10"
+
+# 逐行比对的内容：三元组 (含原始 id、来源和创建时间)、别名、归并记录、全文索引
+_COMPARE_SQL = [
+    "SELECT id, source_entity, relation, target_entity, source_file, created_at FROM knowledge_triplets ORDER BY id",
+    "SELECT alias_key, entity_id FROM entity_aliases ORDER BY alias_key",
+    "SELECT id, alias, entity_id, method, score, created_at FROM entity_merges ORDER BY id",
+    "SELECT rowid, body FROM triplets_fts ORDER BY rowid",
+]
+_CHECK_EDGES = 2_000
+
+# 按名字比较的内容 (合并导入后 id 由目标库重新分配)
+_FACTS_SQL = "SELECT source_entity, relation, target_entity, source_file FROM knowledge_triplets"
+_ALIASES_SQL = "SELECT a.alias_key, e.name FROM entity_aliases a JOIN entities e ON e.id = a.entity_id"
+_MERGES_SQL = "SELECT m.alias, e.name, m.method, m.score FROM entity_merges m JOIN entities e ON e.id = m.entity_id"
+_FTS_MISSING_SQL = "SELECT COUNT(*) FROM triplets WHERE id NOT IN (SELECT rowid FROM triplets_fts)"
+_FTS_EXTRA_SQL = "SELECT COUNT(*) FROM triplets_fts WHERE rowid NOT IN (SELECT id FROM triplets)"
+
+
+def _db_bytes(db_path: str) -> int:
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def _median_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        with timer() as t:
+            fn()
+        samples.append(t["elapsed"])
+    return summarize(samples)["p50_ms"]
+
+
+def _top_degree(snapshot):
+    degree = snapshot.out_degree()
+    top = np.argpartition(-degree, 9)[:10]
+    return [(snapshot.entities[i], int(degree[i])) for i in top[np.argsort(-degree[top])]]
+
+
+def _same_rows(path_a: str, path_b: str, sql: str):
+    """返回 (行数, 是否逐行一致)"""
+    a = sqlite3.connect(path_a)
+    b = sqlite3.connect(path_b)
+    count = 0
+    same = True
+    rows_b = b.execute(sql)
+    for row in a.execute(sql):
+        count += 1
+        if row != next(rows_b, None):
+            same = False
+            break
+    same = same and next(rows_b, None) is None
+    a.close()
+    b.close()
+    return count, same
+
+
+def _fetch(path: str, sql: str) -> list:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _open_db(path: str):
+    init_manager(path)
+    init_db()
+
+
+def check_round_trip(workdir: str) -> list:
+    """在小图上验证导出 → 空库还原 / 合并进已有数据的库，返回不一致项 (空列表表示全部通过)"""
+    source_path = os.path.join(workdir, "check_source.db")
+    restored_path = os.path.join(workdir, "check_restored.db")
+    merged_path = os.path.join(workdir, "check_merged.db")
+    snapshot_path = os.path.join(workdir, "check.snap")
+    failures = []
+
+    _open_db(source_path)
+    with get_manager().writer() as conn:
+        generate_graph(conn, _CHECK_EDGES)
+        # 删掉一部分三元组，让 id 有空洞；再走普通写入路径产生别名和 normalized / fuzzy 归并
+        conn.execute("DELETE FROM triplets WHERE id % 7 = 0")
+        insert_triplet_rows(conn, [("MCP协议", "基于", "JSON-RPC", "mcp.md"),
+                                   ("ＭＣＰ 协议", "传输", "stdio", "mcp.md"),
+                                   ("Transformer架构", "提出于", "2017年", "ml.md"),
+                                   ("Transfomer架构", "包含", "注意力机制", "ml.md")])
+    register_alias("Model Context Protocol", "MCP协议")
+    merges = len(_fetch(source_path, _MERGES_SQL))
+    if merges < 3:
+        failures.append(f"原库只有 {merges} 条归并记录，检查数据没有覆盖 normalized / fuzzy / manual")
+    export_snapshot(snapshot_path)
+
+    _open_db(restored_path)
+    result = import_snapshot(snapshot_path)
+    if result["mode"] != "restore":
+        failures.append(f"空库导入的模式是 {result['mode']}")
+    for sql in _COMPARE_SQL:
+        count, same = _same_rows(source_path, restored_path, sql)
+        if not same:
+            failures.append(f"还原后 {sql.split(' FROM ')[1].split()[0]} 与原库不一致 (比对了原库 {count} 行)")
+
+    # 目标库已有数据：一条与快照相同的事实、一条新事实、一个写法不同的同一实体
+    _open_db(merged_path)
+    existing = [("MCP协议", "基于", "JSON-RPC", "mcp.md"),
+                ("mcp 协议", "实现", "工具调用", "notes.md"),
+                ("向量检索", "依赖", "嵌入模型", "notes.md")]
+    with get_manager().writer() as conn:
+        insert_triplet_rows(conn, existing)
+    before = set(_fetch(merged_path, _FACTS_SQL))
+    result = import_snapshot(snapshot_path)
+    close_manager()
+    if result["mode"] != "merge":
+        failures.append(f"非空库导入的模式是 {result['mode']}")
+    source_facts = set(_fetch(source_path, _FACTS_SQL))
+    merged_facts = _fetch(merged_path, _FACTS_SQL)
+    if len(merged_facts) != len(set(merged_facts)):
+        failures.append(f"合并后有 {len(merged_facts) - len(set(merged_facts))} 条重复三元组")
+    if set(merged_facts) != source_facts | before:
+        failures.append(f"合并后的三元组不是两边的并集 (缺少 {len(source_facts | before - set(merged_facts))} 条，"
+                        f"多出 {len(set(merged_facts) - source_facts - before)} 条)")
+    if result["inserted"] != len(source_facts - before):
+        failures.append(f"合并导入报告写入 {result['inserted']} 条，应为 {len(source_facts - before)} 条")
+    merged_aliases = dict(_fetch(merged_path, _ALIASES_SQL))
+    wrong = [key for key, name in _fetch(source_path, _ALIASES_SQL) if merged_aliases.get(key) != name]
+    if wrong:
+        failures.append(f"合并后有 {len(wrong)} 个别名缺失或指向了其他实体 (如 {wrong[0]})")
+    missing = set(_fetch(source_path, _MERGES_SQL)) - set(_fetch(merged_path, _MERGES_SQL))
+    if missing:
+        failures.append(f"合并后缺少 {len(missing)} 条归并记录 (如 {sorted(missing)[0]})")
+    for sql, what in ((_FTS_MISSING_SQL, "没有全文索引的三元组"), (_FTS_EXTRA_SQL, "多余的全文索引行")):
+        (count,) = _fetch(merged_path, sql)[0]
+        if count:
+            failures.append(f"合并后有 {count} 条{what}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图谱快照基准测试")
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--check-only", action="store_true", help="只运行小图上的导出 / 导入一致性检查")
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        workdir = os.path.dirname(db_path)
+        failures = check_round_trip(workdir)
+        print_table(f"一致性检查 ({_CHECK_EDGES} 条边的小图：空库还原 + 合并进已有数据的库)",
+                    [{"check": failure} for failure in failures] or [{"check": "全部通过"}])
+        if failures:
+            sys.exit(1)
+        if args.check_only:
+            return
+
+        snapshot_path = os.path.join(workdir, "graph.snap")
+        init_manager(db_path)
+        init_db()
+        with get_manager().writer() as conn:
+            generate_graph(conn, args.edges)
+            # 走普通写入路径写几条写法不同的同一实体，让别名表里也有数据
+            insert_triplet_rows(conn, [("ＭＣＰ 协议", "基于", "JSON-RPC", "mcp.md"),
+                                       ("mcp-协议", "传输", "stdio", "mcp.md")])
+        with get_manager().writer() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        with timer() as export_time:
+            stats = export_snapshot(snapshot_path)
+        print_table(f"导出 ({stats['triplets']} 条三元组，{stats['entities']} 个实体)", [
+            {"file": "SQLite 数据库 (含全文索引)", "MB": _db_bytes(db_path) / 2 ** 20, "export s": "-"},
+            {"file": "快照", "MB": stats["bytes"] / 2 ** 20, "export s": export_time["elapsed"]},
+        ])
+
+        def scan_view():
+            with get_manager().reader() as conn:
+                conn.execute("SELECT source_entity, relation, target_entity, source_file FROM knowledge_triplets").fetchall()
+
+        def scan_ids():
+            with get_manager().reader() as conn:
+                conn.execute("SELECT source_id, relation_id, target_id FROM triplets").fetchall()
+
+        def top_degree_sql():
+            with get_manager().reader() as conn:
+                rows = conn.execute(_TOP_DEGREE_SQL).fetchall()
+                names = dict(conn.execute(
+                    f"SELECT id, name FROM entities WHERE id IN ({','.join('?' * len(rows))})", [r[0] for r in rows]
+                ).fetchall())
+            return [(names[i], n) for i, n in rows]
+
+        def decode_names():
+            load_snapshot(snapshot_path).entities.tolist()
+
+        assert sorted(n for _, n in top_degree_sql()) == sorted(n for _, n in _top_degree(load_snapshot(snapshot_path)))
+        print_table(f"加载整张图 ({args.runs} 次的中位数，页缓存已预热)", [
+            {"source": "SQLite", "operation": "扫描 knowledge_triplets 视图 (名字)", "ms": _median_ms(scan_view, args.runs)},
+            {"source": "SQLite", "operation": "扫描 triplets 表 (整数 id)", "ms": _median_ms(scan_ids, args.runs)},
+            {"source": "SQLite", "operation": "建内存邻接索引 (GraphIndex)",
+             "ms": _median_ms(lambda: GraphIndex().refresh(), max(1, args.runs // 2))},
+            {"source": "快照", "operation": "内存映射加载 (出边 / 入边 CSR 可直接使用)",
+             "ms": _median_ms(lambda: load_snapshot(snapshot_path), args.runs)},
+            {"source": "快照", "operation": "加载 + 解码全部实体名", "ms": _median_ms(decode_names, args.runs)},
+            {"source": "SQLite", "operation": "出度最高的 10 个实体 (GROUP BY)", "ms": _median_ms(top_degree_sql, args.runs)},
+            {"source": "快照", "operation": "加载 + 出度最高的 10 个实体 (np.diff)",
+             "ms": _median_ms(lambda: _top_degree(load_snapshot(snapshot_path)), args.runs)},
+        ])
+
+        restored_path = os.path.join(workdir, "restored.db")
+        init_manager(restored_path)
+        init_db()
+        with timer() as import_time:
+            result = import_snapshot(snapshot_path)
+        close_manager()
+        rows = []
+        for sql in _COMPARE_SQL:
+            count, same = _same_rows(db_path, restored_path, sql)
+            rows.append({"table": sql.split(" FROM ")[1].split()[0], "rows": count, "identical": same})
+        print_table(f"导入到空库 (模式 {result['mode']}，单个事务，{import_time['elapsed']:.2f} s，"
+                    f"{result['inserted'] / import_time['elapsed']:,.0f} 条/s)；与原库逐行比对", rows)
+        if not all(row["identical"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+流式调用基准测试：本地流式桩服务 (OpenAI 兼容的 /v1/chat/completions，SSE) + 桩 MCP 会话
+
+桩模型第一轮先说一句话，再依次生成 --tools 个工具调用 (参数逐 token 输出)；看到工具结果后逐 token 生成最终回答。
+每个 token 间隔 --token-ms，首个 token 前有 --ttft-ms 的预填充延迟；非流式请求等全部生成完再一次性返回。
+对比非流式与流式 (参数完整的工具调用立即执行)：
+  首个可见输出  用户看到第一段文字的时间 (非流式要等最终回答整体返回)
+  第 1 轮       从发出请求到本轮工具全部返回的耗时
+  总耗时        整个问题的耗时
+分别在工具并发上限为 AGENT_TOOL_CONCURRENCY 和 1 (逐个执行) 时测试。
+
+用法: python -m benchmarks.bench_streaming [--runs 5] [--token-ms 20] [--ttft-ms 300] [--tool-ms 300] [--tools 3]
+需要安装 starlette 和 uvicorn (mcp 的依赖)。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import uvicorn
+from openai import AsyncOpenAI
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import core.tool_executor as tool_executor
+from benchmarks.bench_parallel_tools import StubSession
+from benchmarks.common import print_table
+from benchmarks.bench_server_load import _wait_listening
+from config import AGENT_TOOL_CONCURRENCY
+from core.agent import DeepContextAgent
+from core.llm_client import LLMClient
+
+_PREAMBLE = ["我", "先", "查", "一下", "相关", "的", "笔记", "和", "图谱", "。"]
+_ANSWER = ["根据", "笔记", "，", "MCP", " 协议", "把", "大模型", "与", "本地", "工具", "解耦", "。"] * 10
+
+
+def _script(messages, num_tools: int):
+    """返回本轮的 (正文 token 列表, [(调用 id, 工具名, 参数 token 列表)])"""
+    if any(m["role"] == "tool" for m in messages):
+        return _ANSWER, []
+    calls = []
+    for i in range(num_tools):
+        arguments = json.dumps({"filepath": f"notes/topic_{i}.md", "section": f"第 {i + 1} 节"}, ensure_ascii=False)
+        # 大约每 4 个字符一个 token
+        pieces = [arguments[j:j + 4] for j in range(0, len(arguments), 4)]
+        calls.append((f"call_{i}", "read_note_content_tool", pieces))
+    return _PREAMBLE, calls
+
+
+def build_app(token_s: float, ttft_s: float, num_tools: int) -> Starlette:
+    async def completions(request: Request):
+        body = await request.json()
+        text, calls = _script(body["messages"], num_tools)
+        tokens = len(text) + sum(len(pieces) for _, _, pieces in calls)
+        usage = {"prompt_tokens": sum(len(str(m.get("content") or "")) for m in body["messages"]),
+                 "completion_tokens": tokens}
+        usage["total_tokens"] = usage["prompt_tokens"] + tokens
+        meta = {"id": "chatcmpl-stub", "created": 0, "model": body["model"]}
+        finish_reason = "tool_calls" if calls else "stop"
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft_s + tokens * token_s)
+            message = {"role": "assistant", "content": "".join(text)}
+            if calls:
+                message["tool_calls"] = [{"id": call_id, "type": "function",
+                                          "function": {"name": name, "arguments": "".join(pieces)}}
+                                         for call_id, name, pieces in calls]
+            return JSONResponse({**meta, "object": "chat.completion", "usage": usage,
+                                 "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}]})
+
+        def chunk(delta=None, finish=None, with_usage=False):
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish}]
+            data = {**meta, "object": "chat.completion.chunk", "choices": choices}
+            if with_usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            await asyncio.sleep(ttft_s)
+            for piece in text:
+                yield chunk({"content": piece})
+                await asyncio.sleep(token_s)
+            for index, (call_id, name, pieces) in enumerate(calls):
+                yield chunk({"tool_calls": [{"index": index, "id": call_id, "type": "function",
+                                             "function": {"name": name, "arguments": ""}}]})
+                for piece in pieces:
+                    await asyncio.sleep(token_s)
+                    yield chunk({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+            yield chunk({}, finish_reason)
+            if body.get("stream_options", {}).get("include_usage"):
+                yield chunk(with_usage=True)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+def start_server(app, port: int):
+    """在后台线程中运行桩服务"""
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    _wait_listening(f"http://127.0.0.1:{port}/v1/chat/completions")
+    return server, thread
+
+
+class TimedLLMClient(LLMClient):
+    """记录每次调用大模型的开始时间，用于计算每轮耗时"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.starts = []
+
+    async def create(self, **kwargs):
+        self.starts.append(time.perf_counter())
+        return await super().create(**kwargs)
+
+    async def stream(self, assembler, **kwargs):
+        self.starts.append(time.perf_counter())
+        return await super().stream(assembler, **kwargs)
+
+
+class StubConnection:
+    def __init__(self, delay_s: float):
+        self.session = StubSession(delay_s, jitter=0)
+        self.tools = []
+
+
+async def run_once(port: int, streaming: bool, tool_s: float) -> dict:
+    client = AsyncOpenAI(api_key="stub", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0)
+    llm = TimedLLMClient(client, requests_per_second=0, cache_mode="off")
+    agent = DeepContextAgent(llm_client=llm, verbose=False, streaming=streaming)
+    first_text = []
+
+    def on_text(piece):
+        if not first_text:
+            first_text.append(time.perf_counter())
+
+    start = time.perf_counter()
+    result = await agent.run_query(StubConnection(tool_s), "总结 MCP 协议", on_text)
+    end = time.perf_counter()
+    await client.close()
+    assert result["answer"], "没有得到最终回答"
+    visible = first_text[0] if first_text else end
+    return {
+        "first_visible_s": visible - start,
+        "turn1_s": llm.starts[1] - llm.starts[0],
+        "total_s": end - start,
+        "turns": result["turns"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式调用基准测试")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tool-ms", type=float, default=300)
+    parser.add_argument("--tools", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    server, thread = start_server(build_app(args.token_ms / 1000, args.ttft_ms / 1000, args.tools), args.port)
+    rows = []
+    try:
+        for concurrency in dict.fromkeys((AGENT_TOOL_CONCURRENCY, 1)):
+            tool_executor.AGENT_TOOL_CONCURRENCY = concurrency
+            for streaming in (False, True):
+                samples = [asyncio.run(run_once(args.port, streaming, args.tool_ms / 1000)) for _ in range(args.runs)]
+                rows.append({
+                    "tool concurrency": concurrency,
+                    "mode": "stream" if streaming else "non-stream",
+                    "first visible ms": sum(s["first_visible_s"] for s in samples) / len(samples) * 1000,
+                    "turn 1 ms": sum(s["turn1_s"] for s in samples) / len(samples) * 1000,
+                    "total ms": sum(s["total_s"] for s in samples) / len(samples) * 1000,
+                })
+    finally:
+        tool_executor.AGENT_TOOL_CONCURRENCY = AGENT_TOOL_CONCURRENCY
+        server.should_exit = True
+        thread.join()
+
+    print_table(f"流式 vs 非流式 (每个 token {args.token_ms:g} ms，首 token 前 {args.ttft_ms:g} ms，"
+                f"{args.tools} 个工具调用，每个 {args.tool_ms:g} ms，{args.runs} 次平均)", rows)
+
+
+if __name__ == "__main__":
+    main()
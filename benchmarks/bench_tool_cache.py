@@ -0,0 +1,109 @@
+"""
+工具结果缓存基准测试：重复的只读工具调用 (SQL 查询、笔记读取) 有无缓存的延迟对比
+
+模拟 Agent 的调用分布：少数热门 SQL / 笔记被反复访问 (幂律)，每隔一段时间写入一条三元组，
+写入会递增数据库写入代数，使之前的 SQL 结果自然失效。
+用法: python -m benchmarks.bench_tool_cache [--edges 100000] [--calls 2000] [--write-every 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from benchmarks.common import print_table, summarize, temp_db_path, timer
+from benchmarks.generators import generate_graph, generate_note_text
+from database.connection import init_manager, close_manager, get_manager
+from database.sqlite_db import init_db, add_knowledge_triplet, query_knowledge_graph
+from tools.file_tools import read_note_content
+from tools.result_cache import ResultCache, cached_call, db_key, note_key, normalize_sql
+
+
+def make_workload(calls: int, num_entities: int, notes: list, seed: int = 7):
+    """返回 [(kind, 参数)]，约 70% 是 SQL 查询，30% 是读笔记；目标按幂律集中在热门项"""
+    rng = random.Random(seed)
+    hot = lambda n: min(n, int(rng.paretovariate(1.0)))
+    workload = []
+    for _ in range(calls):
+        if rng.random() < 0.7:
+            entity = f"实体_{hot(num_entities)}"
+            # 同一条 SQL 的空白和大小写写法不同，规范化后应命中同一个缓存条目
+            sql = rng.choice([
+                f"SELECT * FROM knowledge_triplets WHERE source_entity = '{entity}'",
+                f"select *  from knowledge_triplets\n where source_entity = '{entity}';",
+            ])
+            workload.append(("sql", sql))
+        else:
+            workload.append(("note", notes[hot(len(notes)) - 1]))
+    return workload
+
+
+def run(workload, use_cache: bool, write_every: int):
+    cache = ResultCache()
+    samples = {"sql": [], "note": []}
+    for i, (kind, arg) in enumerate(workload, 1):
+        if write_every and i % write_every == 0:
+            add_knowledge_triplet(f"新实体_{i}", "关系_1", "实体_1", "bench.md")
+        with timer() as t:
+            if kind == "sql":
+                if use_cache:
+                    cached_call(db_key("query_knowledge_graph", normalize_sql(arg)),
+                                lambda: query_knowledge_graph(arg), cache=cache)
+                else:
+                    query_knowledge_graph(arg)
+            else:
+                if use_cache:
+                    cached_call(note_key("read_note_content", arg), lambda: read_note_content(arg), cache=cache)
+                else:
+                    read_note_content(arg)
+        samples[kind].append(t["elapsed"])
+    return samples, cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工具结果缓存基准测试")
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=200, help="每隔多少次调用写入一条三元组 (0 表示不写)")
+    args = parser.parse_args()
+
+    rows = []
+    with temp_db_path() as db_path, tempfile.TemporaryDirectory(prefix="deepcontext_notes_") as notes_dir:
+        init_manager(db_path)
+        init_db()
+        with get_manager().writer() as conn:
+            num_entities = generate_graph(conn, args.edges)
+        rng = random.Random(1)
+        notes = []
+        for i in range(args.notes):
+            path = os.path.join(notes_dir, f"note_{i}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(generate_note_text(rng, paragraphs=20))
+            notes.append(path)
+        workload = make_workload(args.calls, num_entities, notes)
+        # 预热：让笔记分块索引等一次性的写入先完成，两种模式在同样的状态下比较
+        for path in notes:
+            read_note_content(path)
+
+        for use_cache in (False, True):
+            samples, stats = run(workload, use_cache, args.write_every)
+            for kind, label in (("sql", "query_knowledge_graph"), ("note", "read_note_content")):
+                s = summarize(samples[kind])
+                hit = stats["tools"].get(label, {})
+                rows.append({
+                    "tool": label,
+                    "cache": "on" if use_cache else "off",
+                    "calls": s["count"],
+                    "hits": hit.get("hits", 0),
+                    "p50 ms": s["p50_ms"],
+                    "p95 ms": s["p95_ms"],
+                    "total ms": sum(samples[kind]) * 1000,
+                })
+        close_manager()
+
+    print_table(f"{args.calls} 次只读工具调用 (每 {args.write_every} 次写入一条三元组)", rows)
+
+
+if __name__ == "__main__":
+    main()
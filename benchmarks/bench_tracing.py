@@ -0,0 +1,127 @@
+"""
+追踪基准测试
+
+1. span 开销：关闭 / jsonl / otlp 三种导出方式下，创建并导出一个 span 的平均耗时
+2. 端到端：Server (streamable-http) 与 Agent 运行在同一进程，桩模型第一轮同时调用 SQL 查询、图邻居和笔记读取三个工具，
+   第二轮给出回答；对比开启 / 关闭追踪的每问题耗时，并输出 trace-summary 的汇总表，
+   检查 Server 端的 tool.run 是否都挂在客户端 mcp.call_tool 之下 (traceparent 跨进程传递)
+
+用法: python -m benchmarks.bench_tracing [--spans 20000] [--queries 30] [--edges 50000] [--port 8796]
+需要安装 mcp。
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import tracing
+from benchmarks.bench_server_load import _wait_listening
+from benchmarks.common import print_table, summarize, temp_db_path, timer
+from benchmarks.generators import generate_graph, generate_note_text
+from benchmarks.stub_llm import ToolCallingCompletions
+from core.agent import DeepContextAgent
+from core.llm_client import LLMClient
+
+
+def span_overhead(workdir: str, count: int):
+    rows = []
+    for export in tracing.EXPORT_FORMATS:
+        path = os.path.join(workdir, f"overhead.{export}")
+        tracer = tracing.Tracer(export, path)
+        with timer() as t:
+            for i in range(count // 4):
+                # 一个根 span 带三个子 span，和一次工具调用的层级相近
+                with tracer.span("agent.turn", turn=i):
+                    for _ in range(3):
+                        with tracer.span("sql.query", rows=10) as child:
+                            child.set(has_more=False)
+        tracer.flush()
+        rows.append({
+            "export": export,
+            "spans": count // 4 * 4,
+            "us/span": t["elapsed"] / (count // 4 * 4) * 1e6,
+            "file KB": os.path.getsize(path) / 1024 if os.path.exists(path) else 0.0,
+        })
+    print_table("span 开销 (创建 + 导出)", rows)
+
+
+async def run_queries(url: str, queries: int, num_entities: int, note_path: str) -> list:
+    completions = ToolCallingCompletions(num_entities, note_path)
+    llm = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=completions)), requests_per_second=0,
+                    cache_mode="off")
+    agent = DeepContextAgent(url, llm, verbose=False, streaming=False)
+    samples = []
+    async with agent.connect() as connection:
+        for i in range(queries):
+            start = time.perf_counter()
+            await agent.run_query(connection, f"问题 {i}")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def end_to_end(workdir: str, queries: int, edges: int, port: int):
+    # server.py 在导入时按相对路径 DB_PATH 建库，切到临时目录，避免改动仓库里的数据库
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    import server
+    logging.disable(logging.WARNING)  # 屏蔽 mcp / httpx 的逐请求日志
+    from database.connection import get_manager, close_manager
+    from tools.result_cache import get_result_cache
+
+    with get_manager().writer() as conn:
+        num_entities = generate_graph(conn, edges)
+    note_path = os.path.join(workdir, "note.md")
+    with open(note_path, "w", encoding="utf-8") as f:
+        f.write(generate_note_text(random.Random(1), paragraphs=400))
+
+    server.mcp.settings.port = port
+    server.mcp.settings.log_level = "WARNING"
+    threading.Thread(target=lambda: asyncio.run(server.mcp.run_streamable_http_async()), daemon=True).start()
+    url = f"http://127.0.0.1:{port}/mcp"
+    _wait_listening(url)
+
+    rows = []
+    trace_path = os.path.join(workdir, "traces.jsonl")
+    for export in ("off", "jsonl", "otlp"):
+        tracing.init_tracer(export, trace_path)
+        get_result_cache().clear()  # 每轮问题相同，清空结果缓存，让工具真正执行
+        latency = summarize(asyncio.run(run_queries(url, queries, num_entities, note_path)))
+        rows.append({"trace": export, "queries": queries, "p50 ms": latency["p50_ms"], "p95 ms": latency["p95_ms"]})
+    tracing.init_tracer("off")
+    close_manager()
+    os.chdir(cwd)
+    print_table(f"端到端 ({queries} 个问题，每个问题 2 轮、3 个工具调用，{edges} 条三元组)", rows)
+
+    spans = tracing.load_spans(trace_path)
+    by_id = {s["span_id"]: s for s in spans}
+    tool_runs = [s for s in spans if s["name"] == "tool.run"]
+    linked = sum(by_id.get(s["parent_id"], {}).get("name") == "mcp.call_tool" for s in tool_runs)
+    sql = [s for s in spans if s["name"] == "sql.query"]
+    sql_linked = sum(by_id.get(s["parent_id"], {}).get("name") == "tool.run" for s in sql)
+    print(f"📊 追踪汇总 (jsonl + otlp 两轮，共 {len(spans)} 个 span，"
+          f"{len({s['trace_id'] for s in spans})} 个 trace；tool.run 挂在 mcp.call_tool 下 {linked}/{len(tool_runs)}，"
+          f"sql.query 挂在 tool.run 下 {sql_linked}/{len(sql)})")
+    print(tracing.format_summary(tracing.summarize_spans(spans)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追踪基准测试")
+    parser.add_argument("--spans", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--edges", type=int, default=50000)
+    parser.add_argument("--port", type=int, default=8796)
+    args = parser.parse_args()
+
+    with temp_db_path() as db_path:
+        workdir = os.path.dirname(db_path)
+        span_overhead(workdir, args.spans)
+        end_to_end(workdir, args.queries, args.edges, args.port)
+
+
+if __name__ == "__main__":
+    main()
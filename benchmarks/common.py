@@ -0,0 +1,76 @@
+"""
+基准测试公共工具：计时、分位数统计、临时数据库
+"""
+
+import os
+import tempfile
+import time
+import unicodedata
+from contextlib import contextmanager
+
+
+def percentile(samples, pct: float) -> float:
+    """计算分位数 (最近秩法)，samples 为空时返回 0"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples) -> dict:
+    """把一组耗时 (秒) 汇总为毫秒级的 p50/p95/p99"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+@contextmanager
+def timer():
+    """计时上下文，退出后通过 result['elapsed'] 读取耗时 (秒)"""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["elapsed"] = time.perf_counter() - start
+
+
+@contextmanager
+def temp_db_path(name: str = "bench.db"):
+    """在临时目录中提供一个数据库路径，退出时整体清理"""
+    with tempfile.TemporaryDirectory(prefix="deepcontext_bench_") as tmpdir:
+        yield os.path.join(tmpdir, name)
+
+
+def print_table(title: str, rows):
+    """以对齐的纯文本表格打印结果，rows 为 dict 列表"""
+    print(f"\n📊 {title}")
+    if not rows:
+        print("  (无数据)")
+        return
+    headers = list(rows[0].keys())
+    cells = [[_fmt(row.get(h)) for h in headers] for row in rows]
+    widths = [max(_width(h), *(_width(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  " + " | ".join(_pad(h, w) for h, w in zip(headers, widths)))
+    print("  " + "-+-".join("-" * w for w in widths))
+    for c in cells:
+        print("  " + " | ".join(_pad(v, w) for v, w in zip(c, widths)))
+
+
+def _width(text: str) -> int:
+    """终端显示宽度：中文等全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+
+
+def _pad(text: str, width: int) -> str:
+    return text + " " * (width - _width(text))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.3f}"
+    return str(value)
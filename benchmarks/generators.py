@@ -0,0 +1,91 @@
+"""
+基准测试数据生成器
+"""
+
+import os
+import random
+
+
+def generate_graph(conn, num_edges: int, avg_degree: int = 5, num_relations: int = 20,
+                   seed: int = 42, source_file: str = "synthetic.md"):
+    """
+    直接向规范化表写入一张随机图 (绕过工具层，快速构造大规模数据)。
+    实体数 = num_edges / avg_degree，边按幂律偏向少数热点实体，更接近真实知识图谱。
+    返回实体数。
+    """
+    rng = random.Random(seed)
+    num_entities = max(2, num_edges // avg_degree)
+    conn.executemany(
+        "INSERT INTO entities (id, name) VALUES (?, ?)",
+        ((i, f"实体_{i}") for i in range(1, num_entities + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO relations (id, name) VALUES (?, ?)",
+        ((i, f"关系_{i}") for i in range(1, num_relations + 1)),
+    )
+
+    def pick():
+        # 幂律分布：id 越小越热门
+        return min(num_entities, int(rng.paretovariate(1.2))) if rng.random() < 0.2 else rng.randint(1, num_entities)
+
+    def edges():
+        for _ in range(num_edges):
+            yield pick(), rng.randint(1, num_relations), rng.randint(1, num_entities), source_file
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO triplets (source_id, relation_id, target_id, source_file) VALUES (?, ?, ?, ?)",
+        edges(),
+    )
+    return num_entities
+
+
+# 生成笔记正文用的中英文混合词库
+_VOCAB = [
+    "知识图谱", "大模型", "MCP协议", "ReAct循环", "状态机", "工具调用", "上下文", "向量检索",
+    "SQLite", "索引", "事务", "并发", "缓存", "延迟", "吞吐", "解耦", "Agent", "Prompt",
+    "学习笔记", "今天", "发现", "实现了", "非常", "重要", "因为", "所以", "可以", "用来",
+]
+
+
+def generate_note_text(rng: random.Random, paragraphs: int = 5, headings: bool = True) -> str:
+    """生成一篇带标题层级的中文 Markdown 笔记"""
+    lines = [f"# 笔记 {rng.randint(1, 10 ** 6)}", ""]
+    for p in range(paragraphs):
+        if headings and p % 2 == 0:
+            lines.append(f"{'#' * rng.randint(2, 3)} 小节 {p + 1}")
+            lines.append("")
+        words = [rng.choice(_VOCAB) for _ in range(rng.randint(20, 80))]
+        lines.append("".join(words) + "。")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_vault(root: str, num_notes: int, max_depth: int = 3, fanout: int = 8,
+                   paragraphs: int = 5, non_markdown_ratio: float = 0.1, seed: int = 42) -> list:
+    """
+    在 root 下生成嵌套目录结构的笔记库 (掺杂少量非 .md 文件)，返回生成的 .md 路径列表。
+    """
+    rng = random.Random(seed)
+    dirs = [root]
+    frontier = [(root, 0)]
+    while frontier and len(dirs) < max(1, num_notes // 20):
+        parent, depth = frontier.pop(0)
+        if depth >= max_depth:
+            continue
+        for i in range(fanout):
+            child = os.path.join(parent, f"目录_{depth}_{i}")
+            os.makedirs(child, exist_ok=True)
+            dirs.append(child)
+            frontier.append((child, depth + 1))
+
+    paths = []
+    for n in range(num_notes):
+        directory = rng.choice(dirs)
+        path = os.path.join(directory, f"笔记_{n}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_note_text(rng, paragraphs))
+        paths.append(path)
+        if rng.random() < non_markdown_ratio:
+            with open(os.path.join(directory, f"附件_{n}.png"), "wb") as f:
+                f.write(b"\x89PNG")
+    return paths
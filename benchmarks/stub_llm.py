@@ -0,0 +1,93 @@
+"""
+基准测试用的桩模型 (不联网)
+
+- StubLLMClient：接口与 LLMClient.create 相同，按句切词生成三元组，用于离线入库流水线
+  (benchmarks.bench_ingest，以及 main.py --mode ingest --stub-llm 验证流程)
+- ToolCallingCompletions：替换 AsyncOpenAI 的 chat.completions，第一轮按脚本调用三个工具、第二轮回答，
+  用于端到端的 Agent 基准 (benchmarks.bench_tracing、benchmarks.suite)
+"""
+
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from database.tokenizer import query_terms
+
+_SENTENCE_END = re.compile(r"[。！？!?；;\n]+")
+
+
+class StubLLMClient:
+    """
+    本地桩客户端：接口与 LLMClient.create 相同，但不联网，用于离线验证入库流水线和基准测试。
+    把最后一条用户消息的正文 (第一个空行之后) 按句切开，句中相邻的两个词组成 (词, "相关", 词) 三元组，
+    以 {"triplets": [...]} 的 JSON 返回；latency 秒模拟网络往返。
+    """
+
+    def __init__(self, latency: float = 0.0, max_triplets: int = 20):
+        self.latency = latency
+        self.max_triplets = max_triplets
+        self.calls = 0
+        self.retries = 0
+
+    def extract(self, text: str) -> list:
+        triplets = []
+        for sentence in _SENTENCE_END.split(text):
+            terms = [t for t in query_terms(sentence) if len(t) >= 2]
+            for source, target in zip(terms, terms[1:]):
+                if source != target:
+                    triplets.append({"source_entity": source, "relation": "相关", "target_entity": target})
+                if len(triplets) >= self.max_triplets:
+                    return triplets
+        return triplets
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = next(m["content"] for m in reversed(kwargs["messages"]) if m["role"] == "user")
+        body = prompt.split("\n\n", 1)[-1]
+        content = json.dumps({"triplets": self.extract(body)}, ensure_ascii=False)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content, tool_calls=None))],
+            # 粗略估算的 token 数，供统计使用
+            usage=SimpleNamespace(prompt_tokens=len(prompt), completion_tokens=len(content) // 2),
+        )
+
+
+class ToolCallingCompletions:
+    """桩模型：第一轮并发调用三个工具 (每个问题的实体不同，不命中结果缓存)，看到工具结果后回答"""
+
+    def __init__(self, num_entities: int, note_path: str, delay_s: float = 0.02):
+        self.num_entities = num_entities
+        self.note_path = note_path
+        self.delay_s = delay_s
+        self.rng = random.Random(5)
+
+    async def create(self, model, messages, tools=None):
+        await asyncio.sleep(self.delay_s)
+        if not any(m["role"] == "tool" for m in messages):
+            entity = f"实体_{self.rng.randint(1, self.num_entities)}"
+            start = self.rng.randint(1, 2000)
+            calls = [
+                ("query_knowledge_graph_tool",
+                 {"sql_query": f"SELECT relation, target_entity FROM knowledge_triplets WHERE source_entity = '{entity}'"}),
+                ("graph_neighbors_tool", {"entity": entity, "limit": 20}),
+                ("read_note_range_tool", {"filepath": self.note_path, "start": start, "end": start + 40}),
+            ]
+            message = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{i}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}}
+                for i, (name, arguments) in enumerate(calls)]}
+            finish = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "桩回答"}
+            finish = "stop"
+        return ChatCompletion.model_validate({
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": finish, "message": message}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        })
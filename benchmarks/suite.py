@@ -0,0 +1,400 @@
+"""
+回归基准测试套件：用固定种子的合成数据跑一组小而稳定的场景，结果写成 JSON，便于在不同提交之间对比
+
+在临时目录中生成随机三元组图 (generate_graph) 和嵌套目录的中文笔记库 (generate_vault)，依次运行：
+  insert.single      add_knowledge_triplet 逐条写入 (组提交路径)
+  insert.batch       add_knowledge_triplets_batch 每次 100 条
+  query.point        query_knowledge_graph 按实体等值查询
+  query.page         对整个视图 SELECT *，只取第一页
+  graph.index_build  内存邻接索引全量构建
+  graph.neighbors    graph_neighbors
+  graph.k_hop        graph_k_hop (2 跳)
+  search.fts         search (三元组 + 笔记分块)
+  notes.list         list_my_notes 第一页
+  notes.read         read_note_content
+  notes.range        read_note_range (40 行)
+  mcp.stdio.startup  启动 server.py 子进程 + initialize + list_tools
+  mcp.stdio.call     同一个 stdio 会话上轮流调用 SQL 查询 / 图邻居 / 笔记读取工具
+  agent.stdio        完整的 Agent 问答：stdio Server + 按脚本调用上面三个工具的桩模型 (不联网、无模拟延迟)
+每个场景都用由场景名派生的随机种子生成输入，单独运行 (--only) 时输入也相同。
+结果连同提交号和运行环境写入 JSON (默认 bench_results/<提交号>-<规模>.json)；
+--compare 与之前的结果文件逐项对比，变慢超过 --threshold 的指标会被标出，--strict 时以退出码 1 结束。
+
+用法: python -m benchmarks.suite [--size small|medium] [--only insert,notes] [--output FILE] [--compare FILE]
+需要安装 mcp。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.common import print_table, summarize, timer
+from benchmarks.generators import generate_graph, generate_vault
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE_VERSION = 1
+SEED = 20240601
+
+SIZES = {
+    "small": {"edges": 20_000, "notes": 200, "ops": 200, "mcp_calls": 60, "agent_queries": 10, "startups": 3},
+    "medium": {"edges": 200_000, "notes": 2_000, "ops": 1_000, "mcp_calls": 300, "agent_queries": 30, "startups": 5},
+}
+
+# 参与对比的指标：以 _ms 结尾的越小越好，以 _per_s 结尾的越大越好
+_COMPARED = ("p50_ms", "p95_ms", "ops_per_s", "rows_per_s")
+_SEARCH_QUERIES = ["知识图谱", "向量检索", "MCP协议", "并发 缓存", "事务", "上下文", "ReAct循环", "SQLite 索引"]
+
+
+def _rng(name: str) -> random.Random:
+    return random.Random(f"{SEED}:{name}")
+
+
+def _latency(samples: list, errors: int = 0) -> dict:
+    stats = summarize(samples)
+    return {
+        "ops": stats["count"],
+        "p50_ms": stats["p50_ms"],
+        "p95_ms": stats["p95_ms"],
+        "ops_per_s": len(samples) / sum(samples) if samples else 0.0,
+        "errors": errors,
+    }
+
+
+def _time_calls(fn, calls) -> dict:
+    """逐个执行 fn(*args)，返回延迟统计；返回失败提示的调用计入 errors"""
+    import server
+
+    samples = []
+    errors = 0
+    for args in calls:
+        with timer() as t:
+            result = fn(*args)
+        samples.append(t["elapsed"])
+        errors += not server._succeeded(result)
+    return _latency(samples, errors)
+
+
+def _entity(rng: random.Random, ctx) -> str:
+    return f"实体_{rng.randint(1, ctx.num_entities)}"
+
+
+# ---------- 进程内：数据库与笔记工具 ----------
+
+def insert_single(ctx) -> dict:
+    from database.sqlite_db import add_knowledge_triplet
+    rng = _rng("insert.single")
+    rows = [(f"新实体_{i}", f"关系_{rng.randint(1, 20)}", _entity(rng, ctx), "suite.md") for i in range(ctx.ops)]
+    return _time_calls(add_knowledge_triplet, rows)
+
+
+def insert_batch(ctx) -> dict:
+    from database.sqlite_db import add_knowledge_triplets_batch
+    rng = _rng("insert.batch")
+    batch_size = 100
+    calls = []
+    for b in range(max(1, ctx.ops // 10)):
+        triplets = [{"source_entity": f"批量实体_{b}_{i}", "relation": f"关系_{rng.randint(1, 20)}",
+                     "target_entity": _entity(rng, ctx)} for i in range(batch_size)]
+        calls.append((triplets, f"suite_batch_{b}.md"))
+    result = _time_calls(add_knowledge_triplets_batch, calls)
+    result["rows_per_s"] = result["ops_per_s"] * batch_size
+    return result
+
+
+def query_point(ctx) -> dict:
+    from database.sqlite_db import query_knowledge_graph
+    rng = _rng("query.point")
+    return _time_calls(query_knowledge_graph, [
+        (f"SELECT relation, target_entity FROM knowledge_triplets WHERE source_entity = '{_entity(rng, ctx)}'",)
+        for _ in range(ctx.ops)
+    ])
+
+
+def query_page(ctx) -> dict:
+    from database.sqlite_db import query_knowledge_graph
+    return _time_calls(query_knowledge_graph, [("SELECT * FROM knowledge_triplets",)] * max(1, ctx.ops // 10))
+
+
+def graph_index_build(ctx) -> dict:
+    from tools.graph_traversal import GraphIndex
+    samples = []
+    for _ in range(3):
+        with timer() as t:
+            GraphIndex().refresh()
+        samples.append(t["elapsed"])
+    return _latency(samples)
+
+
+def graph_neighbors(ctx) -> dict:
+    from tools.graph_traversal import graph_neighbors as neighbors, get_graph_index
+    get_graph_index()
+    rng = _rng("graph.neighbors")
+    return _time_calls(neighbors, [(_entity(rng, ctx),) for _ in range(ctx.ops)])
+
+
+def graph_k_hop(ctx) -> dict:
+    from tools.graph_traversal import graph_k_hop as k_hop, get_graph_index
+    get_graph_index()
+    rng = _rng("graph.k_hop")
+    return _time_calls(k_hop, [(_entity(rng, ctx), 2) for _ in range(max(1, ctx.ops // 2))])
+
+
+def search_fts(ctx) -> dict:
+    from tools.search_tools import search
+    rng = _rng("search.fts")
+    return _time_calls(search, [(rng.choice(_SEARCH_QUERIES),) for _ in range(max(1, ctx.ops // 2))])
+
+
+def notes_list(ctx) -> dict:
+    from tools.file_tools import list_my_notes
+    return _time_calls(list_my_notes, [(ctx.vault, -1, "*.md", "", 50)] * max(1, ctx.ops // 4))
+
+
+def notes_read(ctx) -> dict:
+    from tools.file_tools import read_note_content
+    rng = _rng("notes.read")
+    return _time_calls(read_note_content, [(rng.choice(ctx.note_paths),) for _ in range(ctx.ops)])
+
+
+def notes_range(ctx) -> dict:
+    from tools.note_reader import read_note_range
+    rng = _rng("notes.range")
+    calls = []
+    for _ in range(ctx.ops):
+        start = rng.randint(1, 10)
+        calls.append((rng.choice(ctx.note_paths), start, start + 40))
+    return _time_calls(read_note_range, calls)
+
+
+# ---------- MCP 往返 (stdio 子进程 Server) ----------
+
+def mcp_stdio_startup(ctx) -> dict:
+    from core.session import MCPConnection
+
+    async def run():
+        samples = []
+        for _ in range(ctx.startups):
+            with timer() as t:
+                async with MCPConnection() as conn:
+                    await conn.load_tools(refresh=True)
+            samples.append(t["elapsed"])
+        return samples
+
+    return _latency(asyncio.run(run()))
+
+
+def mcp_stdio_call(ctx) -> dict:
+    from core.session import MCPConnection
+    rng = _rng("mcp.stdio.call")
+    calls = []
+    for i in range(ctx.mcp_calls):
+        entity = _entity(rng, ctx)
+        calls.append([
+            ("query_knowledge_graph_tool",
+             {"sql_query": f"SELECT relation, target_entity FROM knowledge_triplets WHERE source_entity = '{entity}'"}),
+            ("graph_neighbors_tool", {"entity": entity, "limit": 20}),
+            ("read_note_range_tool", {"filepath": rng.choice(ctx.note_paths), "start": i % 10 + 1, "end": i % 10 + 41}),
+        ][i % 3])
+
+    async def run():
+        samples = []
+        errors = 0
+        async with MCPConnection() as conn:
+            for name, arguments in calls:
+                with timer() as t:
+                    result = await conn.session.call_tool(name, arguments=arguments)
+                samples.append(t["elapsed"])
+                errors += bool(result.isError)
+        return _latency(samples, errors)
+
+    return asyncio.run(run())
+
+
+def agent_stdio(ctx) -> dict:
+    from benchmarks.stub_llm import ToolCallingCompletions
+    from core.agent import DeepContextAgent
+    from core.llm_client import LLMClient
+    from core.session import MCPConnection
+
+    completions = ToolCallingCompletions(ctx.num_entities, ctx.note_paths[0], delay_s=0)
+    completions.rng = _rng("agent.stdio")
+    llm = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=completions)), requests_per_second=0,
+                    cache_mode="off")
+    agent = DeepContextAgent(llm_client=llm, verbose=False, streaming=False)
+
+    async def run():
+        samples = []
+        errors = 0
+        async with MCPConnection() as conn:
+            for i in range(ctx.agent_queries):
+                with timer() as t:
+                    result = await agent.run_query(conn, f"问题 {i}")
+                samples.append(t["elapsed"])
+                errors += result["answer"] is None
+        return _latency(samples, errors)
+
+    return asyncio.run(run())
+
+
+CASES = [
+    ("insert.single", insert_single),
+    ("insert.batch", insert_batch),
+    ("query.point", query_point),
+    ("query.page", query_page),
+    ("graph.index_build", graph_index_build),
+    ("graph.neighbors", graph_neighbors),
+    ("graph.k_hop", graph_k_hop),
+    ("search.fts", search_fts),
+    ("notes.list", notes_list),
+    ("notes.read", notes_read),
+    ("notes.range", notes_range),
+    ("mcp.stdio.startup", mcp_stdio_startup),
+    ("mcp.stdio.call", mcp_stdio_call),
+    ("agent.stdio", agent_stdio),
+]
+
+
+# ---------- 运行、保存与对比 ----------
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": np.__version__,
+    }
+
+
+def setup(workdir: str, params: dict):
+    """在 workdir 中生成数据库和笔记库，返回场景共用的上下文"""
+    from database.connection import get_manager
+    from database.sqlite_db import init_db
+    from tools.file_tools import index_note_chunks
+
+    init_db()
+    with get_manager().writer() as conn:
+        num_entities = generate_graph(conn, params["edges"], seed=SEED)
+    vault = os.path.join(workdir, "vault")
+    os.makedirs(vault)
+    notes = generate_vault(vault, params["notes"], seed=SEED)
+    for path in notes:
+        index_note_chunks(path)
+    return SimpleNamespace(num_entities=num_entities, vault=vault, note_paths=notes, **params)
+
+
+def run_suite(size: str, only=None) -> dict:
+    params = SIZES[size]
+    selected = [(name, fn) for name, fn in CASES if not only or any(name.startswith(p) for p in only)]
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="deepcontext_suite_") as workdir:
+        # 进程内的工具和 stdio 子进程 Server 都按工作目录下的 DB_PATH 打开数据库，切到临时目录
+        os.chdir(workdir)
+        try:
+            with timer() as setup_time:
+                ctx = setup(workdir, params)
+            print(f"🧪 数据准备完成 ({setup_time['elapsed']:.1f} s)：{params['edges']} 条三元组，"
+                  f"{ctx.num_entities} 个实体，{len(ctx.note_paths)} 篇笔记", file=sys.stderr)
+            for name, fn in selected:
+                with timer() as t:
+                    results[name] = fn(ctx)
+                print(f"  {name:<18} {t['elapsed']:6.1f} s", file=sys.stderr)
+        finally:
+            from database.connection import close_manager
+            close_manager()
+            os.chdir(cwd)
+
+    commit = _git("rev-parse", "HEAD") or None
+    return {
+        "suite_version": SUITE_VERSION,
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")) if commit else None,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "size": size,
+        "params": params,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """打印逐项对比，返回变差超过阈值的指标数"""
+    rows = []
+    regressions = 0
+    for case, metrics in current["results"].items():
+        old = baseline["results"].get(case)
+        if old is None:
+            continue
+        for metric in _COMPARED:
+            if not old.get(metric) or metric not in metrics:
+                continue
+            change = metrics[metric] / old[metric] - 1
+            worse = change > threshold if metric.endswith("_ms") else change < -threshold
+            regressions += worse
+            rows.append({"case": case, "metric": metric, "baseline": old[metric], "current": metrics[metric],
+                         "change": f"{change:+.1%}", "": "⚠️" if worse else ""})
+        if metrics.get("errors", 0) > old.get("errors", 0):
+            regressions += 1
+            rows.append({"case": case, "metric": "errors", "baseline": old.get("errors", 0),
+                         "current": metrics["errors"], "change": "", "": "⚠️"})
+    label = (baseline.get("commit") or "?")[:10]
+    if baseline.get("size") != current["size"] or baseline.get("environment") != current["environment"]:
+        print("注意：基线的数据规模或运行环境与本次不同，对比结果仅供参考。", file=sys.stderr)
+    print_table(f"与基线 {label} 对比 (阈值 {threshold:.0%}，{regressions} 项变差)", rows)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeepContext 回归基准测试套件")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--only", type=str, default="", help="只运行名字以这些前缀开头的场景，逗号分隔 (如 insert,mcp)")
+    parser.add_argument("--output", type=str, default="", help="结果 JSON 路径，默认 bench_results/<提交号>-<规模>.json")
+    parser.add_argument("--compare", type=str, default="", help="与之前的结果 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="对比时视为变差的相对变化")
+    parser.add_argument("--strict", action="store_true", help="有指标变差时以退出码 1 结束")
+    args = parser.parse_args()
+
+    only = [p.strip() for p in args.only.split(",") if p.strip()]
+    report = run_suite(args.size, only)
+
+    print_table(f"回归基准 ({args.size})", [
+        {"case": name, "ops": r["ops"], "errors": r["errors"], "p50 ms": r["p50_ms"], "p95 ms": r["p95_ms"],
+         "ops/s": r["ops_per_s"]}
+        for name, r in report["results"].items()
+    ])
+
+    output = args.output or os.path.join(
+        ROOT, "bench_results", f"{(report['commit'] or 'nogit')[:10]}-{args.size}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions and args.strict:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,70 @@ from .settings import *
 __all__ = [
     'DEEPSEEK_API_KEY',
     'DB_PATH',
+    'SNAPSHOT_PATH',
+    'DB_READ_POOL_SIZE',
+    'DB_BUSY_TIMEOUT_MS',
+    'DB_SYNCHRONOUS',
+    'DB_CACHE_SIZE_KB',
+    'DB_MMAP_SIZE',
+    'GROUP_COMMIT_MAX_BATCH',
+    'BATCH_INGEST_MAX_ROWS',
+    'NOTE_LIST_PAGE_SIZE',
+    'NOTE_LIST_MAX_PAGE_SIZE',
+    'NOTE_READ_MAX_BYTES',
+    'NOTE_MMAP_THRESHOLD',
+    'NOTE_OUTLINE_CACHE_SIZE',
+    'NOTE_CHUNK_BYTES',
+    'SEARCH_DEFAULT_LIMIT',
+    'SEARCH_MAX_LIMIT',
+    'VECTOR_DIM',
+    'VECTOR_DTYPE',
+    'VECTOR_SEARCH_BLOCK',
+    'VECTOR_ANN_MIN_ROWS',
+    'VECTOR_ANN_NPROBE',
+    'ENTITY_RESOLUTION',
+    'ENTITY_FUZZY_THRESHOLD',
+    'ENTITY_FUZZY_MIN_LENGTH',
+    'ENTITY_BLOCK_SCAN_LIMIT',
+    'QUERY_MAX_ROWS',
+    'QUERY_MAX_CHARS',
+    'QUERY_FETCH_BATCH',
+    'QUERY_TIMEOUT_MS',
+    'QUERY_MAX_VM_STEPS',
+    'QUERY_PROGRESS_INTERVAL',
+    'QUERY_GUARD_LARGE_ROWS',
+    'TOOL_CACHE_MAX_ENTRIES',
+    'TOOL_CACHE_MAX_BYTES',
+    'TOOL_THREAD_POOL_SIZE',
+    'TOOL_DEFAULT_CONCURRENCY',
+    'TOOL_CONCURRENCY_LIMITS',
     'MAX_TURNS',
+    'AGENT_TOOL_CONCURRENCY',
+    'AGENT_STREAMING',
+    'MCP_TRANSPORT',
+    'MCP_HTTP_HOST',
+    'MCP_HTTP_PORT',
+    'MCP_SERVER_URL',
+    'LLM_REQUESTS_PER_SECOND',
+    'LLM_BURST',
+    'LLM_MAX_RETRIES',
+    'LLM_RETRY_BASE_DELAY',
+    'LLM_RETRY_MAX_DELAY',
+    'LLM_CACHE_MODE',
+    'LLM_CACHE_PATH',
+    'LLM_CACHE_MAX_BYTES',
+    'BATCH_CONCURRENCY',
+    'BATCH_MCP_SESSIONS',
+    'INGEST_CONCURRENCY',
+    'INGEST_CHUNK_BYTES',
+    'INGEST_WRITE_BATCH',
+    'INGEST_MAX_TRIPLETS_PER_CHUNK',
+    'CONTEXT_MAX_TOKENS',
+    'TOOL_RESULT_MAX_TOKENS',
+    'CONTEXT_KEEP_RECENT_TURNS',
+    'LOG_LEVEL',
+    'TRACE_EXPORT',
+    'TRACE_PATH',
+    'TRACE_FLUSH_SPANS',
     'BASE_URL'
 ]
\ No newline at end of file
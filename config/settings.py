@@ -10,8 +10,113 @@ BASE_URL = "https://api.deepseek.com"
 # 数据库配置
 DB_PATH = "deepcontext_graph.db"
 
+# 图谱快照配置 (列式二进制文件：int32 编码的三元组列 + 实体 / 关系 / 来源文件字符串表，可内存映射加载)
+SNAPSHOT_PATH = "deepcontext_graph.snap"
+
+# 数据库连接池配置 (WAL 模式下写连接独占，读连接池并发读取)
+DB_READ_POOL_SIZE = 4            # 只读连接池大小
+DB_BUSY_TIMEOUT_MS = 5000        # 锁等待超时 (毫秒)
+DB_SYNCHRONOUS = "NORMAL"        # WAL 模式下 NORMAL 即可保证不损坏，且无需每次提交 fsync
+DB_CACHE_SIZE_KB = 64 * 1024     # 每个连接的页缓存大小 (KB)
+DB_MMAP_SIZE = 256 * 1024 * 1024 # 内存映射读取的上限 (字节)
+
+# 批量写入配置
+GROUP_COMMIT_MAX_BATCH = 256     # 组提交时一个事务最多合并的单条写入数
+BATCH_INGEST_MAX_ROWS = 5000     # 单次批量写入工具最多接受的三元组数
+
+# 笔记扫描配置
+NOTE_LIST_PAGE_SIZE = 200        # list_my_notes 每页默认返回的笔记数
+NOTE_LIST_MAX_PAGE_SIZE = 1000   # 单页上限，防止一次工具返回撑爆大模型上下文
+
+# 笔记读取配置
+NOTE_READ_MAX_BYTES = 16 * 1024          # 单次读取工具最多返回的字节数 (约 5000 个汉字)
+NOTE_MMAP_THRESHOLD = 256 * 1024         # 超过该大小的笔记使用内存映射读取
+NOTE_OUTLINE_CACHE_SIZE = 256            # 缓存多少篇笔记的标题/行偏移索引
+NOTE_CHUNK_BYTES = 2048                  # 全文检索时笔记分块的目标大小
+
+# 全文检索配置
+SEARCH_DEFAULT_LIMIT = 10                # search 工具默认返回的结果数
+SEARCH_MAX_LIMIT = 50
+
+# 语义检索配置 (本地哈希向量化，向量以 NumPy 文件保存在数据库旁的 <DB_PATH>.vectors/ 目录)
+VECTOR_DIM = 256                         # 向量维度
+VECTOR_DTYPE = "int8"                    # int8 (体积为 float32 的 1/4) 或 float32
+VECTOR_SEARCH_BLOCK = 4096               # 检索时每批计算相似度的行数 (int8 会先转换成 float32，小块能留在 CPU 缓存里)
+VECTOR_ANN_MIN_ROWS = 200_000            # 向量数达到该值时改用 IVF 近似索引，0 表示始终暴力检索
+VECTOR_ANN_NPROBE = 16                   # IVF 检索时扫描的簇数，越大召回越高、越慢
+
+# 实体消歧配置 (写入三元组时把写法不同的同一实体归并到已有实体)
+ENTITY_RESOLUTION = True                 # 关闭后实体名按原样写入
+ENTITY_FUZZY_THRESHOLD = 0.85            # 模糊匹配的最低相似度 (0-1)，低于该值视为不同实体
+ENTITY_FUZZY_MIN_LENGTH = 5              # 规范化键短于该长度时只做精确匹配 (短名字差一个字往往就是另一个实体)
+ENTITY_BLOCK_SCAN_LIMIT = 1000           # 每次模糊匹配最多扫描的倒排条目数 (从最稀有的三元组开始)，使耗时不随实体数增长
+
+# SQL 查询结果配置 (query_knowledge_graph 分页返回)
+QUERY_MAX_ROWS = 200             # 每页最多返回的行数
+QUERY_MAX_CHARS = 12000          # 每页最多返回的字符数
+QUERY_FETCH_BATCH = 256          # 游标每次 fetchmany 的行数
+
+# SQL 查询守卫配置 (防止笛卡尔积、递归等失控查询拖垮 Server)
+QUERY_TIMEOUT_MS = 3000                  # 单条查询的最长执行时间
+QUERY_MAX_VM_STEPS = 200_000_000         # 单条查询最多执行的 SQLite 虚拟机指令数
+QUERY_PROGRESS_INTERVAL = 10_000         # 每执行多少条指令检查一次预算
+QUERY_GUARD_LARGE_ROWS = 50_000          # 行数超过该值的表视为大表，全表扫描会给出警告
+
+# 工具结果缓存配置 (只读工具，LRU + 总大小限制)
+TOOL_CACHE_MAX_ENTRIES = 1024            # 最多缓存的结果条数
+TOOL_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 缓存结果的总字节数上限
+
+# Server 工具执行配置 (阻塞的文件 / SQLite 操作放进线程池，不占用事件循环)
+TOOL_THREAD_POOL_SIZE = 16       # 执行工具调用的线程数，0 表示直接在事件循环中执行 (会阻塞其他客户端)
+TOOL_DEFAULT_CONCURRENCY = 8     # 未单独配置的工具同时执行的调用数上限
+TOOL_CONCURRENCY_LIMITS = {      # 按工具单独设置的并发上限，超出的调用在事件循环中排队，不占线程
+    "query_knowledge_graph": DB_READ_POOL_SIZE,  # 再多也只会在读连接池上等待
+    "search": DB_READ_POOL_SIZE,
+    "list_changed_notes": 2,     # 整个目录的扫描和哈希计算，I/O 开销大
+}
+
 # Agent 配置
 MAX_TURNS = 20  # 防御性编程：防止大模型死循环，最多允许执行20步
+AGENT_TOOL_CONCURRENCY = 4       # 同一轮中多个工具调用最多同时执行的个数 (1 表示逐个执行)
+AGENT_STREAMING = True           # 流式调用大模型：回答边生成边输出，参数完整的工具调用立即开始执行
+
+# MCP Server 配置
+MCP_TRANSPORT = "stdio"          # server.py 默认的传输方式：stdio 或 streamable-http
+MCP_HTTP_HOST = "127.0.0.1"      # streamable-http 模式只监听本机
+MCP_HTTP_PORT = 8765
+MCP_SERVER_URL = ""              # Agent 连接的常驻 Server 地址 (如 http://127.0.0.1:8765/mcp)，为空则每次启动子进程
+
+# 大模型调用配置 (多个 Agent 共享同一个客户端时生效)
+LLM_REQUESTS_PER_SECOND = 5      # 令牌桶速率：每秒最多发出的请求数，0 表示不限速
+LLM_BURST = 10                   # 令牌桶容量：允许的瞬时突发请求数
+LLM_MAX_RETRIES = 5              # 429 / 5xx / 网络错误的最大重试次数
+LLM_RETRY_BASE_DELAY = 1.0       # 指数退避的初始等待 (秒)
+LLM_RETRY_MAX_DELAY = 30.0       # 单次退避的最长等待 (秒)
+
+# 大模型响应缓存配置 (按请求内容哈希缓存到本地 SQLite 文件)
+LLM_CACHE_MODE = "off"           # off / cache (命中即返回) / record (总是联网并录制) / replay (只回放，不联网)
+LLM_CACHE_PATH = "deepcontext_llm_cache.db"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 缓存文件中响应的总大小上限 (压缩后)，超出时淘汰最久未使用的
+
+# 批量查询配置
+BATCH_CONCURRENCY = 8            # 同时运行的 Agent 数
+BATCH_MCP_SESSIONS = 1           # 共享的 MCP 会话数 (Agent 轮流使用)
+
+# 离线入库流水线配置 (python main.py --mode ingest)
+INGEST_CONCURRENCY = 8           # 同时进行的抽取请求数
+INGEST_CHUNK_BYTES = 6 * 1024    # 每次抽取发给大模型的笔记分块大小 (按章节和行边界切分)
+INGEST_WRITE_BATCH = 500         # 攒够多少条三元组写一次库 (没有更多待写结果时也会立即写)
+INGEST_MAX_TRIPLETS_PER_CHUNK = 100  # 单个分块最多接受的三元组数，超出部分丢弃 (防止模型输出失控)
+
+# 上下文管理配置 (token 为估算值：一个汉字约 1 token，英文约 4 个字符 1 token)
+CONTEXT_MAX_TOKENS = 24000       # 对话历史超过该值时，压缩较早轮次的工具结果
+TOOL_RESULT_MAX_TOKENS = 3000    # 单个工具返回超过该值时截断 (保留开头和结尾)
+CONTEXT_KEEP_RECENT_TURNS = 2    # 压缩时保留最近几轮的工具结果原文
 
 # 日志配置
-LOG_LEVEL = "INFO"
\ No newline at end of file
+LOG_LEVEL = "INFO"               # DEBUG / INFO / WARNING / ERROR，控制 Agent 过程日志和 Server 日志 (输出到标准错误)
+
+# 追踪配置 (Agent 轮次、大模型调用、MCP 工具调用往返、Server 端工具执行、SQL 执行的 span)
+TRACE_EXPORT = "off"             # off / jsonl (每行一个 span) / otlp (OpenTelemetry OTLP/JSON，每行一批)
+TRACE_PATH = "deepcontext_traces.jsonl"  # 客户端和 stdio 子进程 Server 追加写同一个文件
+TRACE_FLUSH_SPANS = 64           # 攒够多少个 span 写一次文件 (一个问题或一次工具调用结束时也会写出)
@@ -4,101 +4,176 @@ DeepContext Agent 核心引擎
 """
 
 import asyncio
-import json
-from openai import AsyncOpenAI
-from mcp.client.session import ClientSession
-from mcp.client.stdio import stdio_client, StdioServerParameters
+import logging
+import sys
+import time
 
-from config import DEEPSEEK_API_KEY, BASE_URL, MAX_TURNS
+from config import MAX_TURNS, MCP_SERVER_URL, AGENT_STREAMING
 from core.prompt import DEFAULT_USER_QUERY, SYSTEM_PROMPT
+from core.context import HistoryManager
+from core.llm_client import LLMClient, StreamAssembler
+from core.session import MCPConnection
+from core.tool_executor import ToolDispatcher, execute_tool_calls
+from tracing import get_logger, span
+
+logger = get_logger("agent")
+
+
+class _ConsolePrinter:
+    """把流式正文打印到控制台：每轮第一个片段前打印标题，穿插其它日志前先换行"""
+
+    def __init__(self):
+        self.started = False
+        self.open_line = False
+
+    def __call__(self, piece):
+        if not self.started:
+            print("\n💬 [Agent 输出]:")
+            self.started = True
+        sys.stdout.write(piece)
+        sys.stdout.flush()
+        self.open_line = not piece.endswith("\n")
+
+    def end_line(self):
+        if self.open_line:
+            print()
+            self.open_line = False
 
 
 class DeepContextAgent:
     """DeepContext 自主 Agent 类"""
     
-    def __init__(self):
-        self.llm_client = AsyncOpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=BASE_URL
-        )
-        self.server_params = StdioServerParameters(command="python", args=["server.py"])
+    def __init__(self, server_url=None, llm_client=None, verbose=True, streaming=None):
+        # 多个 Agent 并发运行时传入同一个 LLMClient，共享连接池、限速和重试
+        self.llm_client = llm_client or LLMClient()
+        # 为空时每次运行启动一个 server.py 子进程；否则连接到常驻的 DeepContext Server
+        self.server_url = server_url or MCP_SERVER_URL
+        self.verbose = verbose
+        # 流式调用：回答边生成边输出，参数完整的工具调用在模型生成其余内容时就开始执行
+        self.streaming = AGENT_STREAMING if streaming is None else streaming
     
-    async def run(self, user_query=None):
-        """运行 DeepContext Agent"""
+    def _log(self, message, level=logging.INFO):
+        """运行过程日志，受 LOG_LEVEL 控制；verbose=False (批量模式) 时不输出"""
+        if self.verbose:
+            logger.log(level, message)
+    
+    def connect(self):
+        """打开一个可在多次 run 之间复用的 MCP 会话：async with agent.connect() as conn: ..."""
+        return MCPConnection(self.server_url)
+    
+    async def run(self, user_query=None, connection=None, on_text=None):
+        """运行 DeepContext Agent，返回最终回答；传入 connection 时复用已有的 MCP 会话"""
         if user_query is None:
             user_query = DEFAULT_USER_QUERY
             
-        print("🚀 启动 DeepContext 自主 Agent...\n")
+        self._log("🚀 启动 DeepContext 自主 Agent...\n")
         
-        async with stdio_client(self.server_params) as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                
-                # 1. 动态加载所有技能 (包括读取和写入)
-                mcp_tools = await session.list_tools()
-                qwen_tools = [{
-                    "type": "function",
-                    "function": {
-                        "name": t.name,
-                        "description": t.description,
-                        "parameters": t.inputSchema
-                    }
-                } for t in mcp_tools.tools]
-                
-                # 2. 设置系统提示词和用户查询
-                print(f"🧑‍💻 [用户指令]:\n{user_query}\n")
-                
-                messages = [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_query}
-                ]
-                
-                # ==========================================================
-                # 3. 核心升级：引入 Agent 状态机循环 (ReAct Loop)
-                # ==========================================================
-                
-                for turn in range(MAX_TURNS):
-                    print(f"🔄 [Agent 思考轮次 {turn + 1}]...")
-                    
-                    response = await self.llm_client.chat.completions.create(
-                        model="deepseek-chat",
-                        messages=messages,
-                        tools=qwen_tools
-                    )
-                    
-                    assistant_message = response.choices[0].message
-                    messages.append(assistant_message) # 压栈：记录神探的决定
-                    
-                    # 情况 A：模型决定调用工具
-                    if assistant_message.tool_calls:
-                        for tool_call in assistant_message.tool_calls:
-                            func_name = tool_call.function.name
-                            func_args = json.loads(tool_call.function.arguments)
-                            
-                            print(f"  ⚡ [执行动作]: 正在调用 `{func_name}` \n  参数: {func_args}")
-                            
-                            # 执行本地 MCP 工具
-                            mcp_result = await session.call_tool(func_name, arguments=func_args)
-                            tool_result_text = mcp_result.content[0].text
-                            print(f"  📦 [工具返回]: {tool_result_text}")
-                            
-                            # 压栈：记录工具的执行结果
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "name": func_name,
-                                "content": tool_result_text
-                            })
-                        print("-" * 40)
-                        # 工具执行完后，进行下一次 for 循环，让大模型继续思考
-                        
-                    # 情况 B：模型没有调用工具，输出了普通文本，说明任务完成了！
-                    else:
-                        print(f"\n✅ [Agent 最终总结]:\n{assistant_message.content}")
-                        break # 跳出循环，任务结束
+        if connection is not None:
+            return (await self.run_query(connection, user_query, on_text))["answer"]
+        async with self.connect() as connection:
+            return (await self.run_query(connection, user_query, on_text))["answer"]
+
+    async def _complete(self, session, messages, tools, on_text=None):
+        """
+        调用一轮大模型。流式模式下参数完整的工具调用立即开始执行，正文片段交给 on_text (或打印到控制台)；
+        返回 (response, 本轮的工具结果消息列表, 首 token 延迟)
+        """
+        if not self.streaming:
+            response = await self.llm_client.create(model="deepseek-chat", messages=messages, tools=tools)
+            tool_calls = response.choices[0].message.tool_calls
+            if not tool_calls:
+                return response, [], None
+            return response, await execute_tool_calls(session, tool_calls, verbose=self.verbose), None
+
+        dispatcher = ToolDispatcher(session, verbose=self.verbose)
+        dispatch = dispatcher.dispatch
+        printer = None
+        if on_text is None and self.verbose:
+            on_text = printer = _ConsolePrinter()
+
+            def dispatch(tool_call):
+                printer.end_line()
+                dispatcher.dispatch(tool_call)
+        assembler = StreamAssembler(on_text, dispatch)
+        try:
+            response = await self.llm_client.stream(assembler, model="deepseek-chat", messages=messages, tools=tools)
+        except BaseException:
+            dispatcher.cancel()
+            raise
+        if printer is not None:
+            printer.end_line()
+        return response, await dispatcher.results(), assembler.first_token_s
+
+    async def run_query(self, connection, user_query, on_text=None):
+        """
+        在已打开的 MCP 会话上回答一个问题，返回 {"answer", "turns", "prompt_tokens"}；
+        answer 为 None 表示达到了最大轮次仍未得出结论。
+        流式模式下每个正文片段到达时调用 on_text(片段)，不传时 (verbose 模式) 打印到控制台。
+        """
+        with span("agent.query", query_chars=len(user_query), streaming=self.streaming) as query_span:
+            result = await self._react_loop(connection, user_query, on_text)
+            query_span.set(turns=result["turns"], answered=result["answer"] is not None,
+                           prompt_tokens=result["prompt_tokens"])
+        return result
+
+    async def _react_loop(self, connection, user_query, on_text):
+        # 1. 动态加载所有技能 (包括读取和写入)；同一个服务端的工具列表只获取一次
+        session = connection.session
+        qwen_tools = connection.tools
+        
+        # 2. 设置系统提示词和用户查询
+        self._log(f"🧑‍💻 [用户指令]:\n{user_query}\n")
+        
+        # 上下文管理器负责压缩过长/过期的工具结果，system 提示词始终保持不变
+        history = HistoryManager(SYSTEM_PROMPT)
+        history.add_user(user_query)
+        answer = None
+        
+        # ==========================================================
+        # 3. 核心升级：引入 Agent 状态机循环 (ReAct Loop)
+        # ==========================================================
+        
+        for turn in range(MAX_TURNS):
+            self._log(f"🔄 [Agent 思考轮次 {turn + 1}]...")
+            
+            # 同一轮中的多个工具调用相互独立，并发执行 (流式时边生成边执行)；结果按原顺序返回
+            with span("agent.turn", turn=turn + 1) as turn_span:
+                start = time.perf_counter()
+                response, tool_messages, first_token_s = await self._complete(
+                    session, history.build(), qwen_tools, on_text)
+                history.record_usage(response.usage)
+                history.record_timing(time.perf_counter() - start, first_token_s)
+                turn_span.set(tool_calls=len(tool_messages),
+                              first_token_ms=None if first_token_s is None else round(first_token_s * 1000, 1))
+            
+            assistant_message = response.choices[0].message
+            history.add_assistant(assistant_message) # 压栈：记录神探的决定
+            
+            # 情况 A：模型决定调用工具
+            if assistant_message.tool_calls:
+                history.add_tool_results(tool_messages)
+                self._log("-" * 40)
+                # 工具执行完后，进行下一次 for 循环，让大模型继续思考
                 
-                if turn == MAX_TURNS - 1:
-                    print("⚠️ 警告：达到了最大循环次数，Agent 可能陷入了死循环。")
+            # 情况 B：模型没有调用工具，输出了普通文本，说明任务完成了！
+            else:
+                answer = assistant_message.content
+                if self.streaming and on_text is None:
+                    self._log("\n✅ [Agent 最终总结]: 见上方输出")
+                elif self.verbose and on_text is None:
+                    # 最终回答是程序的输出而不是日志，不受 LOG_LEVEL 影响
+                    print(f"\n✅ [Agent 最终总结]:\n{answer}")
+                break # 跳出循环，任务结束
+        
+        if answer is None:
+            self._log("⚠️ 警告：达到了最大循环次数，Agent 可能陷入了死循环。", logging.WARNING)
+        
+        self._log(history.report())
+        return {
+            "answer": answer,
+            "turns": len(history.turn_stats),
+            "prompt_tokens": history.sent_tokens,
+        }
 
 
 # 兼容性函数，保持与原始代码的接口一致
@@ -0,0 +1,90 @@
+"""
+DeepContext 批量查询模块
+从 JSONL 文件读取问题，在一个进程内并发运行 N 个 Agent：
+它们共享同一个大模型客户端 (限速 + 重试) 和一组 MCP 会话，每完成一个问题就向输出文件追加一行结果
+"""
+
+import asyncio
+import json
+import sys
+import time
+from contextlib import AsyncExitStack
+
+from config import BATCH_CONCURRENCY, BATCH_MCP_SESSIONS
+from core.agent import DeepContextAgent
+
+
+def parse_query_line(line: str, line_no: int) -> dict:
+    """
+    解析一行输入，返回 {"id", "query"}。
+    支持 {"id": ..., "query": ...}，也支持 requests.jsonl 风格的 {"request_id", "title", "body"}。
+    """
+    record = json.loads(line)
+    query = record.get("query") or "\n".join(filter(None, [record.get("title"), record.get("body")]))
+    if not query:
+        raise ValueError("缺少 query (或 title / body) 字段")
+    return {"id": record.get("id") or record.get("request_id") or line_no, "query": query}
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = None, server_url: str = None,
+                    sessions: int = None, agent: DeepContextAgent = None) -> dict:
+    """
+    并发处理 input_path 中的全部问题，结果以 JSONL 流式写入 output_path ("-" 表示标准输出)。
+    每行结果包含 id、query、answer、error、turns、prompt_tokens 和 elapsed_s；返回汇总统计。
+    """
+    concurrency = max(1, concurrency or BATCH_CONCURRENCY)
+    sessions = max(1, min(concurrency, sessions or BATCH_MCP_SESSIONS))
+    agent = agent or DeepContextAgent(server_url, verbose=False)
+    # 有界队列：边读边处理，不会把上千行输入一次性读进内存
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"total": 0, "succeeded": 0, "failed": 0}
+
+    async with AsyncExitStack() as stack:
+        connections = [await stack.enter_async_context(agent.connect()) for _ in range(sessions)]
+        output = sys.stdout if output_path == "-" else stack.enter_context(open(output_path, "w", encoding="utf-8"))
+
+        def emit(record):
+            stats["total"] += 1
+            stats["failed" if record["error"] else "succeeded"] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+        async def produce():
+            with open(input_path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        await queue.put(parse_query_line(line, line_no))
+                    except (json.JSONDecodeError, ValueError) as e:
+                        emit({"id": line_no, "query": None, "answer": None,
+                              "error": f"第 {line_no} 行无法解析：{str(e)}",
+                              "turns": 0, "prompt_tokens": 0, "elapsed_s": 0.0})
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def work(worker_id: int):
+            connection = connections[worker_id % sessions]
+            while (item := await queue.get()) is not None:
+                start = time.perf_counter()
+                record = {"id": item["id"], "query": item["query"], "answer": None, "error": None,
+                          "turns": 0, "prompt_tokens": 0}
+                try:
+                    result = await agent.run_query(connection, item["query"])
+                    record.update(result)
+                    if result["answer"] is None:
+                        record["error"] = "达到最大循环次数仍未得出结论"
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {str(e)}"
+                record["elapsed_s"] = round(time.perf_counter() - start, 3)
+                emit(record)
+
+        start = time.perf_counter()
+        await asyncio.gather(produce(), *(work(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["queries_per_s"] = round(stats["total"] / elapsed, 3) if elapsed > 0 else 0.0
+    stats["llm_retries"] = getattr(agent.llm_client, "retries", 0)
+    stats["llm_cache_hits"] = getattr(agent.llm_client, "cache_hits", 0)
+    return stats
@@ -0,0 +1,169 @@
+"""
+DeepContext 对话上下文管理模块
+记录每条消息的 token 估算值，压缩过大的工具返回，并在历史超出预算时把较早的工具结果
+替换为可重新获取的简短引用，避免每轮都重发整篇笔记和整张查询结果表。
+system 提示词始终作为不变的第一条消息，压缩只在超出预算时成批进行，尽量保持前缀稳定以命中服务端的提示词缓存。
+"""
+
+import re
+
+from config import CONTEXT_MAX_TOKENS, TOOL_RESULT_MAX_TOKENS, CONTEXT_KEEP_RECENT_TURNS
+
+_CJK = re.compile(r"[　-〿぀-ヿ㐀-䶿一-鿿豈-﫿＀-￯가-힯]")
+_MESSAGE_OVERHEAD = 4  # 每条消息的角色、分隔符等固定开销
+
+
+def estimate_tokens(text) -> int:
+    """粗略估算 token 数：中日韩字符约 1 个 token，其余字符约 4 个一 token"""
+    if not text:
+        return 0
+    text = str(text)
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """把超出预算的文本截成 "开头 + 结尾"，中间注明省略了多少字符；结尾通常包含续读提示，因此保留"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = max(1, int(len(text) * max_tokens / tokens))
+    head, tail = keep * 3 // 4, keep // 4
+    omitted = len(text) - head - tail
+    return (f"{text[:head]}\n\n...(工具返回过长，已省略中间 {omitted} 个字符，"
+            f"需要时请用 read_note_range / read_note_section 分段读取)...\n\n{text[len(text) - tail:]}")
+
+
+def _assistant_to_dict(message) -> dict:
+    """把 SDK 返回的 assistant 消息对象转成普通 dict，保证序列化和 token 计数稳定"""
+    if isinstance(message, dict):
+        return message
+    result = {"role": "assistant", "content": message.content}
+    if message.tool_calls:
+        result["tool_calls"] = [{
+            "id": call.id,
+            "type": "function",
+            "function": {"name": call.function.name, "arguments": call.function.arguments},
+        } for call in message.tool_calls]
+    return result
+
+
+def _message_tokens(message: dict) -> int:
+    tokens = _MESSAGE_OVERHEAD + estimate_tokens(message.get("content"))
+    for call in message.get("tool_calls") or ():
+        tokens += estimate_tokens(call["function"]["name"]) + estimate_tokens(call["function"]["arguments"])
+    return tokens
+
+
+class HistoryManager:
+    """
+    管理一次 Agent 运行的消息列表。
+
+    - 工具返回超过 tool_result_max_tokens 时立即截断
+    - 发送前若总量超过 max_tokens，把最近 keep_recent_turns 轮之前的工具结果一次性替换为引用
+      (注明工具名和参数，大模型可以重新调用获取)；被替换的消息之后不再变化
+    - 每轮记录发送的 token 数 (估算值，以及服务端返回的实际值和缓存命中数) 和耗时 (流式调用时含首 token 延迟)
+    """
+
+    def __init__(self, system_prompt: str, max_tokens: int = None, tool_result_max_tokens: int = None,
+                 keep_recent_turns: int = None):
+        self.max_tokens = max_tokens or CONTEXT_MAX_TOKENS
+        self.tool_result_max_tokens = tool_result_max_tokens or TOOL_RESULT_MAX_TOKENS
+        self.keep_recent_turns = CONTEXT_KEEP_RECENT_TURNS if keep_recent_turns is None else keep_recent_turns
+        self._messages = [{"role": "system", "content": system_prompt}]
+        self._tokens = [_message_tokens(self._messages[0])]
+        self._turn_of = [0]                 # 每条消息属于第几轮 (每条 assistant 消息开启新的一轮)
+        self._compacted = set()             # 已被替换为引用的消息下标
+        self._tool_calls = {}               # tool_call_id -> (工具名, 参数 JSON)
+        self._turn = 0
+        self.turn_stats = []
+
+    def _append(self, message: dict):
+        self._messages.append(message)
+        self._tokens.append(_message_tokens(message))
+        self._turn_of.append(self._turn)
+
+    def add_user(self, content: str):
+        self._append({"role": "user", "content": content})
+
+    def add_assistant(self, message):
+        self._turn += 1
+        message = _assistant_to_dict(message)
+        for call in message.get("tool_calls") or ():
+            self._tool_calls[call["id"]] = (call["function"]["name"], call["function"]["arguments"])
+        self._append(message)
+
+    def add_tool_results(self, tool_messages):
+        for message in tool_messages:
+            content = truncate_text(message["content"] or "", self.tool_result_max_tokens)
+            self._append(dict(message, content=content))
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self._tokens)
+
+    def _compact(self):
+        """把较早轮次中尚未压缩的工具结果替换为引用"""
+        cutoff = self._turn - self.keep_recent_turns
+        for i, message in enumerate(self._messages):
+            if message["role"] != "tool" or i in self._compacted or self._turn_of[i] > cutoff:
+                continue
+            name, arguments = self._tool_calls.get(message["tool_call_id"], (message.get("name", ""), "{}"))
+            reference = (f"[较早的工具结果已省略 (约 {self._tokens[i]} tokens)。"
+                         f"如需再次查看，请重新调用 {name}，参数: {arguments}]")
+            self._messages[i] = dict(message, content=reference)
+            self._tokens[i] = _message_tokens(self._messages[i])
+            self._compacted.add(i)
+
+    def build(self) -> list:
+        """返回本轮要发送给大模型的消息列表 (超出预算时先压缩)，并记录本轮的 token 估算值"""
+        if self.total_tokens > self.max_tokens:
+            self._compact()
+        self.turn_stats.append({"turn": len(self.turn_stats) + 1, "estimated": self.total_tokens,
+                                "prompt_tokens": None, "cached_tokens": None,
+                                "first_token_s": None, "elapsed_s": None})
+        return list(self._messages)
+
+    def record_usage(self, usage):
+        """记录服务端返回的本轮实际 prompt token 数和缓存命中数 (DeepSeek / OpenAI 字段均兼容)"""
+        if usage is None or not self.turn_stats:
+            return
+        stats = self.turn_stats[-1]
+        stats["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None)
+        stats["cached_tokens"] = cached
+
+    def record_timing(self, elapsed_s: float, first_token_s: float = None):
+        """记录本轮的耗时 (从发出请求到工具全部返回) 和首 token 延迟"""
+        if self.turn_stats:
+            self.turn_stats[-1]["elapsed_s"] = elapsed_s
+            self.turn_stats[-1]["first_token_s"] = first_token_s
+
+    @property
+    def sent_tokens(self) -> int:
+        """本次运行累计发送的 prompt token 数 (有服务端实际值时优先使用)"""
+        return sum(s["prompt_tokens"] or s["estimated"] for s in self.turn_stats)
+
+    def report(self) -> str:
+        """每轮发送的 token 数汇总"""
+        if not self.turn_stats:
+            return "📏 [上下文统计]: 没有调用大模型。"
+        lines = ["📏 [上下文统计] 每轮发送的 prompt token 与耗时："]
+        for stats in self.turn_stats:
+            line = f"  第 {stats['turn']} 轮: 估算 {stats['estimated']}"
+            if stats["prompt_tokens"] is not None:
+                line += f"，实际 {stats['prompt_tokens']}"
+            if stats["cached_tokens"] is not None:
+                line += f" (缓存命中 {stats['cached_tokens']})"
+            if stats["elapsed_s"] is not None:
+                line += f"，耗时 {stats['elapsed_s'] * 1000:.0f} ms"
+            if stats["first_token_s"] is not None:
+                line += f" (首 token {stats['first_token_s'] * 1000:.0f} ms)"
+            lines.append(line)
+        total = self.sent_tokens
+        lines.append(f"  合计 {total}，平均每轮 {total // len(self.turn_stats)}")
+        return "\n".join(lines)
+
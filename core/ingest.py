@@ -0,0 +1,268 @@
+"""
+DeepContext 离线入库流水线
+不经过 ReAct 循环，也不受 MAX_TURNS 限制，一次运行即可处理整个笔记库：
+  扫描变化的笔记 -> 按章节切成分块 -> 有界 worker 池并发调用大模型抽取三元组 (JSON 输出)
+  -> 写入协程攒批写库 (三元组与分块检查点在同一个事务里) -> 一篇笔记的分块全部完成后记入笔记清单
+中断后重跑：已记入清单的笔记不会再出现在变化列表中，未完成笔记中已写入的分块按检查点跳过，不会重复调用大模型。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from config import INGEST_CONCURRENCY, INGEST_CHUNK_BYTES, INGEST_WRITE_BATCH, INGEST_MAX_TRIPLETS_PER_CHUNK
+from core.llm_client import LLMClient
+from core.prompt import EXTRACTION_PROMPT, EXTRACTION_USER_TEMPLATE
+from database.connection import get_manager
+from database.note_manifest import (
+    load_checkpoints,
+    record_checkpoints,
+    clear_checkpoints,
+    upsert_manifest,
+    delete_manifest,
+)
+from database.sqlite_db import insert_triplet_rows, normalize_triplet
+from tools.file_tools import index_note_chunks
+from tools.note_indexer import scan_note_changes, forget_notes, hash_file
+from tools.note_reader import iter_note_chunks
+from tracing import get_logger
+
+logger = get_logger("ingest")
+
+
+class NoteJob:
+    """一篇待处理的笔记：内容哈希、待抽取的分块，以及尚未写入 / 失败的分块数"""
+
+    def __init__(self, path: str, mtime_ns: int, size: int, content_hash: str, chunks: list, skipped: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content_hash = content_hash
+        self.chunks = chunks          # [(分块哈希, 章节标题, 正文)]
+        self.skipped = skipped        # 按检查点跳过的分块数
+        self.pending = len(chunks)
+        self.failed = 0
+        self.triplets = 0
+
+
+def prepare_note(path: str, chunk_bytes: int = INGEST_CHUNK_BYTES) -> NoteJob:
+    """
+    计算笔记的内容哈希并切分块，去掉检查点中已完成的分块。
+    没有有效检查点时先清理这篇笔记的旧三元组 (修改前的版本或上次运行留下的残缺结果)。
+    """
+    st = os.stat(path)
+    content_hash = hash_file(path)
+    done = load_checkpoints(path, content_hash)
+    if done is None:
+        forget_notes([path])
+        done = {}
+    chunks = {}
+    for heading, _, _, text in iter_note_chunks(Path(path), chunk_bytes=chunk_bytes):
+        chunk_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        if chunk_hash not in done:
+            chunks.setdefault(chunk_hash, (chunk_hash, heading, text))
+    return NoteJob(path, st.st_mtime_ns, st.st_size, content_hash, list(chunks.values()), len(done))
+
+
+def parse_triplets(content: str, source_file: str) -> list:
+    """
+    解析模型输出的 {"triplets": [...]}，返回 (source_entity, relation, target_entity, source_file) 行。
+    格式不完整的条目直接丢弃；整体不是合法 JSON 时抛出 ValueError。
+    """
+    text = (content or "").strip()
+    if text.startswith("```"):
+        # 个别模型仍会用 ```json 代码块包裹
+        text = text.strip("`").removeprefix("json").strip()
+    data = json.loads(text)
+    items = data.get("triplets") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("输出中没有 triplets 列表")
+    rows = []
+    for item in items[:INGEST_MAX_TRIPLETS_PER_CHUNK]:
+        if isinstance(item, dict):
+            # 来源一律使用笔记路径，不采信模型给出的 source_file
+            row, error = normalize_triplet({**item, "source_file": source_file}, source_file)
+            if not error:
+                rows.append(row)
+    return rows
+
+
+def _flush(batch) -> int:
+    """把一批分块的三元组和检查点写进同一个事务，返回新增的三元组数"""
+    rows = [row for _, _, triplets in batch if triplets for row in triplets]
+    checkpoints = [(job.path, chunk_hash, job.content_hash, len(triplets))
+                   for job, chunk_hash, triplets in batch if triplets is not None]
+    with get_manager().writer() as conn:
+        inserted = insert_triplet_rows(conn, rows) if rows else 0
+        record_checkpoints(conn, checkpoints)
+    return inserted
+
+
+def _finalize(jobs) -> list:
+    """为已完成的笔记建立检索分块并记入笔记清单，之后清除它们的检查点；返回完成的笔记"""
+    finished = []
+    for job in jobs:
+        try:
+            index_note_chunks(job.path)
+            finished.append(job)
+        except OSError:
+            pass   # 处理期间被删除：留给下次扫描清理
+    upsert_manifest((job.path, job.mtime_ns, job.size, job.content_hash) for job in finished)
+    clear_checkpoints(job.path for job in finished)
+    return finished
+
+
+class IngestPipeline:
+    """
+    离线入库流水线
+
+    生产者逐篇准备笔记并把分块放进有界队列 (大笔记库不会一次性读进内存)，
+    concurrency 个 worker 并发调用大模型，结果交给唯一的写入协程：
+    它把已经到达的结果攒成一批 (最多 INGEST_WRITE_BATCH 条三元组) 放到线程里写库，
+    写库期间到达的结果自然合并进下一批。
+    """
+
+    def __init__(self, llm_client=None, concurrency: int = None, chunk_bytes: int = None,
+                 model: str = "deepseek-chat", verbose: bool = True):
+        self.llm_client = llm_client or LLMClient()
+        self.concurrency = max(1, concurrency or INGEST_CONCURRENCY)
+        self.chunk_bytes = chunk_bytes or INGEST_CHUNK_BYTES
+        self.model = model
+        self.verbose = verbose
+        self.stats = {}
+
+    def _log(self, message, level=logging.INFO):
+        if self.verbose:
+            logger.log(level, message)
+
+    async def extract(self, job: NoteJob, heading: str, text: str) -> list:
+        """调用大模型抽取一个分块的三元组"""
+        response = await self.llm_client.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": EXTRACTION_PROMPT},
+                {"role": "user", "content": EXTRACTION_USER_TEMPLATE.format(
+                    source_file=job.path, heading=heading or "(无)", text=text)},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.stats["prompt_tokens"] += usage.prompt_tokens or 0
+            self.stats["completion_tokens"] += usage.completion_tokens or 0
+        return parse_triplets(response.choices[0].message.content, job.path)
+
+    async def run(self, directory: str) -> dict:
+        """处理目录下新增 / 修改过的全部笔记，返回汇总统计"""
+        self.stats = stats = {
+            "notes": 0, "notes_done": 0, "notes_incomplete": 0, "notes_deleted": 0,
+            "chunks": 0, "chunks_skipped": 0, "chunks_failed": 0,
+            "triplets_extracted": 0, "triplets_inserted": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+        start = time.perf_counter()
+
+        changes = await asyncio.to_thread(scan_note_changes, os.path.abspath(directory))
+        if changes["deleted"]:
+            await asyncio.to_thread(forget_notes, changes["deleted"])
+            await asyncio.to_thread(delete_manifest, changes["deleted"])
+        stats["notes_deleted"] = len(changes["deleted"])
+        paths = changes["new"] + changes["changed"]
+        stats["notes"] = len(paths)
+        self._log(f"📂 [离线入库] 待处理 {len(paths)} 篇笔记 (新增 {len(changes['new'])}，修改 {len(changes['changed'])})，"
+                  f"已删除 {len(changes['deleted'])} 篇，并发 {self.concurrency}")
+
+        chunk_queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        write_queue = asyncio.Queue()
+
+        async def produce():
+            for path in paths:
+                try:
+                    job = await asyncio.to_thread(prepare_note, path, self.chunk_bytes)
+                except (OSError, UnicodeError) as e:
+                    stats["notes_incomplete"] += 1
+                    self._log(f"⚠️ [跳过] {path}：{str(e)}", logging.WARNING)
+                    continue
+                stats["chunks"] += len(job.chunks) + job.skipped
+                stats["chunks_skipped"] += job.skipped
+                if not job.chunks:
+                    await write_queue.put((job, None, None))   # 分块都已完成，只需记入清单
+                for chunk in job.chunks:
+                    await chunk_queue.put((job, chunk))
+            for _ in range(self.concurrency):
+                await chunk_queue.put(None)
+
+        async def work():
+            while (item := await chunk_queue.get()) is not None:
+                job, (chunk_hash, heading, text) = item
+                try:
+                    triplets = await self.extract(job, heading, text)
+                except Exception as e:
+                    stats["chunks_failed"] += 1
+                    self._log(f"⚠️ [抽取失败] {job.path}「{heading}」：{type(e).__name__}: {str(e)}", logging.WARNING)
+                    triplets = None
+                await write_queue.put((job, chunk_hash, triplets))
+
+        async def write():
+            stop = False
+            while not stop:
+                item = await write_queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                rows = len(item[2] or ())
+                # 只合并此刻已经到达的结果，不为攒批而等待
+                while rows < INGEST_WRITE_BATCH and not write_queue.empty():
+                    item = write_queue.get_nowait()
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                    rows += len(item[2] or ())
+                stats["triplets_inserted"] += await asyncio.to_thread(_flush, batch)
+
+                completed = []
+                for job, chunk_hash, triplets in batch:
+                    if chunk_hash is not None:
+                        job.pending -= 1
+                        if triplets is None:
+                            job.failed += 1
+                        else:
+                            job.triplets += len(triplets)
+                            stats["triplets_extracted"] += len(triplets)
+                    if job.pending == 0:
+                        if job.failed:
+                            stats["notes_incomplete"] += 1
+                            self._log(f"⚠️ [未完成] {job.path}：{job.failed} 个分块抽取失败，下次运行时重试", logging.WARNING)
+                        else:
+                            completed.append(job)
+                if completed:
+                    for job in await asyncio.to_thread(_finalize, completed):
+                        stats["notes_done"] += 1
+                        self._log(f"✅ [已入库] {job.path}：{job.triplets} 条三元组")
+
+        writer = asyncio.create_task(write())
+        try:
+            await asyncio.gather(produce(), *(work() for _ in range(self.concurrency)))
+            await write_queue.put(None)
+            await writer
+        finally:
+            writer.cancel()
+
+        elapsed = time.perf_counter() - start
+        stats["llm_retries"] = getattr(self.llm_client, "retries", 0)
+        stats["llm_cache_hits"] = getattr(self.llm_client, "cache_hits", 0)
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["notes_per_s"] = round(stats["notes_done"] / elapsed, 3) if elapsed > 0 else 0.0
+        stats["triplets_per_s"] = round(stats["triplets_extracted"] / elapsed, 3) if elapsed > 0 else 0.0
+        return stats
+
+
+async def run_ingest(directory: str, concurrency: int = None, llm_client=None, verbose: bool = True) -> dict:
+    """离线处理目录下新增 / 修改过的笔记，返回汇总统计 (notes/s、triplets/s 等)"""
+    return await IngestPipeline(llm_client, concurrency, verbose=verbose).run(directory)
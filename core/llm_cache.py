@@ -0,0 +1,144 @@
+"""
+DeepContext 大模型响应缓存
+以请求内容 (模型、消息、工具定义及其他参数) 的哈希为键缓存 chat.completions 的响应，
+保存在本地 SQLite 文件中，总大小超过 LLM_CACHE_MAX_BYTES 时按最近使用时间淘汰。
+
+LLMClient 的缓存模式：
+  off     不使用缓存 (默认)
+  cache   命中直接返回，未命中才联网并写入缓存，重复的问题几乎零延迟
+  record  总是联网，并用新的响应覆盖缓存 (录制一次完整运行)
+  replay  只从缓存返回，未命中直接报错、不联网，用于离线、确定性地复现录制过的运行
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+
+MODES = ("off", "cache", "record", "replay")
+
+# 淘汰时一直删到总大小低于上限的这个比例，避免每写一条就淘汰一次
+_EVICT_TARGET = 0.9
+_EVICT_BATCH = 256
+
+
+class LLMCacheMiss(Exception):
+    """回放模式下缓存中没有这次请求的响应"""
+
+
+def _jsonable(value):
+    """SDK 对象 (pydantic 模型) 转成普通结构后再参与哈希"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+def request_key(kwargs: dict) -> str:
+    """请求参数的规范化 JSON (键排序) 的 SHA-256"""
+    canonical = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    磁盘上的响应缓存
+
+    响应以 zlib 压缩后的 JSON 保存；读写都很短，由一把锁串行化，可在多个 Agent 之间共享。
+    多个进程可以同时使用同一个缓存文件 (WAL 模式)，总大小以淘汰时重新统计的结果为准。
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,          -- 请求内容的 SHA-256
+                model TEXT NOT NULL,
+                body BLOB NOT NULL,            -- zlib 压缩的响应 JSON
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)")
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """返回缓存的响应 JSON，未命中时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: str, model: str, body: str):
+        """写入 (或覆盖) 一条响应，超出容量时淘汰最久未使用的条目"""
+        blob = zlib.compress(body.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, body, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, blob, len(blob), now, now),
+            )
+            self._total += len(blob) - (old[0] if old else 0)
+            self.stores += 1
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # 其他进程也可能写过同一个文件，淘汰前重新统计
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        target = self.max_bytes * _EVICT_TARGET
+        while self._total > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_responses ORDER BY last_used LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if self._total <= target:
+                    break
+                victims.append((key,))
+                self._total -= size
+            self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            return {"entries": entries, "bytes": self._total, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: str = LLM_CACHE_PATH) -> ResponseCache:
+    """获取进程级共享的缓存实例 (同一个文件只打开一次)"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ResponseCache(path)
+        return _caches[path]
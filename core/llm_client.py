@@ -0,0 +1,295 @@
+"""
+DeepContext 大模型调用模块
+多个 Agent 并发运行时共享一个 AsyncOpenAI 客户端：
+令牌桶限制每秒发出的请求数，遇到 429 / 5xx / 网络错误时按指数退避 (带随机抖动) 重试；
+可选的本地响应缓存 (见 core/llm_cache.py) 让重复的请求不再联网，也可以录制后离线回放；
+流式调用时由 StreamAssembler 拼装增量，参数完整的工具调用可以在模型生成其余内容时就开始执行
+"""
+
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+
+from config import (
+    DEEPSEEK_API_KEY,
+    BASE_URL,
+    LLM_REQUESTS_PER_SECOND,
+    LLM_BURST,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_CACHE_MODE,
+)
+from core.llm_cache import MODES as CACHE_MODES, LLMCacheMiss, get_response_cache, request_key
+from tracing import current_span, span
+
+
+class TokenBucket:
+    """异步令牌桶：按 rate 个/秒匀速补充，最多积累 capacity 个；rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # 持锁等待，保证先到的请求先拿到令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception):
+    """服务端通过 Retry-After 头给出的等待秒数 (没有则为 None)"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _record_usage(call_span, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        call_span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+_FINISH_REASONS = {"stop", "length", "tool_calls", "content_filter", "function_call"}
+
+
+def _is_complete_json(text: str) -> bool:
+    """参数文本是否已经是一个完整的 JSON 对象 (对象闭合后不可能再有有效的续写)"""
+    if not text.rstrip().endswith("}"):
+        return False
+    try:
+        return isinstance(json.loads(text), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+class StreamAssembler:
+    """
+    把流式返回的 ChatCompletionChunk 拼成完整的 ChatCompletion。
+
+    - 正文片段到达时立即交给 on_text(片段)
+    - 工具调用按 index 依次生成：参数一解析为完整的 JSON 对象，或者下一个调用开始、流结束时，
+      就把这个调用交给 on_tool_call(调用) (有 id 和 function.name / function.arguments 属性)，
+      不必等模型生成完其余的调用
+    - first_token_s / elapsed_s 记录首个增量和整个响应相对开始时的耗时
+    """
+
+    def __init__(self, on_text=None, on_tool_call=None):
+        self.on_text = on_text
+        self.on_tool_call = on_tool_call
+        self.started = False
+        self.first_token_s = None
+        self.elapsed_s = None
+        self._start = time.perf_counter()
+        self._meta = {"id": "", "created": 0, "model": ""}
+        self._text = []
+        self._calls = {}          # index -> {"id", "name", "arguments"}
+        self._dispatched = set()
+        self._finish_reason = None
+        self._usage = None
+
+    def _mark(self):
+        if self.first_token_s is None:
+            self.first_token_s = time.perf_counter() - self._start
+        self.started = True
+
+    def _dispatch(self, index: int):
+        if index in self._dispatched:
+            return
+        self._dispatched.add(index)
+        call = self._calls[index]
+        if self.on_tool_call is not None:
+            self.on_tool_call(SimpleNamespace(
+                id=call["id"], function=SimpleNamespace(name=call["name"], arguments=call["arguments"])))
+
+    def feed(self, chunk):
+        self._meta = {"id": chunk.id, "created": chunk.created, "model": chunk.model}
+        if getattr(chunk, "usage", None) is not None:
+            self._usage = chunk.usage
+        for choice in chunk.choices:
+            delta = choice.delta
+            if delta.content:
+                self._mark()
+                self._text.append(delta.content)
+                if self.on_text is not None:
+                    self.on_text(delta.content)
+            for part in delta.tool_calls or ():
+                self._mark()
+                # 新的调用开始：之前的调用都已生成完
+                for index in self._calls:
+                    if index < part.index:
+                        self._dispatch(index)
+                call = self._calls.setdefault(part.index, {"id": None, "name": "", "arguments": ""})
+                if part.id:
+                    call["id"] = part.id
+                if part.function is not None:
+                    call["name"] += part.function.name or ""
+                    call["arguments"] += part.function.arguments or ""
+                if call["name"] and _is_complete_json(call["arguments"]):
+                    self._dispatch(part.index)
+            if choice.finish_reason:
+                self._finish_reason = choice.finish_reason
+
+    def close(self) -> ChatCompletion:
+        """流结束：交出尚未交出的工具调用，返回完整的响应"""
+        for index in sorted(self._calls):
+            self._dispatch(index)
+        self.elapsed_s = time.perf_counter() - self._start
+        message = {"role": "assistant", "content": "".join(self._text) or None}
+        if self._calls:
+            message["tool_calls"] = [{
+                "id": call["id"], "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]},
+            } for _, call in sorted(self._calls.items())]
+        finish_reason = self._finish_reason if self._finish_reason in _FINISH_REASONS else "stop"
+        return ChatCompletion.model_validate({
+            **self._meta, "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            "usage": self._usage.model_dump() if self._usage is not None else None,
+        })
+
+    def replay(self, response):
+        """缓存命中：按流式的顺序回调完整的响应"""
+        self._mark()
+        message = response.choices[0].message
+        if message.content and self.on_text is not None:
+            self.on_text(message.content)
+        for call in message.tool_calls or ():
+            if self.on_tool_call is not None:
+                self.on_tool_call(call)
+        self.elapsed_s = time.perf_counter() - self._start
+
+
+class LLMClient:
+    """带限速、重试和可选响应缓存的 chat.completions 调用，可在多个 Agent 之间共享"""
+
+    def __init__(self, client: AsyncOpenAI = None, requests_per_second: float = None, burst: float = None,
+                 max_retries: int = None, cache_mode: str = None, cache=None):
+        # 关闭 SDK 自带的重试，由这里统一重试，保证每次重试也经过令牌桶
+        self.client = client or AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url=BASE_URL, max_retries=0)
+        rate = LLM_REQUESTS_PER_SECOND if requests_per_second is None else requests_per_second
+        self.bucket = TokenBucket(rate, LLM_BURST if burst is None else burst)
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retries = 0
+        self.cache_mode = cache_mode or LLM_CACHE_MODE
+        if self.cache_mode not in CACHE_MODES:
+            raise ValueError(f"缓存模式只能是 {' / '.join(CACHE_MODES)}，收到 {self.cache_mode!r}")
+        if self.cache_mode == "off":
+            self.cache = None
+        else:
+            self.cache = cache or get_response_cache()
+        self.cache_hits = 0
+
+    async def _lookup(self, kwargs):
+        """按缓存模式查找缓存的响应，返回 (响应或 None, 缓存键)；不使用缓存时缓存键为 None"""
+        if self.cache is None:
+            return None, None
+        key = request_key(kwargs)
+        if self.cache_mode != "record":
+            body = await asyncio.to_thread(self.cache.get, key)
+            if body is not None:
+                self.cache_hits += 1
+                return ChatCompletion.model_validate_json(body), key
+            if self.cache_mode == "replay":
+                raise LLMCacheMiss(f"回放模式下缓存中没有这次请求的响应 (key={key[:12]})，请先用 record 或 cache 模式运行一次")
+        return None, key
+
+    async def _store(self, key, kwargs, response):
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, kwargs.get("model", ""), response.model_dump_json())
+
+    async def create(self, **kwargs):
+        """等价于 client.chat.completions.create(**kwargs)，按缓存模式先查本地缓存"""
+        with span("llm.call", model=kwargs.get("model"), stream=False) as call_span:
+            response, key = await self._lookup(kwargs)
+            call_span.set(cache=self._cache_status(response, key))
+            if response is None:
+                response = await self._request(**kwargs)
+                await self._store(key, kwargs, response)
+            _record_usage(call_span, response)
+        return response
+
+    async def stream(self, assembler: "StreamAssembler", **kwargs):
+        """
+        流式调用：增量交给 assembler (正文片段、参数已完整的工具调用通过它的回调立即交出)，
+        返回拼装好的 ChatCompletion。与 create 共用缓存 (键中不含 stream 参数)，命中时按同样的顺序回调。
+        只有在收到第一个增量之前出错才会重试，已经交出的内容不会重复。
+        """
+        with span("llm.call", model=kwargs.get("model"), stream=True) as call_span:
+            response, key = await self._lookup(kwargs)
+            call_span.set(cache=self._cache_status(response, key))
+            if response is not None:
+                assembler.replay(response)
+                _record_usage(call_span, response)
+                return response
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire()
+                try:
+                    chunks = await self.client.chat.completions.create(
+                        stream=True, stream_options={"include_usage": True}, **kwargs)
+                    async for chunk in chunks:
+                        assembler.feed(chunk)
+                    break
+                except Exception as e:
+                    if assembler.started or attempt == self.max_retries or not _is_retryable(e):
+                        raise
+                    await self._backoff(e, attempt)
+            response = assembler.close()
+            await self._store(key, kwargs, response)
+            _record_usage(call_span, response)
+            if assembler.first_token_s is not None:
+                call_span.set(first_token_ms=round(assembler.first_token_s * 1000, 1))
+        return response
+
+    def _cache_status(self, response, key) -> str:
+        if self.cache is None:
+            return "off"
+        return "hit" if response is not None else ("record" if self.cache_mode == "record" else "miss")
+
+    async def _backoff(self, error: Exception, attempt: int):
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+        self.retries += 1
+        current_span().set(retries=attempt + 1)
+        await asyncio.sleep(delay)
+
+    async def _request(self, **kwargs):
+        """联网调用，遇到可重试的错误时退避重试"""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                await self._backoff(e, attempt)
+
@@ -21,13 +21,35 @@ SYSTEM_PROMPT = """
 
 工作流程：
 1. 首先了解用户需求
-2. 如果需要读取笔记，使用 list_my_notes 和 read_note_content 工具
-3. 从笔记内容中提取关键信息，使用 add_knowledge_triplet 存储到知识图谱
-4. 使用 query_knowledge_graph 查询知识图谱回答用户问题
+2. 如果需要把笔记整理进知识图谱，先用 list_changed_notes 找出新增或修改过的笔记，再用 read_note_content 读取
+3. 从笔记内容中提取关键信息，一篇笔记的全部三元组用 add_knowledge_triplets_batch 一次性存储到知识图谱
+   (source_file 使用 list_changed_notes 给出的完整路径)，完成后用 mark_notes_ingested 记录
+   较大的笔记先用 read_note_outline 查看大纲，再用 read_note_section 逐节读取
+4. 使用 query_knowledge_graph 查询知识图谱回答用户问题；不确定实体的准确名字时先用 search 全文检索
+   查询结果分页返回，结果较多时用 output_format="compact" 节省篇幅，需要时再用 offset 翻页
+5. 涉及多跳关系的问题 (如 "A 和 B 有什么联系")，使用 graph_neighbors / graph_k_hop / graph_shortest_path 一次完成遍历
 
 注意事项：
 - 只能读取 .md 文件，确保安全性
 - SQL 查询只能使用 SELECT 语句
 - 提取知识时要准确识别实体和关系
 - 回答要简洁明了
-"""
\ No newline at end of file
+- 较早轮次的工具结果可能被替换为 "已省略" 的引用，需要其中的内容时按引用中给出的参数重新调用工具
+"""
+
+# 离线入库流水线的抽取提示词 (core/ingest.py)；要求模型只输出 JSON
+EXTRACTION_PROMPT = """
+你是知识图谱构建助手，负责从笔记片段中提取知识三元组 (实体-关系-实体)。
+
+要求：
+- 实体是具体的概念、技术、工具、人物、项目等名词，使用简洁的规范名称 (如 "MCP协议")，同一实体在不同三元组中写法保持一致
+- 关系使用简短的动词或动词短语 (如 "作用于"、"属于"、"依赖")
+- 只提取片段中明确表达的事实，不要推测；没有可提取的知识时返回空列表
+- 只输出 JSON，格式为：{"triplets": [{"source_entity": "...", "relation": "...", "target_entity": "..."}]}
+"""
+
+# 抽取请求的用户消息：头部信息与正文之间空一行
+EXTRACTION_USER_TEMPLATE = """笔记：{source_file}
+章节：{heading}
+
+{text}"""
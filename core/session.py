@@ -0,0 +1,87 @@
+"""
+DeepContext MCP 会话模块
+负责连接 MCP Server：既可以像以前一样为本次运行启动一个 stdio 子进程，
+也可以通过 streamable HTTP 连到本机常驻的 DeepContext Server，在多次查询之间复用同一个会话。
+转换好的工具列表按服务端地址缓存，重连同一个服务端时不再重复转换。
+"""
+
+import os
+import sys
+from contextlib import AsyncExitStack
+
+from mcp.client.session import ClientSession
+from mcp.client.stdio import stdio_client, StdioServerParameters
+from mcp.client.streamable_http import streamablehttp_client
+
+from tracing import get_tracer
+
+# stdio 模式启动的 Server 脚本 (绝对路径，在其他工作目录下运行也能找到；数据库仍按工作目录下的 DB_PATH 打开)
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+
+# 服务端标识 -> 转换为 OpenAI function calling 格式的工具列表
+_tool_schema_cache = {}
+
+
+def convert_tools(mcp_tools) -> list:
+    """把 MCP 的工具描述转换为大模型 function calling 的格式"""
+    return [{
+        "type": "function",
+        "function": {
+            "name": t.name,
+            "description": t.description,
+            "parameters": t.inputSchema
+        }
+    } for t in mcp_tools]
+
+
+class MCPConnection:
+    """
+    一个已初始化的 MCP 会话及其工具列表，用作异步上下文管理器：
+
+        async with MCPConnection(server_url) as conn:
+            await conn.session.call_tool(...)
+
+    server_url 为空时启动 `python server.py` 子进程 (stdio)，否则连接到该地址的常驻 Server。
+    """
+
+    def __init__(self, server_url: str = None):
+        self.server_url = server_url
+        self.session = None
+        self.tools = None
+        self._stack = None
+
+    @property
+    def server_key(self) -> str:
+        return self.server_url or "stdio:server.py"
+
+    async def __aenter__(self):
+        self._stack = AsyncExitStack()
+        try:
+            if self.server_url:
+                read_stream, write_stream, _ = await self._stack.enter_async_context(
+                    streamablehttp_client(self.server_url))
+            else:
+                # 子进程 Server 沿用本进程的追踪设置，两边的 span 写进同一个文件
+                tracer = get_tracer()
+                args = [SERVER_SCRIPT, "--trace", tracer.export_format, "--trace-file", os.path.abspath(tracer.path)]
+                server_params = StdioServerParameters(command=sys.executable, args=args)
+                read_stream, write_stream = await self._stack.enter_async_context(stdio_client(server_params))
+            self.session = await self._stack.enter_async_context(ClientSession(read_stream, write_stream))
+            await self.session.initialize()
+            self.tools = await self.load_tools()
+        except BaseException:
+            await self._stack.aclose()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._stack.aclose()
+        self.session = None
+
+    async def load_tools(self, refresh: bool = False) -> list:
+        """获取工具列表，同一个服务端只在第一次 (或 refresh=True 时) 调用 list_tools"""
+        cached = _tool_schema_cache.get(self.server_key)
+        if cached is None or refresh:
+            mcp_tools = await self.session.list_tools()
+            cached = _tool_schema_cache[self.server_key] = convert_tools(mcp_tools.tools)
+        return cached
@@ -0,0 +1,101 @@
+"""
+DeepContext 工具调用执行器
+大模型在一轮回复中给出多个 tool_calls 时，并发地发给 MCP Server 执行，
+并发数受 AGENT_TOOL_CONCURRENCY 限制；结果按原始顺序返回，单个调用失败不影响其它调用。
+流式调用时 ToolDispatcher 在每个调用的参数生成完时就开始执行，与模型生成其余内容重叠。
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+
+from config import AGENT_TOOL_CONCURRENCY
+from tracing import get_logger, span
+
+logger = get_logger("tools")
+
+
+@functools.lru_cache(maxsize=None)
+def _accepts_meta(session_type) -> bool:
+    """ClientSession.call_tool 从 mcp 1.20 起才有 meta 参数，更早的版本不传 traceparent"""
+    try:
+        return "meta" in inspect.signature(session_type.call_tool).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+async def call_tool(session, tool_call, semaphore: asyncio.Semaphore) -> str:
+    """执行单个工具调用并返回文本结果；参数解析失败或调用异常时返回错误描述而不是抛出"""
+    func_name = tool_call.function.name
+    try:
+        func_args = json.loads(tool_call.function.arguments or "{}")
+    except json.JSONDecodeError as e:
+        return f"工具调用失败：参数不是合法的 JSON ({str(e)})"
+
+    async with semaphore:
+        with span("mcp.call_tool", tool=func_name) as call_span:
+            # 追踪开启时通过 _meta.traceparent 把 trace 传给 Server，两边的 span 连成一棵树
+            extra = {}
+            if call_span.traceparent and _accepts_meta(type(session)):
+                extra["meta"] = {"traceparent": call_span.traceparent}
+            try:
+                mcp_result = await session.call_tool(func_name, arguments=func_args, **extra)
+            except Exception as e:
+                call_span.set(error=f"{type(e).__name__}: {str(e)}")
+                return f"工具调用失败：{type(e).__name__}: {str(e)}"
+            text = mcp_result.content[0].text if mcp_result.content else ""
+            call_span.set(result_chars=len(text), is_error=bool(getattr(mcp_result, "isError", False)))
+    return text
+
+
+class ToolDispatcher:
+    """
+    逐个接收一轮中的工具调用并立即在后台开始执行 (dispatch 是同步方法，可直接作为流式回调)，
+    results() 等待全部完成后按接收顺序返回 tool 消息列表
+    """
+
+    def __init__(self, session, concurrency: int = None, verbose: bool = True):
+        self.session = session
+        self.verbose = verbose
+        self._semaphore = asyncio.Semaphore(max(1, concurrency or AGENT_TOOL_CONCURRENCY))
+        self._calls = []
+        self._tasks = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def dispatch(self, tool_call):
+        if self.verbose:
+            logger.info(f"  ⚡ [执行动作]: 正在调用 `{tool_call.function.name}` \n  参数: {tool_call.function.arguments}")
+        self._calls.append(tool_call)
+        self._tasks.append(asyncio.create_task(call_tool(self.session, tool_call, self._semaphore)))
+
+    async def results(self) -> list:
+        texts = await asyncio.gather(*self._tasks)
+        tool_messages = []
+        for tool_call, tool_result_text in zip(self._calls, texts):
+            if self.verbose:
+                logger.info(f"  📦 [工具返回] `{tool_call.function.name}`: {tool_result_text}")
+            tool_messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "name": tool_call.function.name,
+                "content": tool_result_text
+            })
+        return tool_messages
+
+    def cancel(self):
+        """本轮出错时取消尚未完成的调用"""
+        for task in self._tasks:
+            task.cancel()
+
+
+async def execute_tool_calls(session, tool_calls, concurrency: int = None, verbose: bool = True) -> list:
+    """
+    并发执行一轮中的全部工具调用，返回与 tool_calls 顺序一致的 tool 消息列表，可直接追加到 messages。
+    """
+    dispatcher = ToolDispatcher(session, concurrency, verbose)
+    for tool_call in tool_calls:
+        dispatcher.dispatch(tool_call)
+    return await dispatcher.results()
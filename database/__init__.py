@@ -4,5 +4,6 @@ DeepContext 数据持久层
 """
 
 from .sqlite_db import init_db
+from .connection import get_manager, init_manager, close_manager, get_write_generation
 
-__all__ = ['init_db']
\ No newline at end of file
+__all__ = ['init_db', 'get_manager', 'init_manager', 'close_manager', 'get_write_generation']
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+DeepContext 数据库连接管理模块
+为 MCP Server 进程维护长生命周期的 SQLite 连接：
+一个独占的写连接 + 一个只读连接池 (WAL 模式下读写互不阻塞)
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import (
+    DB_PATH,
+    DB_READ_POOL_SIZE,
+    DB_BUSY_TIMEOUT_MS,
+    DB_SYNCHRONOUS,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+)
+from database.schema import flush_fts_pending
+from database.tokenizer import register_sql_functions
+
+
+class ConnectionManager:
+    """
+    SQLite 连接管理器
+
+    - 写连接只有一个，用锁串行化，避免多个写者互相抢锁
+    - 读连接放在队列里复用，查询不会排在写事务后面等待
+    - 所有连接在进程生命周期内保持打开，省去每次调用的连接建立和 fsync 开销
+    """
+
+    def __init__(self, db_path: str = DB_PATH, read_pool_size: int = DB_READ_POOL_SIZE,
+                 synchronous: str = DB_SYNCHRONOUS):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.synchronous = synchronous
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        # WAL 是持久化到数据库文件里的设置，只需由写连接设置一次
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._readers = queue.Queue()
+        for _ in range(read_pool_size):
+            self._readers.put(self._connect(readonly=True))
+        # PRAGMA data_version 的值只在同一个连接上可比，专门留一个只读连接来读它
+        self._version_lock = threading.Lock()
+        self._version_conn = self._connect(readonly=True)
+        self._closed = False
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """创建一个带调优参数的连接"""
+        # 只读连接用 mode=ro 打开，再加上 query_only，SQL 无论如何都改不了数据
+        target = f"{Path(self.db_path).resolve().as_uri()}?mode=ro" if readonly else self.db_path
+        conn = sqlite3.connect(
+            target,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # 连接会在线程池之间复用，由本类负责加锁
+            uri=readonly,
+        )
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        register_sql_functions(conn)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """
+        获取写连接，退出时自动提交；出错则回滚。事务中确实改动了数据时递增写入代数，
+        并在提交前为本事务 (以及外部连接此前) 写入的三元组和笔记分块补建全文索引
+        """
+        with self._write_lock:
+            changes = self._writer.total_changes
+            try:
+                yield self._writer
+                if self._writer.total_changes != changes:
+                    flush_fts_pending(self._writer)
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            finally:
+                if self._writer.total_changes != changes:
+                    _bump_write_generation()
+
+    @contextmanager
+    def reader(self):
+        """从读连接池借出一个只读连接，用完归还"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def data_version(self) -> int:
+        """
+        数据库的提交计数：任何连接 (包括本进程的写连接和其他进程) 提交了事务后都会变化，
+        用来发现其他进程 (离线入库、实体整理、快照导入、另一个 Server) 对同一个数据库的写入
+        """
+        with self._version_lock:
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """关闭所有连接 (进程退出时调用)"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._write_lock:
+            self._writer.close()
+        for _ in range(self.read_pool_size):
+            self._readers.get().close()
+        with self._version_lock:
+            self._version_conn.close()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+# 数据库写入代数：本进程内每次有数据变化的写事务结束 (以及切换数据库) 时 +1，
+# 与 PRAGMA data_version 一起组成数据库版本 (见 get_db_version)
+_write_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _bump_write_generation():
+    global _write_generation
+    with _generation_lock:
+        _write_generation += 1
+
+
+def get_write_generation() -> int:
+    """当前的数据库写入代数"""
+    return _write_generation
+
+
+def get_db_version() -> tuple:
+    """
+    当前的数据库版本 (写入代数, data_version)：本进程或其他进程提交了写入、或切换了数据库后都会变化。
+    查询结果缓存把它作为键的一部分，写入之后旧的缓存条目自然失效
+    """
+    return _write_generation, get_manager().data_version()
+
+
+def get_manager() -> ConnectionManager:
+    """获取进程级共享的连接管理器 (首次调用时创建)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager()
+    return _manager
+
+
+def init_manager(db_path: str = DB_PATH, read_pool_size: int = DB_READ_POOL_SIZE,
+                 synchronous: str = DB_SYNCHRONOUS) -> ConnectionManager:
+    """用指定的数据库路径重建共享连接管理器 (用于基准测试或切换数据库)"""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(db_path, read_pool_size, synchronous)
+    _bump_write_generation()
+    return _manager
+
+
+def close_manager():
+    """关闭共享连接管理器"""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+
+
+atexit.register(close_manager)
@@ -0,0 +1,71 @@
+"""
+DeepContext 文本向量化模块
+本地、纯 CPU 的哈希向量化 (feature hashing)，不需要下载模型：
+  - 中日韩片段取单字和二元组，其他文字取小写单词和首尾补位的字符三元组
+  - 每个特征用 CRC32 映射到固定维度上的一个位置和正负号，按 1 + log(词频) 加权后做 L2 归一化
+拼写略有出入 (空格、大小写、多字少字、词序) 的文本仍然得到相近的向量，
+因此不必让大模型猜出实体的准确写法再去 LIKE。
+"""
+
+import math
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from config import VECTOR_DIM
+from database.tokenizer import query_terms, is_cjk_term
+
+# 不同粒度特征的权重：二元组 / 整词比单字 / 字符三元组更有区分度
+_WEIGHTS = {"cjk1": 0.5, "cjk2": 1.0, "word": 1.0, "tri": 0.5}
+
+
+def text_features(text: str) -> Counter:
+    """把文本切成 (特征类型, 特征) 并计数"""
+    features = Counter()
+    for term in query_terms(text):
+        if is_cjk_term(term):
+            features.update(("cjk1", ch) for ch in term)
+            features.update(("cjk2", term[i:i + 2]) for i in range(len(term) - 1))
+        else:
+            word = term.lower()
+            features[("word", word)] += 1
+            padded = f"#{word}#"
+            features.update(("tri", padded[i:i + 3]) for i in range(len(padded) - 2))
+    return features
+
+
+@lru_cache(maxsize=1 << 18)
+def _slot(kind: str, feature: str, dim: int):
+    """特征 -> (维度下标, 正负号)；CRC32 在不同进程间结果一致 (内置 hash() 则不然)"""
+    h = zlib.crc32(f"{kind}:{feature}".encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashingEmbedder:
+    """
+    哈希向量化器。
+    任何提供 name、dim 属性和 embed(texts) -> float32 矩阵 (每行 L2 归一化) 的对象都可以替换它，
+    比如本地的句向量模型；name 变化时已持久化的向量会被整体重建。
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def embed(self, texts) -> np.ndarray:
+        texts = list(texts)
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            for (kind, feature), count in text_features(text).items():
+                col, sign = _slot(kind, feature, self.dim)
+                rows.append(row)
+                cols.append(col)
+                values.append(sign * _WEIGHTS[kind] * (1.0 + math.log(count)))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+                  np.asarray(values, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
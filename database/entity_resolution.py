@@ -0,0 +1,332 @@
+"""
+DeepContext 实体消歧模块
+写入三元组时把写法不同的同一实体归并到一个规范实体：
+  1. 规范化键：NFKC (全角转半角) + casefold + 去掉分隔符，"ＭＣＰ 协议" 与 "mcp-协议" 键相同，
+     通过别名表 entity_aliases 精确命中
+  2. 模糊匹配：键的字符三元组组成倒排表做分块，只对共享足够多二元组的少量候选计算编辑相似度，
+     每次匹配的开销取决于候选数而不是实体总数
+被归并的原始写法记入 entity_merges；recanonicalize_entities() 用同样的规则整理已有数据库。
+缩写、全称这类规则无法判断的同义写法 ("MCP" / "Model Context Protocol") 用 register_alias() 手动登记。
+"""
+
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from config import ENTITY_FUZZY_THRESHOLD, ENTITY_FUZZY_MIN_LENGTH, ENTITY_BLOCK_SCAN_LIMIT
+from database.connection import get_manager
+from database.tokenizer import normalize_entity_name, entity_key
+
+_DIGITS = re.compile(r"\d+")
+_Q = 3                   # 分块用的字符 n-gram 长度
+_MAX_CANDIDATES = 20     # 每次模糊匹配最多精算相似度的候选数
+_IN_BATCH = 500
+
+_LOOKUP_SQL = '''
+    SELECT e.id, e.name FROM entity_aliases a JOIN entities e ON e.id = a.entity_id
+    WHERE a.alias_key = ?
+'''
+
+
+def key_grams(key: str) -> set:
+    """键的字符三元组 (首尾补位)，中英文统一处理"""
+    padded = f"\x02{key}\x03"
+    return {padded[i:i + _Q] for i in range(len(padded) - _Q + 1)}
+
+
+def similarity(a: str, b: str, threshold: float = ENTITY_FUZZY_THRESHOLD, matcher=None) -> float:
+    """
+    两个规范化键的相似度 (difflib ratio)，低于 threshold 时返回 0。以下情况直接判为不同实体：
+      - 数字不同："Python 3.11" 和 "Python 3.12" 只差一个字符，但不是同一个东西
+      - 一个是另一个加上前缀 / 后缀："知识图谱构建" 是 "知识图谱" 的下位概念，而不是它的错别字
+    同一个 b 要和很多候选比较时，可以传入已 set_seq2(b) 的 matcher，省去重复建立 b 的字符索引。
+    """
+    short, long = sorted((a, b), key=len)
+    if 2 * len(short) < threshold * (len(a) + len(b)):
+        return 0.0
+    if len(long) - len(short) >= 2 and (long.startswith(short) or long.endswith(short)):
+        return 0.0
+    if _DIGITS.findall(a) != _DIGITS.findall(b):
+        return 0.0
+    if matcher is None:
+        matcher = SequenceMatcher(None, b=b, autojunk=False)
+    matcher.set_seq1(a)
+    if matcher.quick_ratio() < threshold:
+        return 0.0
+    score = matcher.ratio()
+    return score if score >= threshold else 0.0
+
+
+class BlockingIndex:
+    """三元组 -> 规范化键的倒排表，用于找出可能相似的候选键"""
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+
+    def add(self, key: str):
+        for gram in key_grams(key):
+            self.postings[gram].add(key)
+
+    def best_match(self, key: str, accept=None):
+        """
+        返回 (候选键, 相似度)，没有足够相似的候选时返回 None。
+        accept(候选键) 返回 False 的候选会被跳过 (例如已不存在的别名)。
+
+        相似度达到阈值的键最多相差 edits 处编辑，每处编辑最多破坏 _Q 个三元组，
+        所以候选至少共享 need 个三元组，也就必然出现在最稀有的 len(grams) - need + 1 个三元组的倒排里：
+        只查这几个倒排 (前缀过滤)，最常见的三元组完全不用碰。
+        扫描的倒排条目总数不超过 ENTITY_BLOCK_SCAN_LIMIT，因此耗时不随实体总数增长；
+        稀有三元组都很常见的名字 (极少见) 会因此错过模糊匹配，只按精确匹配处理。
+        """
+        if len(key) < ENTITY_FUZZY_MIN_LENGTH:
+            return None
+        grams = sorted(key_grams(key), key=lambda g: len(self.postings.get(g, ())))
+        edits = int(len(key) * (1 - ENTITY_FUZZY_THRESHOLD) / ENTITY_FUZZY_THRESHOLD) + 1
+        need = max(1, len(grams) - _Q * edits)
+        counts = Counter()
+        budget = ENTITY_BLOCK_SCAN_LIMIT
+        for gram in grams[:len(grams) - need + 1]:
+            posting = self.postings.get(gram, ())
+            budget -= len(posting)
+            if budget < 0:
+                break   # 已按倒排长度排序，后面的只会更长
+            counts.update(posting)
+        best = None
+        matcher = SequenceMatcher(None, b=key, autojunk=False)
+        for candidate, _ in counts.most_common(_MAX_CANDIDATES):
+            if candidate == key or len(candidate) < ENTITY_FUZZY_MIN_LENGTH:
+                continue
+            score = similarity(candidate, key, matcher=matcher)
+            if score and (best is None or score > best[1]) and (accept is None or accept(candidate)):
+                best = (candidate, score)
+        return best
+
+
+class EntityResolver:
+    """
+    写入时的实体消歧器
+
+    精确匹配直接查别名表 (在写连接上执行，能看到同一事务里刚登记的别名)；
+    模糊匹配的倒排表常驻内存，每次使用前按 entity_aliases.id 水位增量加载其他进程登记的别名，
+    命中后再回表确认别名当前指向的实体，因此回滚或被合并掉的别名不会造成错误归并。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._db_path = None
+        self._reset()
+
+    def _reset(self):
+        self._blocks = BlockingIndex()
+        self._last_alias_id = 0
+
+    def refresh(self):
+        """把数据库中新登记的别名加入倒排表"""
+        manager = get_manager()
+        with self._lock:
+            if manager.db_path != self._db_path:
+                self._reset()
+                self._db_path = manager.db_path
+            with manager.reader() as conn:
+                cursor = conn.execute(
+                    "SELECT id, alias_key FROM entity_aliases WHERE id > ? ORDER BY id", (self._last_alias_id,)
+                )
+                while rows := cursor.fetchmany(4096):
+                    for _, key in rows:
+                        self._blocks.add(key)
+                    self._last_alias_id = rows[-1][0]
+
+    def resolve(self, conn: sqlite3.Connection, name: str) -> str:
+        """
+        返回实体名对应的规范实体名；没有匹配的已有实体时以规范写法登记新实体。
+        必须在持有写连接的事务中调用。
+        """
+        display = normalize_entity_name(name)
+        key = entity_key(display)
+        if not key:
+            return display
+        with self._lock:
+            row = conn.execute(_LOOKUP_SQL, (key,)).fetchone()
+            if row:
+                if display != row[1]:
+                    _record_merge(conn, display, row[0], "normalized", 1.0)
+                return row[1]
+
+            found = {}
+
+            def accept(candidate):
+                found[candidate] = conn.execute(_LOOKUP_SQL, (candidate,)).fetchone()
+                return found[candidate] is not None
+
+            match = self._blocks.best_match(key, accept)
+            if match:
+                (entity_id, canonical), score = found[match[0]], match[1]
+                _record_merge(conn, display, entity_id, "fuzzy", score)
+            else:
+                conn.execute("INSERT OR IGNORE INTO entities (name) VALUES (?)", (display,))
+                entity_id, canonical = conn.execute(
+                    "SELECT id, name FROM entities WHERE name = ?", (display,)
+                ).fetchone()
+            conn.execute("INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)", (key, entity_id))
+            self._blocks.add(key)
+            return canonical
+
+
+def _record_merge(conn: sqlite3.Connection, alias: str, entity_id: int, method: str, score: float):
+    conn.execute(
+        "INSERT OR IGNORE INTO entity_merges (alias, entity_id, method, score) VALUES (?, ?, ?, ?)",
+        (alias, entity_id, method, round(score, 4)),
+    )
+
+
+_resolver = EntityResolver()
+
+
+def get_entity_resolver() -> EntityResolver:
+    """获取进程级共享的消歧器 (已加载数据库中最新的别名)"""
+    _resolver.refresh()
+    return _resolver
+
+
+def canonicalize_rows(conn: sqlite3.Connection, rows: list) -> list:
+    """把 (source_entity, relation, target_entity, source_file) 行中的实体名换成规范实体名"""
+    resolver = get_entity_resolver()
+    mapping = {}
+    for row in rows:
+        for name in (row[0], row[2]):
+            if name not in mapping:
+                mapping[name] = resolver.resolve(conn, name)
+    return [(mapping[s], r, mapping[t], f) for s, r, t, f in rows]
+
+
+# ==========================================================
+# 整理已有数据库
+# ==========================================================
+def plan_merges(entities) -> list:
+    """
+    entities: [(id, name, 引用次数)]。按引用次数从多到少依次登记，
+    键相同或足够相似的实体归并到先登记 (引用更多) 的那个。
+    返回 [(被合并的 id, 被合并的名字, 保留的 id, method, score)]
+    """
+    blocks = BlockingIndex()
+    canonical = {}   # 规范化键 -> 保留的实体 id
+    merges = []
+    for entity_id, name, _ in sorted(entities, key=lambda e: (-e[2], e[0])):
+        key = entity_key(name)
+        if not key:
+            continue
+        if key in canonical:
+            merges.append((entity_id, name, canonical[key], "normalized", 1.0))
+            continue
+        match = blocks.best_match(key)
+        if match:
+            merges.append((entity_id, name, canonical[match[0]], "fuzzy", match[1]))
+            continue
+        canonical[key] = entity_id
+        blocks.add(key)
+    return merges
+
+
+def _repoint(conn: sqlite3.Connection, table: str, column: str, pairs: list):
+    """把 column 从被合并的 id 改成保留的 id；改完会违反唯一约束的行 (重复事实) 直接删除"""
+    conn.executemany(f"UPDATE OR IGNORE {table} SET {column} = ? WHERE {column} = ?", pairs)
+    conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(loser,) for _, loser in pairs])
+
+
+def recanonicalize_entities(dry_run: bool = False) -> dict:
+    """
+    用当前的消歧规则整理已有数据库：合并键相同或模糊匹配的重复实体 (三元组、别名、归并记录都指向保留的实体)，
+    并为所有实体补齐别名。dry_run 时只返回计划，不修改数据库。
+    返回 {"entities": 实体数, "merged": 合并数, "aliases": 新增别名数, "merges": [(原名, 保留名, method, score)]}
+    """
+    with get_manager().writer() as conn:
+        # 立即拿写锁：统计引用次数和修改之间不能插入其他进程的写入；出错时由 writer() 回滚
+        conn.execute("BEGIN IMMEDIATE")
+        entities = conn.execute('''
+            SELECT e.id, e.name,
+                   (SELECT COUNT(*) FROM triplets WHERE source_id = e.id) +
+                   (SELECT COUNT(*) FROM triplets WHERE target_id = e.id)
+            FROM entities e
+        ''').fetchall()
+        names = {entity_id: name for entity_id, name, _ in entities}
+        merges = plan_merges(entities)
+        if dry_run:
+            conn.execute("ROLLBACK")
+            aliases = 0
+        else:
+            pairs = [(winner, loser) for loser, _, winner, _, _ in merges]
+            _repoint(conn, "triplets", "source_id", pairs)
+            _repoint(conn, "triplets", "target_id", pairs)
+            _repoint(conn, "entity_merges", "entity_id", pairs)
+            conn.executemany("UPDATE entity_aliases SET entity_id = ? WHERE entity_id = ?", pairs)
+            conn.executemany(
+                "INSERT OR IGNORE INTO entity_merges (alias, entity_id, method, score) VALUES (?, ?, ?, ?)",
+                [(name, winner, method, round(score, 4)) for _, name, winner, method, score in merges],
+            )
+            losers = [loser for _, loser in pairs]
+            for i in range(0, len(losers), _IN_BATCH):
+                chunk = losers[i:i + _IN_BATCH]
+                conn.execute(f"DELETE FROM entities WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            # 被合并实体的写法和所有保留实体都要有别名，之后再写入这些写法时直接精确命中
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)",
+                [(entity_key(name), winner) for _, name, winner, _, _ in merges],
+            )
+            conn.execute('''
+                INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id)
+                SELECT dc_entity_key(name), id FROM entities WHERE dc_entity_key(name) != '' ORDER BY id
+            ''')
+            aliases = conn.total_changes - before
+            conn.execute("COMMIT")
+    return {
+        "entities": len(entities),
+        "merged": len(merges),
+        "aliases": aliases,
+        "merges": [(name, names[winner], method, score) for _, name, winner, method, score in merges],
+    }
+
+
+def register_alias(alias: str, canonical: str) -> dict:
+    """
+    手动登记别名：之后写入 alias 时归并到 canonical (规范实体不存在时先创建)。
+    alias 已经是一个独立实体时与 recanonicalize_entities() 一样合并它：三元组、别名和归并记录都改为指向规范实体，
+    再删除这个实体；归并记入 entity_merges (method 为 manual)。
+    返回 {"alias", "entity": 规范实体名, "merged": 被合并的实体名或 None, "triplets": 改指向的三元组数}
+    """
+    alias_display, canonical_display = normalize_entity_name(alias), normalize_entity_name(canonical)
+    alias_key, canonical_key = entity_key(alias_display), entity_key(canonical_display)
+    if not alias_key or not canonical_key:
+        raise ValueError("别名和规范实体名都不能为空")
+    resolver = get_entity_resolver()
+    with get_manager().writer() as conn, resolver._lock:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(_LOOKUP_SQL, (canonical_key,)).fetchone()
+        if row is None:
+            conn.execute("INSERT OR IGNORE INTO entities (name) VALUES (?)", (canonical_display,))
+            row = conn.execute("SELECT id, name FROM entities WHERE name = ?", (canonical_display,)).fetchone()
+            conn.execute("INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)",
+                         (canonical_key, row[0]))
+        winner, entity = row
+        existing = conn.execute(_LOOKUP_SQL, (alias_key,)).fetchone()
+        merged, repointed = None, 0
+        if existing is None:
+            conn.execute("INSERT INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)", (alias_key, winner))
+        elif existing[0] != winner:
+            loser, merged = existing
+            repointed = conn.execute(
+                "SELECT COUNT(*) FROM triplets WHERE source_id = ? OR target_id = ?", (loser, loser)
+            ).fetchone()[0]
+            pairs = [(winner, loser)]
+            _repoint(conn, "triplets", "source_id", pairs)
+            _repoint(conn, "triplets", "target_id", pairs)
+            _repoint(conn, "entity_merges", "entity_id", pairs)
+            conn.execute("UPDATE entity_aliases SET entity_id = ? WHERE entity_id = ?", pairs[0])
+            conn.execute("DELETE FROM entities WHERE id = ?", (loser,))
+        if existing is None or existing[0] != winner:
+            _record_merge(conn, alias_display, winner, "manual", 1.0)
+        conn.execute("COMMIT")
+        resolver._blocks.add(alias_key)
+    return {"alias": alias_display, "entity": entity, "merged": merged, "triplets": repointed}
@@ -0,0 +1,144 @@
+"""
+DeepContext 组提交写入模块
+后台写线程把并发到达的单条写入合并进同一个事务，一次提交摊薄多次写入的提交开销
+"""
+
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+
+from config import GROUP_COMMIT_MAX_BATCH
+from database.connection import get_manager
+
+
+class GroupCommitWriter:
+    """
+    组提交写入器
+
+    调用方通过 submit() 投递 (sql, params)，或通过 submit_call() 投递一个接收连接的函数，拿到一个 Future。
+    写线程每次取出队列中已积压的全部请求 (最多 max_batch 条)，
+    在一个事务里逐条执行，提交成功后再统一完成这些 Future。
+    没有并发时不做任何等待，单条写入的延迟与直接写入基本一致。
+    """
+
+    def __init__(self, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="deepcontext-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params=()) -> Future:
+        """投递一条写语句，返回在提交完成后给出 rowcount 的 Future"""
+        return self.submit_call(lambda conn: conn.execute(sql, params).rowcount)
+
+    def submit_call(self, fn) -> Future:
+        """投递一个写操作 fn(conn)，返回在提交完成后给出其返回值的 Future"""
+        if self._stopped:
+            raise RuntimeError("组提交写入器已关闭")
+        future = Future()
+        self._queue.put((future, fn))
+        return future
+
+    def execute(self, sql: str, params=()) -> int:
+        """同步执行一条写语句，等待它所在的事务提交后返回 rowcount"""
+        return self.submit(sql, params).result()
+
+    def call(self, fn):
+        """同步执行一个写操作 fn(conn)，等待它所在的事务提交后返回其结果"""
+        return self.submit_call(fn).result()
+
+    def close(self):
+        """处理完已投递的写入后停止写线程"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            # 不等待：只合并此刻已经排队的请求
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        try:
+            try:
+                outcomes = self._execute_batch(batch, isolate=False)
+            except Exception:
+                # 快路径失败说明批内有坏语句：整批回滚后逐条隔离重做
+                outcomes = self._execute_batch(batch, isolate=True)
+        except Exception as e:
+            # 提交本身失败：整批都没有落盘
+            for future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (future, _), outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def _execute_batch(self, batch, isolate: bool):
+        """在一个事务里执行整批写入；isolate 时每条包在保存点里，单条失败不连累同批其他写入"""
+        outcomes = []
+        with get_manager().writer() as conn:
+            for _, fn in batch:
+                if not isolate:
+                    outcomes.append(fn(conn))
+                    continue
+                conn.execute("SAVEPOINT group_item")
+                try:
+                    outcome = fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO group_item")
+                    outcomes.append(e)
+                else:
+                    outcomes.append(outcome)
+                conn.execute("RELEASE group_item")
+        return outcomes
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_group_writer() -> GroupCommitWriter:
+    """获取进程级共享的组提交写入器 (首次调用时启动写线程)"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter()
+    return _writer
+
+
+def close_group_writer():
+    """停止共享的组提交写入器"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+# 在连接管理器之后注册，atexit 逆序执行，保证先停写线程再关连接
+atexit.register(close_group_writer)
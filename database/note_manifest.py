@@ -0,0 +1,122 @@
+"""
+DeepContext 笔记清单模块
+负责 note_manifest 表的读写、按来源文件清理三元组，以及离线入库的分块检查点
+"""
+
+import os
+
+from database.connection import get_manager
+
+
+def _prefix_range(directory: str):
+    """目录前缀对应的主键区间 [lo, hi)，可以直接走 note_manifest 的主键索引"""
+    prefix = directory.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def load_manifest(directory: str) -> dict:
+    """读取某个目录下所有笔记的清单，返回 {路径: (mtime_ns, size, content_hash)}"""
+    lo, hi = _prefix_range(directory)
+    with get_manager().reader() as conn:
+        rows = conn.execute(
+            "SELECT path, mtime_ns, size, content_hash FROM note_manifest WHERE path >= ? AND path < ?",
+            (lo, hi),
+        ).fetchall()
+    return {path: (mtime_ns, size, content_hash) for path, mtime_ns, size, content_hash in rows}
+
+
+def load_manifest_entry(path: str):
+    """读取单篇笔记的清单条目，返回 (mtime_ns, size, content_hash, purged_hash)；不在清单中时返回 None"""
+    with get_manager().reader() as conn:
+        return conn.execute(
+            "SELECT mtime_ns, size, content_hash, purged_hash FROM note_manifest WHERE path = ?", (path,)
+        ).fetchone()
+
+
+def mark_purged(path: str, content_hash: str):
+    """记录已为笔记的这一版内容清理过旧三元组"""
+    with get_manager().writer() as conn:
+        conn.execute("UPDATE note_manifest SET purged_hash = ? WHERE path = ?", (content_hash, path))
+
+
+def upsert_manifest(entries):
+    """写入或更新清单条目，entries 为 (路径, mtime_ns, size, content_hash) 序列"""
+    entries = list(entries)
+    if not entries:
+        return
+    with get_manager().writer() as conn:
+        conn.executemany(
+            '''
+            INSERT INTO note_manifest (path, mtime_ns, size, content_hash) VALUES (?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns,
+                size = excluded.size,
+                content_hash = excluded.content_hash,
+                ingested_at = CURRENT_TIMESTAMP
+            ''',
+            entries,
+        )
+
+
+def touch_manifest(entries):
+    """只更新 mtime / size (内容哈希未变)，不改变入库时间"""
+    entries = list(entries)
+    if not entries:
+        return
+    with get_manager().writer() as conn:
+        conn.executemany(
+            "UPDATE note_manifest SET mtime_ns = ?, size = ? WHERE path = ?",
+            [(mtime_ns, size, path) for path, mtime_ns, size in entries],
+        )
+
+
+def delete_manifest(paths):
+    """删除清单条目"""
+    paths = list(paths)
+    if not paths:
+        return
+    with get_manager().writer() as conn:
+        conn.executemany("DELETE FROM note_manifest WHERE path = ?", [(p,) for p in paths])
+
+
+def purge_triplets_by_source(paths) -> int:
+    """删除来源文件为给定路径的全部三元组，返回删除条数 (走 source_file 索引)"""
+    paths = list(paths)
+    if not paths:
+        return 0
+    with get_manager().writer() as conn:
+        return conn.executemany("DELETE FROM triplets WHERE source_file = ?", [(p,) for p in paths]).rowcount
+
+
+def load_checkpoints(path: str, content_hash: str):
+    """
+    读取一篇笔记已完成抽取的分块，返回 {分块哈希: 三元组数}。
+    没有检查点时返回 None；检查点属于笔记的旧内容时也返回 None (调用方应从头处理这篇笔记)。
+    """
+    with get_manager().reader() as conn:
+        rows = conn.execute(
+            "SELECT chunk_hash, content_hash, triplets FROM extraction_checkpoints WHERE source_file = ?", (path,)
+        ).fetchall()
+    if not rows or any(row[1] != content_hash for row in rows):
+        return None
+    return {chunk_hash: triplets for chunk_hash, _, triplets in rows}
+
+
+def record_checkpoints(conn, entries):
+    """在调用方的写事务中记录已完成的分块，entries 为 (路径, 分块哈希, 笔记内容哈希, 三元组数) 序列"""
+    conn.executemany(
+        '''
+        INSERT OR REPLACE INTO extraction_checkpoints (source_file, chunk_hash, content_hash, triplets)
+        VALUES (?, ?, ?, ?)
+        ''',
+        entries,
+    )
+
+
+def clear_checkpoints(paths):
+    """删除给定笔记的全部检查点"""
+    paths = list(paths)
+    if not paths:
+        return
+    with get_manager().writer() as conn:
+        conn.executemany("DELETE FROM extraction_checkpoints WHERE source_file = ?", [(p,) for p in paths])
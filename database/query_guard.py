@@ -0,0 +1,152 @@
+"""
+DeepContext 查询守卫模块
+大模型生成的 SQL 在执行前先看 EXPLAIN QUERY PLAN：
+  - 对大表的全表扫描给出警告 (附带查询计划，方便大模型改写)
+  - 两个以上大表全表扫描出现在同一层嵌套循环里 (笛卡尔积 / 没有索引可用的连接) 时直接拒绝
+执行期间通过 SQLite 的 progress handler 限制耗时和虚拟机指令数，失控的语句会被中断。
+"""
+
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from config import (
+    QUERY_TIMEOUT_MS,
+    QUERY_MAX_VM_STEPS,
+    QUERY_PROGRESS_INTERVAL,
+    QUERY_GUARD_LARGE_ROWS,
+)
+
+# FROM / JOIN / 逗号之后的 "表名 [AS] 别名"，用于把查询计划里的别名还原成表名
+_KEYWORDS = ("ON|USING|WHERE|JOIN|INNER|LEFT|RIGHT|CROSS|NATURAL|GROUP|ORDER|LIMIT|HAVING|"
+             "UNION|EXCEPT|INTERSECT|FROM|SELECT|AND|OR|AS")
+_ALIAS = re.compile(rf"""(?:\bFROM|\bJOIN|,)\s+["`\[]?(\w+)["`\]]?(?:\s+AS)?\s+(?!(?:{_KEYWORDS})\b)(\w+)""",
+                    re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+class QueryRejected(Exception):
+    """查询计划表明这条语句代价过高，拒绝执行"""
+
+    def __init__(self, reason: str, plan: list):
+        super().__init__(reason)
+        self.reason = reason
+        self.plan = plan
+
+
+class QueryBudgetExceeded(Exception):
+    """语句执行超出时间或指令预算，已被中断"""
+
+    def __init__(self, reason: str, elapsed_ms: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.elapsed_ms = elapsed_ms
+
+
+def explain_plan(conn: sqlite3.Connection, sql: str) -> list:
+    """返回 EXPLAIN QUERY PLAN 的 (id, parent, detail) 列表"""
+    return [(row[0], row[1], row[3]) for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def format_plan(plan: list) -> str:
+    """按层级缩进输出查询计划"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, detail in plan:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * (depth[node_id] + 1) + detail)
+    return "\n".join(lines)
+
+
+def _alias_map(conn: sqlite3.Connection, sql: str) -> dict:
+    """别名 -> 表名：先看用户 SQL，再看库里所有视图的定义 (视图展开后计划里出现的是视图内部的别名)"""
+    views = [row[0] for row in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND sql IS NOT NULL")]
+    aliases = {}
+    for text in [sql] + views:
+        for table, alias in _ALIAS.findall(text):
+            aliases.setdefault(alias.lower(), table)
+    return aliases
+
+
+def _estimate_rows(conn: sqlite3.Connection, table: str, cache: dict):
+    """用 MAX(rowid) 粗略估计表的行数 (走 B 树最右端，O(log n))；无法估计时返回 None"""
+    key = table.lower()
+    if key not in cache:
+        try:
+            cache[key] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.Error:
+            cache[key] = None
+    return cache[key]
+
+
+def inspect_query(conn: sqlite3.Connection, sql: str):
+    """
+    检查查询计划，返回 (计划, 警告列表)；代价过高时抛出 QueryRejected。
+    EXPLAIN 本身出错 (如语法错误) 时直接抛出 sqlite3.Error，交给调用方按普通 SQL 错误处理。
+    """
+    plan = explain_plan(conn, sql)
+    tables = {row[0].lower(): row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = None
+    estimates = {}
+    warnings = []
+    large_scans = {}  # 父节点 -> 该层循环中的大表全表扫描
+    for node_id, parent, detail in plan:
+        match = _SCAN.match(detail)
+        if not match or "VIRTUAL TABLE" in detail or detail.startswith("SCAN CONSTANT ROW"):
+            continue
+        name = match.group(1)
+        table = tables.get(name.lower())
+        if table is None:
+            if aliases is None:
+                aliases = _alias_map(conn, sql)
+            table = tables.get(aliases.get(name.lower(), "").lower())
+        if table is None:
+            continue  # 子查询 / CTE 的中间结果，交给执行预算兜底
+        rows = _estimate_rows(conn, table, estimates)
+        if rows is None or rows < QUERY_GUARD_LARGE_ROWS:
+            continue
+        warnings.append(f"全表扫描 {table} (约 {rows} 行)：{detail}")
+        large_scans.setdefault(parent, []).append(table)
+
+    for scans in large_scans.values():
+        if len(scans) >= 2:
+            raise QueryRejected(
+                f"查询会对大表做嵌套的全表扫描 ({' x '.join(scans)})，相当于笛卡尔积或没有索引可用的连接",
+                plan,
+            )
+    return plan, warnings
+
+
+@contextmanager
+def execution_budget(conn: sqlite3.Connection, timeout_ms: float = QUERY_TIMEOUT_MS,
+                     max_steps: int = QUERY_MAX_VM_STEPS):
+    """
+    在 with 块内为连接安装 progress handler：超出时间或虚拟机指令预算时中断当前语句，
+    并把 sqlite3 的 "interrupted" 错误转换为 QueryBudgetExceeded。退出时卸载 handler (连接会被复用)。
+    产出的 dict 在退出后包含 elapsed_ms。
+    """
+    state = {"steps": 0, "reason": None, "elapsed_ms": 0.0}
+    start = time.perf_counter()
+    deadline = start + timeout_ms / 1000
+
+    def handler():
+        state["steps"] += QUERY_PROGRESS_INTERVAL
+        if state["steps"] > max_steps:
+            state["reason"] = f"执行超过 {max_steps} 条虚拟机指令"
+            return 1
+        if time.perf_counter() > deadline:
+            state["reason"] = f"执行超过 {timeout_ms:g} ms"
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, QUERY_PROGRESS_INTERVAL)
+    try:
+        yield state
+    except sqlite3.OperationalError:
+        if state["reason"] is None:
+            raise
+        raise QueryBudgetExceeded(state["reason"], (time.perf_counter() - start) * 1000)
+    finally:
+        conn.set_progress_handler(None, 0)
+        state["elapsed_ms"] = (time.perf_counter() - start) * 1000
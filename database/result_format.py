@@ -0,0 +1,80 @@
+"""
+DeepContext 查询结果序列化模块
+按批 (fetchmany) 读取游标，只取一页结果，受行数和字符数双重预算限制；
+支持三种输出格式，行数再多内存占用也保持不变：
+  - table：列之间用 " | " 分隔 (默认，与之前的输出一致)
+  - tsv：制表符分隔，没有分隔线，token 更少
+  - compact：在 tsv 的基础上，把本页所有行取值都相同的列提到表头之上只写一次
+"""
+
+from config import QUERY_FETCH_BATCH
+
+FORMATS = ("table", "tsv", "compact")
+
+
+def fetch_page(cursor, offset: int, max_rows: int):
+    """
+    跳过前 offset 行后最多取 max_rows 行，返回 (行列表, 是否还有更多)。
+    SQLite 游标是惰性求值的，取够之后就不再继续执行查询，跳过的行也只是逐批丢弃。
+    """
+    skipped = 0
+    while skipped < offset:
+        batch = cursor.fetchmany(min(QUERY_FETCH_BATCH, offset - skipped))
+        if not batch:
+            return [], False
+        skipped += len(batch)
+    rows = []
+    while len(rows) < max_rows:
+        batch = cursor.fetchmany(min(QUERY_FETCH_BATCH, max_rows - len(rows)))
+        if not batch:
+            return rows, False
+        rows.extend(batch)
+    return rows, cursor.fetchone() is not None
+
+
+def _tsv_cell(value) -> str:
+    if value is None:
+        return "NULL"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _table_cell(value) -> str:
+    return str(value)
+
+
+def format_rows(columns: list, rows: list, fmt: str, max_chars: int):
+    """
+    把一页结果格式化为文本 (一次 join 生成)，超出 max_chars 时在行边界截断 (至少保留一行)。
+    返回 (文本, 实际输出的行数)。
+    """
+    constant = []
+    if fmt == "compact" and len(rows) > 1:
+        # 本页所有行都相同的列只写一次
+        keep = [i for i in range(len(columns)) if any(row[i] != rows[0][i] for row in rows)]
+        if keep and len(keep) < len(columns):
+            constant = [f"{columns[i]} = {_tsv_cell(rows[0][i])}" for i in range(len(columns)) if i not in keep]
+            columns = [columns[i] for i in keep]
+            rows = [tuple(row[i] for i in keep) for row in rows]
+
+    if fmt == "table":
+        sep, cell = " | ", _table_cell
+        header = [sep.join(columns), "-" * 50]
+    else:
+        sep, cell = "\t", _tsv_cell
+        header = constant + [sep.join(columns)]
+
+    lines = list(header)
+    used = sum(len(line) + 1 for line in lines)
+    count = 0
+    for row in rows:
+        line = sep.join(cell(item) for item in row)
+        if count and used + len(line) + 1 > max_chars:
+            break
+        if used + len(line) + 1 > max_chars:
+            # 单独一行就超出预算：截断这一行
+            line = line[:max(0, max_chars - used - 3)] + "..."
+        lines.append(line)
+        used += len(line) + 1
+        count += 1
+    return "\n".join(lines), count
+
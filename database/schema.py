@@ -0,0 +1,484 @@
+"""
+DeepContext 数据库表结构与版本迁移
+使用 PRAGMA user_version 记录当前结构版本，init_db() 启动时按顺序执行尚未应用的迁移
+"""
+
+import sqlite3
+
+
+# ==========================================================
+# v1：规范化的三元组存储
+# 实体和关系各自去重存一份，三元组只保存整数外键；
+# 原来的 knowledge_triplets 变成兼容视图，大模型生成的 SQL 无需改动
+# ==========================================================
+_V1_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS entities (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE          -- 实体名 (如: "MCP协议")
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS relations (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE          -- 关系名 (如: "作用于")
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS triplets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_id INTEGER NOT NULL REFERENCES entities(id),
+        relation_id INTEGER NOT NULL REFERENCES relations(id),
+        target_id INTEGER NOT NULL REFERENCES entities(id),
+        source_file TEXT NOT NULL,         -- 知识来源 (溯源字段：来自哪篇笔记)
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        -- 同一篇笔记重复入库时不会产生重复事实；
+        -- 这个唯一索引同时充当 (source, relation) 的覆盖索引
+        UNIQUE (source_id, relation_id, target_id, source_file)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_triplets_target_relation ON triplets (target_id, relation_id, source_id)',
+    'CREATE INDEX IF NOT EXISTS idx_triplets_source_file ON triplets (source_file)',
+]
+
+_V1_VIEW = [
+    '''
+    CREATE VIEW knowledge_triplets AS
+    SELECT t.id AS id,
+           s.name AS source_entity,
+           r.name AS relation,
+           o.name AS target_entity,
+           t.source_file AS source_file,
+           t.created_at AS created_at
+    FROM triplets t
+    JOIN entities s ON s.id = t.source_id
+    JOIN relations r ON r.id = t.relation_id
+    JOIN entities o ON o.id = t.target_id
+    ''',
+    # 兼容旧的写法：INSERT INTO knowledge_triplets 仍然可用，自动完成实体/关系的驻留
+    '''
+    CREATE TRIGGER knowledge_triplets_insert INSTEAD OF INSERT ON knowledge_triplets
+    BEGIN
+        INSERT OR IGNORE INTO entities (name) VALUES (NEW.source_entity);
+        INSERT OR IGNORE INTO entities (name) VALUES (NEW.target_entity);
+        INSERT OR IGNORE INTO relations (name) VALUES (NEW.relation);
+        INSERT INTO triplets (source_id, relation_id, target_id, source_file)
+        VALUES (
+            (SELECT id FROM entities WHERE name = NEW.source_entity),
+            (SELECT id FROM relations WHERE name = NEW.relation),
+            (SELECT id FROM entities WHERE name = NEW.target_entity),
+            NEW.source_file
+        )
+        ON CONFLICT DO NOTHING;
+    END
+    ''',
+    '''
+    CREATE TRIGGER knowledge_triplets_delete INSTEAD OF DELETE ON knowledge_triplets
+    BEGIN
+        DELETE FROM triplets WHERE id = OLD.id;
+    END
+    ''',
+]
+
+
+def _migrate_v1(conn: sqlite3.Connection):
+    """把旧的单表 knowledge_triplets 迁移为 entities / relations / triplets + 兼容视图"""
+    for statement in _V1_TABLES:
+        conn.execute(statement)
+
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_triplets'"
+    ).fetchone()
+    if legacy:
+        conn.execute('''
+            INSERT OR IGNORE INTO entities (name)
+            SELECT source_entity FROM knowledge_triplets
+            UNION
+            SELECT target_entity FROM knowledge_triplets
+        ''')
+        conn.execute('''
+            INSERT OR IGNORE INTO relations (name)
+            SELECT DISTINCT relation FROM knowledge_triplets
+        ''')
+        # 保留原 id 与创建时间；重复的事实只保留最早的一条
+        conn.execute('''
+            INSERT OR IGNORE INTO triplets (id, source_id, relation_id, target_id, source_file, created_at)
+            SELECT k.id, s.id, r.id, o.id, k.source_file, k.created_at
+            FROM knowledge_triplets k
+            JOIN entities s ON s.name = k.source_entity
+            JOIN relations r ON r.name = k.relation
+            JOIN entities o ON o.name = k.target_entity
+            ORDER BY k.id
+        ''')
+        conn.execute("DROP TABLE knowledge_triplets")
+
+    for statement in _V1_VIEW:
+        conn.execute(statement)
+
+
+# ==========================================================
+# v2：笔记清单 (增量索引)
+# 记录每篇已入库笔记的 mtime / size / 内容哈希，重新扫描时先比 stat，只有 mtime 变了才重新哈希
+# ==========================================================
+def _migrate_v2(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS note_manifest (
+            path TEXT PRIMARY KEY,             -- 笔记的绝对路径 (同时也是三元组的 source_file)
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+
+# ==========================================================
+# v3：全文检索 (FTS5)
+# 三元组文本和笔记分块各建一张 FTS5 表，由触发器与基础表保持同步。
+# 写入索引的文本先经 dc_segment() 把中文切成二元组 (见 database/tokenizer.py)，
+# 因此触发器只能在注册过该函数的连接上执行 (v9 起改为由写入端补建索引，触发器不再调用该函数)
+# ==========================================================
+_TRIPLET_TEXT_SQL = '''
+    dc_segment(
+        (SELECT name FROM entities WHERE id = {row}.source_id) || ' ' ||
+        (SELECT name FROM relations WHERE id = {row}.relation_id) || ' ' ||
+        (SELECT name FROM entities WHERE id = {row}.target_id)
+    )
+'''
+
+_V3_STATEMENTS = [
+    "CREATE VIRTUAL TABLE triplets_fts USING fts5(body, tokenize = 'unicode61 remove_diacritics 2')",
+    f'''
+    CREATE TRIGGER triplets_fts_insert AFTER INSERT ON triplets
+    BEGIN
+        INSERT INTO triplets_fts (rowid, body) VALUES (NEW.id, {_TRIPLET_TEXT_SQL.format(row="NEW")});
+    END
+    ''',
+    '''
+    CREATE TRIGGER triplets_fts_delete AFTER DELETE ON triplets
+    BEGIN
+        DELETE FROM triplets_fts WHERE rowid = OLD.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER triplets_fts_update AFTER UPDATE OF source_id, relation_id, target_id ON triplets
+    BEGIN
+        DELETE FROM triplets_fts WHERE rowid = OLD.id;
+        INSERT INTO triplets_fts (rowid, body) VALUES (NEW.id, {_TRIPLET_TEXT_SQL.format(row="NEW")});
+    END
+    ''',
+    # 实体改名时重建引用它的三元组的索引文本
+    f'''
+    CREATE TRIGGER entities_fts_rename AFTER UPDATE OF name ON entities
+    BEGIN
+        DELETE FROM triplets_fts
+        WHERE rowid IN (SELECT id FROM triplets WHERE source_id = NEW.id OR target_id = NEW.id);
+        INSERT INTO triplets_fts (rowid, body)
+        SELECT t.id, {_TRIPLET_TEXT_SQL.format(row="t")}
+        FROM triplets t WHERE t.source_id = NEW.id OR t.target_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TABLE note_chunks (
+        id INTEGER PRIMARY KEY,
+        source_file TEXT NOT NULL,         -- 笔记的绝对路径
+        chunk_no INTEGER NOT NULL,
+        heading TEXT NOT NULL DEFAULT '',  -- 分块所在章节的标题
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        UNIQUE (source_file, chunk_no)
+    )
+    ''',
+    '''
+    CREATE TABLE note_chunk_sources (
+        source_file TEXT PRIMARY KEY,      -- 已建立分块索引的笔记及其当时的 stat
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    "CREATE VIRTUAL TABLE note_chunks_fts USING fts5(heading, content, tokenize = 'unicode61 remove_diacritics 2')",
+    '''
+    CREATE TRIGGER note_chunks_fts_insert AFTER INSERT ON note_chunks
+    BEGIN
+        INSERT INTO note_chunks_fts (rowid, heading, content)
+        VALUES (NEW.id, dc_segment(NEW.heading), dc_segment(NEW.content));
+    END
+    ''',
+    '''
+    CREATE TRIGGER note_chunks_fts_delete AFTER DELETE ON note_chunks
+    BEGIN
+        DELETE FROM note_chunks_fts WHERE rowid = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER note_chunks_fts_update AFTER UPDATE OF heading, content ON note_chunks
+    BEGIN
+        DELETE FROM note_chunks_fts WHERE rowid = OLD.id;
+        INSERT INTO note_chunks_fts (rowid, heading, content)
+        VALUES (NEW.id, dc_segment(NEW.heading), dc_segment(NEW.content));
+    END
+    ''',
+]
+
+
+def _migrate_v3(conn: sqlite3.Connection):
+    for statement in _V3_STATEMENTS:
+        conn.execute(statement)
+    # 为已有三元组补建索引
+    conn.execute(f'''
+        INSERT INTO triplets_fts (rowid, body)
+        SELECT t.id, {_TRIPLET_TEXT_SQL.format(row="t")} FROM triplets t
+    ''')
+
+
+# ==========================================================
+# v4：向量索引变更日志
+# 实体名和笔记分块的向量存放在数据库旁的 NumPy 文件里 (见 database/vector_store.py)，
+# 触发器把每次新增 / 改名 / 删除记进日志，检索前按 seq 水位增量同步
+# ==========================================================
+_V4_STATEMENTS = [
+    '''
+    CREATE TABLE vector_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT, -- 单调递增，清理旧日志后也不会复用
+        kind TEXT NOT NULL,                    -- entity / chunk
+        item_id INTEGER NOT NULL,              -- entities.id / note_chunks.id
+        deleted INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "CREATE TRIGGER entities_vector_insert AFTER INSERT ON entities "
+    "BEGIN INSERT INTO vector_changes (kind, item_id) VALUES ('entity', NEW.id); END",
+    "CREATE TRIGGER entities_vector_update AFTER UPDATE OF name ON entities "
+    "BEGIN INSERT INTO vector_changes (kind, item_id) VALUES ('entity', NEW.id); END",
+    "CREATE TRIGGER entities_vector_delete AFTER DELETE ON entities "
+    "BEGIN INSERT INTO vector_changes (kind, item_id, deleted) VALUES ('entity', OLD.id, 1); END",
+    "CREATE TRIGGER note_chunks_vector_insert AFTER INSERT ON note_chunks "
+    "BEGIN INSERT INTO vector_changes (kind, item_id) VALUES ('chunk', NEW.id); END",
+    "CREATE TRIGGER note_chunks_vector_update AFTER UPDATE OF heading, content ON note_chunks "
+    "BEGIN INSERT INTO vector_changes (kind, item_id) VALUES ('chunk', NEW.id); END",
+    "CREATE TRIGGER note_chunks_vector_delete AFTER DELETE ON note_chunks "
+    "BEGIN INSERT INTO vector_changes (kind, item_id, deleted) VALUES ('chunk', OLD.id, 1); END",
+]
+
+
+def _migrate_v4(conn: sqlite3.Connection):
+    # 已有的实体和分块不写日志：向量文件不存在时会全量构建
+    for statement in _V4_STATEMENTS:
+        conn.execute(statement)
+
+
+# ==========================================================
+# v5：实体别名与归并记录 (实体消歧，见 database/entity_resolution.py)
+# 别名表把规范化键映射到实体，写入三元组时写法不同的同一实体归并到已有实体；
+# 每次归并 (原始写法 -> 实体) 记入 entity_merges，便于审查和回溯
+# ==========================================================
+_V5_STATEMENTS = [
+    '''
+    CREATE TABLE entity_aliases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,  -- 单调递增，内存中的模糊匹配索引按水位增量加载
+        alias_key TEXT NOT NULL UNIQUE,        -- 规范化键 (见 database/tokenizer.py 的 entity_key)
+        entity_id INTEGER NOT NULL REFERENCES entities(id)
+    )
+    ''',
+    'CREATE INDEX idx_entity_aliases_entity ON entity_aliases (entity_id)',
+    '''
+    CREATE TABLE entity_merges (
+        id INTEGER PRIMARY KEY,
+        alias TEXT NOT NULL,                   -- 被归并的原始写法
+        entity_id INTEGER NOT NULL REFERENCES entities(id),
+        method TEXT NOT NULL,                  -- normalized (规范化键相同) / fuzzy (模糊匹配) / manual (手动登记)
+        score REAL NOT NULL,                   -- 相似度，normalized 为 1.0
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (alias, entity_id)
+    )
+    ''',
+    'CREATE INDEX idx_entity_merges_entity ON entity_merges (entity_id)',
+]
+
+
+def _migrate_v5(conn: sqlite3.Connection):
+    for statement in _V5_STATEMENTS:
+        conn.execute(statement)
+    # 已有实体按 id 顺序登记自己的键；键相同的重复实体只登记第一个，其余由 recanonicalize 模式合并
+    conn.execute('''
+        INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id)
+        SELECT dc_entity_key(name), id FROM entities WHERE dc_entity_key(name) != '' ORDER BY id
+    ''')
+
+
+# ==========================================================
+# v6：离线入库检查点
+# 入库流水线 (core/ingest.py) 每写完一个分块的三元组就在同一事务里记一条检查点，
+# 中断后重跑时跳过已完成的分块；整篇笔记完成并记入 note_manifest 后清除
+# ==========================================================
+def _migrate_v6(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE extraction_checkpoints (
+            source_file TEXT NOT NULL,         -- 笔记的绝对路径
+            chunk_hash TEXT NOT NULL,          -- 分块正文的哈希
+            content_hash TEXT NOT NULL,        -- 抽取时整篇笔记的内容哈希，笔记再次变化后检查点作废
+            triplets INTEGER NOT NULL,         -- 该分块抽取出的三元组数
+            PRIMARY KEY (source_file, chunk_hash)
+        ) WITHOUT ROWID
+    ''')
+
+
+# ==========================================================
+# v7：向量索引变更日志限长
+# 日志原先只在语义检索时顺带清理，从不检索的部署里会无限增长。
+# 改为由写入端的触发器清理：每写入 VECTOR_CHANGES_PRUNE_EVERY 条日志删一次
+# VECTOR_CHANGES_MAX_ROWS 条之前的旧日志；向量索引同步时发现水位之后的日志已被删掉会全量重建
+# ==========================================================
+VECTOR_CHANGES_MAX_ROWS = 100_000
+VECTOR_CHANGES_PRUNE_EVERY = 1_000
+
+
+def _migrate_v7(conn: sqlite3.Connection):
+    conn.execute(f'''
+        CREATE TRIGGER vector_changes_prune AFTER INSERT ON vector_changes
+        WHEN NEW.seq % {VECTOR_CHANGES_PRUNE_EVERY} = 0
+        BEGIN
+            DELETE FROM vector_changes WHERE seq <= NEW.seq - {VECTOR_CHANGES_MAX_ROWS};
+        END
+    ''')
+    conn.execute(f"DELETE FROM vector_changes WHERE seq <= "
+                 f"(SELECT MAX(seq) FROM vector_changes) - {VECTOR_CHANGES_MAX_ROWS}")
+
+
+# ==========================================================
+# v8：改写笔记的旧三元组只清理一次
+# 笔记内容变化后，Agent 第一次写入它的三元组前清理旧版本的三元组，并把当时的内容哈希记入
+# purged_hash；重新提取过程中的后续写入 (以及再次扫描) 不会删掉刚写入的三元组
+# ==========================================================
+def _migrate_v8(conn: sqlite3.Connection):
+    conn.execute("ALTER TABLE note_manifest ADD COLUMN purged_hash TEXT")
+
+
+# ==========================================================
+# v9：全文索引改由写入端维护
+# v3 的触发器直接调用 dc_segment()，没有注册该函数的连接 (sqlite3 命令行、外部脚本)
+# 无法再写入三元组和笔记分块。触发器改为只用纯 SQL：删除 / 修改时删掉旧的索引行，
+# 新增 / 修改时把 id 记入 fts_pending；本项目的写连接在每个写事务提交前调用 flush_fts_pending()
+# 分词并补建索引 (见 database/connection.py)。外部连接写入的行在下一次本项目的写事务时补建
+# ==========================================================
+_V9_STATEMENTS = [
+    "DROP TRIGGER triplets_fts_insert",
+    "DROP TRIGGER triplets_fts_update",
+    "DROP TRIGGER entities_fts_rename",
+    "DROP TRIGGER note_chunks_fts_insert",
+    "DROP TRIGGER note_chunks_fts_update",
+    '''
+    CREATE TABLE fts_pending (
+        kind TEXT NOT NULL,                -- triplet / chunk
+        item_id INTEGER NOT NULL,          -- triplets.id / note_chunks.id
+        PRIMARY KEY (kind, item_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER triplets_fts_insert AFTER INSERT ON triplets
+    BEGIN
+        INSERT OR IGNORE INTO fts_pending (kind, item_id) VALUES ('triplet', NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER triplets_fts_update AFTER UPDATE OF source_id, relation_id, target_id ON triplets
+    BEGIN
+        DELETE FROM triplets_fts WHERE rowid = OLD.id;
+        INSERT OR IGNORE INTO fts_pending (kind, item_id) VALUES ('triplet', NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER entities_fts_rename AFTER UPDATE OF name ON entities
+    BEGIN
+        DELETE FROM triplets_fts
+        WHERE rowid IN (SELECT id FROM triplets WHERE source_id = NEW.id OR target_id = NEW.id);
+        INSERT OR IGNORE INTO fts_pending (kind, item_id)
+        SELECT 'triplet', id FROM triplets WHERE source_id = NEW.id OR target_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER note_chunks_fts_insert AFTER INSERT ON note_chunks
+    BEGIN
+        INSERT OR IGNORE INTO fts_pending (kind, item_id) VALUES ('chunk', NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER note_chunks_fts_update AFTER UPDATE OF heading, content ON note_chunks
+    BEGIN
+        DELETE FROM note_chunks_fts WHERE rowid = OLD.id;
+        INSERT OR IGNORE INTO fts_pending (kind, item_id) VALUES ('chunk', NEW.id);
+    END
+    ''',
+]
+
+
+def _migrate_v9(conn: sqlite3.Connection):
+    for statement in _V9_STATEMENTS:
+        conn.execute(statement)
+
+
+def flush_fts_pending(conn: sqlite3.Connection) -> int:
+    """
+    为 fts_pending 中的三元组和笔记分块分词并写入全文索引，返回处理的条数。
+    需要在注册过 dc_segment 的写连接上、写事务内调用；迁移到 v9 之前 (表还不存在) 直接返回 0。
+    """
+    try:
+        if conn.execute("SELECT 1 FROM fts_pending LIMIT 1").fetchone() is None:
+            return 0
+    except sqlite3.OperationalError:
+        return 0
+    # 待建索引的行在提交前又被删除时，连接不到基础表，自然跳过
+    conn.execute(f'''
+        INSERT INTO triplets_fts (rowid, body)
+        SELECT t.id, {_TRIPLET_TEXT_SQL.format(row="t")}
+        FROM fts_pending p JOIN triplets t ON t.id = p.item_id WHERE p.kind = 'triplet'
+    ''')
+    conn.execute('''
+        INSERT INTO note_chunks_fts (rowid, heading, content)
+        SELECT c.id, dc_segment(c.heading), dc_segment(c.content)
+        FROM fts_pending p JOIN note_chunks c ON c.id = p.item_id WHERE p.kind = 'chunk'
+    ''')
+    return conn.execute("DELETE FROM fts_pending").rowcount
+
+
+# 按版本号顺序排列的迁移列表：新增结构变更时在末尾追加 (版本号, 迁移函数)
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+    (8, _migrate_v8),
+    (9, _migrate_v9),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """读取数据库当前的结构版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> list:
+    """
+    依次执行尚未应用的迁移，每个版本一个事务，返回本次应用的版本号列表。
+    调用方需持有写连接。
+    """
+    applied = []
+    current = get_schema_version(conn)
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        applied.append(version)
+    return applied
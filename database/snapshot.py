@@ -0,0 +1,422 @@
+"""
+DeepContext 图谱快照模块
+把整张知识图谱导出为一个列式二进制文件，用于在机器之间搬运图谱或离线分析：
+  - 字符串表：实体名、关系名、来源文件、别名键、归并前的原始写法、归并方式各一张，
+    UTF-8 字节拼接 + int64 偏移 (与 Arrow 的字符串列相同)
+  - 三元组列：源实体 / 关系 / 目标实体 / 来源文件都是 int32 编码 (对应字符串表的行号)，
+    另存原始 id 和创建时间 (Unix 秒)，导入空库时原样还原
+  - 归并记录 (entity_merges)：原始写法、归并到的实体、方式、相似度和时间，还原后实体消歧的历史不丢失
+  - 邻接偏移：三元组按源实体排序，附带出边 / 入边的 CSR 偏移，加载后直接按实体取边
+文件开头是魔数 + JSON 目录，各列按 64 字节对齐；load_snapshot() 用 mmap 零拷贝映射所有列，
+加载耗时与图的规模基本无关，字符串只在用到时解码。
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from config import ENTITY_RESOLUTION, SNAPSHOT_PATH
+from database.connection import get_manager
+from database.entity_resolution import get_entity_resolver
+from database.schema import get_schema_version
+from database.sqlite_db import insert_triplet_rows
+from database.tokenizer import segment_text
+from tracing import span
+
+FORMAT_VERSION = 2        # 2：增加归并记录
+
+_MAGIC = b"DCGSNAP\x00"
+_HEADER_LEN = struct.Struct("<Q")
+_ALIGN = 64
+_MERGE_BATCH = 10_000     # 合并导入时每次交给 insert_triplet_rows 的行数
+
+# 按文件中的顺序排列
+_STRING_TABLES = ("entity", "relation", "file", "alias", "merge_alias", "method")
+_COLUMNS = (
+    "entity_ids", "relation_ids", "alias_entity",
+    "triplet_ids", "source", "relation", "target", "file", "created_at",
+    "out_offsets", "in_order", "in_offsets",
+    "merge_ids", "merge_entity", "merge_method", "merge_score", "merge_created_at",
+)
+
+
+class SnapshotError(Exception):
+    """快照文件损坏、版本不兼容，或数据库内容无法导出"""
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class StringTable:
+    """只读字符串表：第 i 个字符串是 data[offsets[i]:offsets[i + 1]] 的 UTF-8 解码"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+        self._index = None
+
+    @classmethod
+    def encode(cls, values) -> "StringTable":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def tolist(self) -> list:
+        """一次解码全部字符串"""
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def index(self) -> dict:
+        """字符串 -> 行号 (首次调用时建立)"""
+        if self._index is None:
+            self._index = {value: i for i, value in enumerate(self.tolist())}
+        return self._index
+
+
+class GraphSnapshot:
+    """
+    内存映射的只读图谱快照
+
+    三元组按源实体编码排序：实体 i 的出边是第 out_offsets[i] 到 out_offsets[i + 1] 行，
+    入边是 in_order[in_offsets[i]:in_offsets[i + 1]] 给出的行。
+    同一事实来自多篇笔记时每篇各占一行。映射在对象 (及取出的列) 被回收时释放。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} 是空文件") from None
+        self.meta = self._read_header()
+        columns = {name: self._column(name) for name in self.meta["columns"]}
+        missing = [name for name in _COLUMNS if name not in columns]
+        missing += [f"{table}_{part}" for table in _STRING_TABLES for part in ("offsets", "data")
+                    if f"{table}_{part}" not in columns]
+        if missing:
+            raise SnapshotError(f"快照缺少列：{', '.join(missing)}")
+        for name in _COLUMNS:
+            setattr(self, name, columns[name])
+        self.entities = StringTable(columns["entity_offsets"], columns["entity_data"])
+        self.relations = StringTable(columns["relation_offsets"], columns["relation_data"])
+        self.files = StringTable(columns["file_offsets"], columns["file_data"])
+        self.alias_keys = StringTable(columns["alias_offsets"], columns["alias_data"])
+        self.merge_aliases = StringTable(columns["merge_alias_offsets"], columns["merge_alias_data"])
+        self.methods = StringTable(columns["method_offsets"], columns["method_data"])
+
+    def _read_header(self) -> dict:
+        prefix = len(_MAGIC) + _HEADER_LEN.size
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            raise SnapshotError(f"{self.path} 不是 DeepContext 图谱快照")
+        (length,) = _HEADER_LEN.unpack_from(self._mmap, len(_MAGIC))
+        try:
+            meta = json.loads(self._mmap[prefix:prefix + length].decode("utf-8"))
+        except ValueError:
+            raise SnapshotError(f"{self.path} 的文件头已损坏") from None
+        if meta.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"不支持的快照格式版本：{meta.get('format')} (当前为 {FORMAT_VERSION})")
+        meta["data_start"] = _align(prefix + length)
+        return meta
+
+    def _column(self, name: str) -> np.ndarray:
+        dtype_str, offset, length = self.meta["columns"][name]
+        dtype = np.dtype(dtype_str)
+        if not length:
+            return np.empty(0, dtype=dtype)
+        start = self.meta["data_start"] + offset
+        if start + length * dtype.itemsize > len(self._mmap):
+            raise SnapshotError(f"快照文件被截断 (列 {name} 超出文件末尾)")
+        return np.frombuffer(self._mmap, dtype=dtype, count=length, offset=start)
+
+    @property
+    def entity_count(self) -> int:
+        return len(self.entity_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.triplet_ids)
+
+    @property
+    def merge_count(self) -> int:
+        return len(self.merge_ids)
+
+    def entity_code(self, name: str):
+        """实体名 -> 编码，不存在时返回 None"""
+        return self.entities.index().get(name)
+
+    def out_edges(self, code: int):
+        """实体的出边，返回 (关系编码数组, 目标实体编码数组)"""
+        start, end = self.out_offsets[code], self.out_offsets[code + 1]
+        return self.relation[start:end], self.target[start:end]
+
+    def in_edges(self, code: int):
+        """实体的入边，返回 (关系编码数组, 源实体编码数组)"""
+        rows = self.in_order[self.in_offsets[code]:self.in_offsets[code + 1]]
+        return self.relation[rows], self.source[rows]
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.out_offsets)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_offsets)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> GraphSnapshot:
+    """内存映射打开一个快照文件"""
+    return GraphSnapshot(path)
+
+
+def write_snapshot(path: str, columns: dict, strings: dict, meta: dict):
+    """把列和字符串表写成快照文件 (先写临时文件再原子替换)"""
+    arrays = dict(columns)
+    for table, values in strings.items():
+        arrays[f"{table}_offsets"] = values.offsets
+        arrays[f"{table}_data"] = values.data
+    directory = {}
+    offset = 0
+    for name, array in arrays.items():
+        arrays[name] = array = np.ascontiguousarray(array)
+        directory[name] = [array.dtype.str, offset, len(array)]
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({**meta, "format": FORMAT_VERSION, "columns": directory}, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(_MAGIC) + _HEADER_LEN.size + len(header))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + directory[name][1])
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+
+
+def _csr_offsets(codes: np.ndarray, count: int) -> np.ndarray:
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=count), out=offsets[1:])
+    return offsets
+
+
+def _encode_ids(ids: np.ndarray, table_ids: np.ndarray, what: str) -> np.ndarray:
+    """数据库 id -> 在 (已排序的) table_ids 中的行号"""
+    codes = np.searchsorted(table_ids, ids)
+    bad = codes >= len(table_ids)
+    bad[~bad] = table_ids[codes[~bad]] != ids[~bad]
+    if bad.any():
+        raise SnapshotError(f"有 {int(bad.sum())} 条记录引用了不存在的{what} (如 id {int(ids[bad][0])})")
+    return codes.astype(np.int32)
+
+
+def export_snapshot(path: str = SNAPSHOT_PATH) -> dict:
+    """把当前数据库中的实体、关系、别名、归并记录和全部三元组导出为快照文件，返回统计信息"""
+    started = time.perf_counter()
+    with span("snapshot.export") as export_span, get_manager().reader() as conn:
+        # 多条查询放进同一个读事务，导出的是同一时刻的一致数据
+        conn.execute("BEGIN")
+        try:
+            schema_version = get_schema_version(conn)
+            entities = conn.execute("SELECT id, name FROM entities ORDER BY id").fetchall()
+            relations = conn.execute("SELECT id, name FROM relations ORDER BY id").fetchall()
+            aliases = conn.execute("SELECT alias_key, entity_id FROM entity_aliases ORDER BY id").fetchall()
+            merges = conn.execute(
+                "SELECT id, alias, entity_id, method, score, "
+                "COALESCE(CAST(strftime('%s', created_at) AS INTEGER), -1) FROM entity_merges ORDER BY id"
+            ).fetchall()
+            files = [row[0] for row in conn.execute("SELECT DISTINCT source_file FROM triplets ORDER BY source_file")]
+            # 整数列直接展平成一个数组，避免逐行构造元组
+            ints = np.fromiter(itertools.chain.from_iterable(conn.execute(
+                "SELECT id, source_id, relation_id, target_id, "
+                "COALESCE(CAST(strftime('%s', created_at) AS INTEGER), -1) FROM triplets ORDER BY id"
+            )), dtype=np.int64).reshape(-1, 5)
+            file_codes = {name: i for i, name in enumerate(files)}
+            file_column = np.fromiter(
+                (file_codes[row[0]] for row in conn.execute("SELECT source_file FROM triplets ORDER BY id")),
+                dtype=np.int32, count=len(ints),
+            )
+        finally:
+            conn.rollback()
+
+        entity_ids = np.array([row[0] for row in entities], dtype=np.int64)
+        relation_ids = np.array([row[0] for row in relations], dtype=np.int64)
+        source = _encode_ids(ints[:, 1], entity_ids, "实体")
+        relation = _encode_ids(ints[:, 2], relation_ids, "关系")
+        target = _encode_ids(ints[:, 3], entity_ids, "实体")
+        alias_entity = _encode_ids(np.array([row[1] for row in aliases], dtype=np.int64), entity_ids, "实体")
+        merge_entity = _encode_ids(np.array([row[2] for row in merges], dtype=np.int64), entity_ids, "实体")
+        methods = sorted({row[3] for row in merges})
+        method_codes = {name: i for i, name in enumerate(methods)}
+
+        # 按源实体排序 (稳定排序，同一实体的边保持 id 顺序)，得到出边的 CSR 布局
+        order = np.argsort(source, kind="stable")
+        source = source[order]
+        target = target[order]
+        columns = {
+            "entity_ids": entity_ids,
+            "relation_ids": relation_ids,
+            "alias_entity": alias_entity,
+            "triplet_ids": ints[order, 0],
+            "source": source,
+            "relation": relation[order],
+            "target": target,
+            "file": file_column[order],
+            "created_at": ints[order, 4],
+            "out_offsets": _csr_offsets(source, len(entity_ids)),
+            "in_order": np.argsort(target, kind="stable").astype(np.int32),
+            "in_offsets": _csr_offsets(target, len(entity_ids)),
+            "merge_ids": np.array([row[0] for row in merges], dtype=np.int64),
+            "merge_entity": merge_entity,
+            "merge_method": np.array([method_codes[row[3]] for row in merges], dtype=np.int8),
+            "merge_score": np.array([row[4] for row in merges], dtype=np.float64),
+            "merge_created_at": np.array([row[5] for row in merges], dtype=np.int64),
+        }
+        strings = {
+            "entity": StringTable.encode(row[1] for row in entities),
+            "relation": StringTable.encode(row[1] for row in relations),
+            "file": StringTable.encode(files),
+            "alias": StringTable.encode(row[0] for row in aliases),
+            "merge_alias": StringTable.encode(row[1] for row in merges),
+            "method": StringTable.encode(methods),
+        }
+        meta = {"schema_version": schema_version, "exported_at": time.time(),
+                "counts": {"entities": len(entities), "relations": len(relations), "files": len(files),
+                           "aliases": len(aliases), "merges": len(merges), "triplets": len(ints)}}
+        write_snapshot(path, columns, strings, meta)
+        export_span.set(triplets=len(ints), bytes=os.path.getsize(path))
+
+    return {**meta["counts"], "bytes": os.path.getsize(path),
+            "elapsed_s": round(time.perf_counter() - started, 3)}
+
+
+def _restore(conn, snapshot: GraphSnapshot) -> int:
+    """空库：保留原始 id 和创建时间，直接写入规范化表"""
+    entity_ids = snapshot.entity_ids
+    relation_ids = snapshot.relation_ids
+    conn.executemany("INSERT INTO entities (id, name) VALUES (?, ?)",
+                     zip(entity_ids.tolist(), snapshot.entities.tolist()))
+    conn.executemany("INSERT INTO relations (id, name) VALUES (?, ?)",
+                     zip(relation_ids.tolist(), snapshot.relations.tolist()))
+    conn.executemany("INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)",
+                     zip(snapshot.alias_keys.tolist(), entity_ids[snapshot.alias_entity].tolist()))
+    methods = snapshot.methods.tolist()
+    conn.executemany(
+        "INSERT INTO entity_merges (id, alias, entity_id, method, score, created_at) "
+        "VALUES (?, ?, ?, ?, ?, datetime(NULLIF(?, -1), 'unixepoch'))",
+        zip(snapshot.merge_ids.tolist(), snapshot.merge_aliases.tolist(),
+            entity_ids[snapshot.merge_entity].tolist(), map(methods.__getitem__, snapshot.merge_method.tolist()),
+            snapshot.merge_score.tolist(), snapshot.merge_created_at.tolist()),
+    )
+    # 按 id 顺序插入，三元组表的 B 树只在末尾追加
+    order = np.argsort(snapshot.triplet_ids, kind="stable")
+    triplet_ids = snapshot.triplet_ids[order].tolist()
+    source = snapshot.source[order]
+    relation = snapshot.relation[order]
+    target = snapshot.target[order]
+    files = snapshot.files.tolist()
+    rows = zip(
+        triplet_ids,
+        entity_ids[source].tolist(),
+        relation_ids[relation].tolist(),
+        entity_ids[target].tolist(),
+        map(files.__getitem__, snapshot.file[order].tolist()),
+        snapshot.created_at[order].tolist(),
+    )
+
+    # 全文索引触发器把每行三元组记入 fts_pending，提交前再逐行查三次名字并分词；
+    # 先停用，插入后按名字分词一次批量补建。
+    # 分词不会跨越空格，逐个名字分词再拼接与触发器对整段文本分词的结果完全相同。
+    # 停用和恢复都在同一事务里，失败回滚时触发器原样保留
+    (trigger_sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'triplets_fts_insert'"
+    ).fetchone()
+    conn.execute("DROP TRIGGER triplets_fts_insert")
+    inserted = conn.executemany(
+        "INSERT INTO triplets (id, source_id, relation_id, target_id, source_file, created_at) "
+        "VALUES (?, ?, ?, ?, ?, datetime(NULLIF(?, -1), 'unixepoch'))",
+        rows,
+    ).rowcount
+    entity_text = [segment_text(name) for name in snapshot.entities.tolist()]
+    relation_text = [segment_text(name) for name in snapshot.relations.tolist()]
+    conn.executemany(
+        "INSERT INTO triplets_fts (rowid, body) VALUES (?, ?)",
+        ((triplet_id, f"{entity_text[s]} {relation_text[r]} {entity_text[t]}")
+         for triplet_id, s, r, t in zip(triplet_ids, source.tolist(), relation.tolist(), target.tolist())),
+    )
+    conn.execute(trigger_sql)
+    return inserted
+
+
+def _merge(conn, snapshot: GraphSnapshot) -> int:
+    """
+    已有数据的库：按名字走普通写入路径 (实体消歧、去重)，id 和创建时间由目标库重新分配。
+    别名和归并记录改为指向目标库中消歧后的实体；与目标库已有别名冲突的键保留目标库的指向
+    """
+    entities = snapshot.entities.tolist()
+    relations = snapshot.relations.tolist()
+    files = snapshot.files.tolist()
+    inserted = 0
+    for start in range(0, snapshot.edge_count, _MERGE_BATCH):
+        rows = [
+            (entities[s], relations[r], entities[t], files[f])
+            for s, r, t, f in zip(*(column[start:start + _MERGE_BATCH].tolist() for column in (
+                snapshot.source, snapshot.relation, snapshot.target, snapshot.file)))
+        ]
+        inserted += insert_triplet_rows(conn, rows)
+
+    resolver = get_entity_resolver()
+    target_ids = {}
+
+    def target_id(code: int) -> int:
+        if code not in target_ids:
+            name = resolver.resolve(conn, entities[code]) if ENTITY_RESOLUTION else entities[code]
+            conn.execute("INSERT OR IGNORE INTO entities (name) VALUES (?)", (name,))
+            target_ids[code] = conn.execute("SELECT id FROM entities WHERE name = ?", (name,)).fetchone()[0]
+        return target_ids[code]
+
+    conn.executemany(
+        "INSERT OR IGNORE INTO entity_aliases (alias_key, entity_id) VALUES (?, ?)",
+        [(key, target_id(code)) for key, code in zip(snapshot.alias_keys.tolist(), snapshot.alias_entity.tolist())],
+    )
+    methods = snapshot.methods.tolist()
+    conn.executemany(
+        "INSERT OR IGNORE INTO entity_merges (alias, entity_id, method, score, created_at) "
+        "VALUES (?, ?, ?, ?, datetime(NULLIF(?, -1), 'unixepoch'))",
+        [(alias, target_id(code), methods[method], score, created_at)
+         for alias, code, method, score, created_at in zip(
+            snapshot.merge_aliases.tolist(), snapshot.merge_entity.tolist(), snapshot.merge_method.tolist(),
+            snapshot.merge_score.tolist(), snapshot.merge_created_at.tolist())],
+    )
+    return inserted
+
+
+def import_snapshot(path: str = SNAPSHOT_PATH) -> dict:
+    """
+    把快照导入当前数据库，全部写入在一个事务里完成 (失败则整体回滚)。
+    目标库没有任何实体和三元组时原样还原 (restore)；否则按名字合并进已有图谱 (merge)。
+    """
+    started = time.perf_counter()
+    snapshot = load_snapshot(path)
+    with span("snapshot.import", triplets=snapshot.edge_count) as import_span, get_manager().writer() as conn:
+        empty = not conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM entities) OR EXISTS (SELECT 1 FROM triplets)"
+        ).fetchone()[0]
+        mode = "restore" if empty else "merge"
+        inserted = _restore(conn, snapshot) if empty else _merge(conn, snapshot)
+        import_span.set(mode=mode, inserted=inserted)
+    return {"mode": mode, "triplets": snapshot.edge_count, "merges": snapshot.merge_count, "inserted": inserted,
+            "elapsed_s": round(time.perf_counter() - started, 3)}
@@ -4,34 +4,70 @@ DeepContext 数据库操作模块
 """
 
 import sqlite3
-from config import DB_PATH
+from config import BATCH_INGEST_MAX_ROWS, QUERY_MAX_ROWS, QUERY_MAX_CHARS, ENTITY_RESOLUTION
+from database.connection import get_manager
+from database.entity_resolution import canonicalize_rows
+from database.group_commit import get_group_writer
+from database.query_guard import QueryRejected, QueryBudgetExceeded, inspect_query, execution_budget, format_plan
+from database.result_format import FORMATS, fetch_page, format_rows
+from database.schema import flush_fts_pending, migrate
+from database.tokenizer import register_sql_functions
+from tracing import get_logger, span
+
+logger = get_logger("database")
+
+TRIPLET_FIELDS = ("source_entity", "relation", "target_entity", "source_file")
+
+# 按名字查外键写入规范化表；同一篇笔记重复入库时命中唯一约束直接跳过
+_INSERT_TRIPLET_SQL = '''
+    INSERT INTO triplets (source_id, relation_id, target_id, source_file)
+    VALUES (
+        (SELECT id FROM entities WHERE name = ?),
+        (SELECT id FROM relations WHERE name = ?),
+        (SELECT id FROM entities WHERE name = ?),
+        ?
+    )
+    ON CONFLICT DO NOTHING
+'''
 
 
 def init_db():
-    """初始化知识图谱数据库，如果表不存在则创建"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """初始化知识图谱数据库：执行尚未应用的结构迁移 (旧库会被原地升级)"""
+    manager = get_manager()
     
-    # 设计核心表结构：知识三元组表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS knowledge_triplets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source_entity TEXT NOT NULL,  -- 实体 A (如: "MCP协议")
-            relation TEXT NOT NULL,       -- 关系 (如: "作用于")
-            target_entity TEXT NOT NULL,  -- 实体 B (如: "大模型与本地环境的解耦")
-            source_file TEXT NOT NULL,    -- 知识来源 (溯源字段：来自哪篇笔记)
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    with manager.writer() as conn:
+        applied = migrate(conn)
+        # 外部连接 (sqlite3 命令行等) 写入后还没建全文索引的行，启动时补上
+        flush_fts_pending(conn)
     
-    conn.commit()
-    conn.close()
-    print(f"数据库初始化完成: {DB_PATH}")
+    if applied:
+        logger.info(f"数据库结构已升级到 v{applied[-1]}: {manager.db_path}")
+    logger.info(f"数据库初始化完成: {manager.db_path}")
 
 
 def get_db_connection():
-    """获取数据库连接"""
-    return sqlite3.connect(DB_PATH)
+    """获取一个独立的数据库连接 (不走连接池，适合一次性脚本)"""
+    conn = sqlite3.connect(get_manager().db_path)
+    register_sql_functions(conn)
+    return conn
+
+
+def insert_triplet_rows(conn: sqlite3.Connection, rows: list) -> int:
+    """
+    在给定的写连接上写入 (source_entity, relation, target_entity, source_file) 行，
+    先把实体名归并到规范实体 (见 database/entity_resolution.py)，驻留实体和关系，再写三元组。
+    返回新增条数，已存在的三元组 (包括归并后与已有事实相同的) 不计入。
+    """
+    with span("sql.insert", rows=len(rows)) as insert_span:
+        if ENTITY_RESOLUTION:
+            rows = canonicalize_rows(conn, rows)
+        entity_names = sorted({row[0] for row in rows} | {row[2] for row in rows})
+        relation_names = sorted({row[1] for row in rows})
+        conn.executemany("INSERT OR IGNORE INTO entities (name) VALUES (?)", [(n,) for n in entity_names])
+        conn.executemany("INSERT OR IGNORE INTO relations (name) VALUES (?)", [(n,) for n in relation_names])
+        inserted = conn.executemany(_INSERT_TRIPLET_SQL, rows).rowcount
+        insert_span.set(inserted=inserted)
+    return inserted
 
 
 def add_knowledge_triplet(source_entity: str, relation: str, target_entity: str, source_file: str) -> str:
@@ -40,29 +76,102 @@ def add_knowledge_triplet(source_entity: str, relation: str, target_entity: str,
     当你阅读完笔记，提取出核心概念和它们之间的关系时，调用此工具进行存储。
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO knowledge_triplets (source_entity, relation, target_entity, source_file)
-            VALUES (?, ?, ?, ?)
-        ''', (source_entity, relation, target_entity, source_file))
-        
-        conn.commit()
-        conn.close()
+        # 交给组提交写线程：并发的单条写入会被合并进同一个事务
+        row = (source_entity, relation, target_entity, source_file)
+        inserted = get_group_writer().call(lambda conn: insert_triplet_rows(conn, [row]))
         
+        if not inserted:
+            return f"知识 [{source_entity} -> {relation} -> {target_entity}] 已存在于数据库中 (来源: {source_file})，无需重复写入。"
         return f"成功将知识 [{source_entity} -> {relation} -> {target_entity}] 写入数据库 (来源: {source_file})。"
     except Exception as e:
         return f"❌ 写入数据库失败，底层错误：{str(e)}"
 
 
-def query_knowledge_graph(sql_query: str) -> str:
+def normalize_triplet(item, default_source_file: str):
+    """校验并整理一条批量输入的三元组，返回 (四元组, 错误信息)"""
+    if not isinstance(item, dict):
+        return None, "格式错误，应为包含 source_entity/relation/target_entity 的对象"
+    values = []
+    for field in TRIPLET_FIELDS:
+        value = item.get(field)
+        if value is None and field == "source_file":
+            value = default_source_file
+        if not isinstance(value, str) or not value.strip():
+            return None, f"缺少字段 {field}"
+        values.append(value.strip())
+    return tuple(values), None
+
+
+def add_knowledge_triplets_batch(triplets: list, source_file: str = "") -> str:
+    """
+    批量将知识三元组保存到知识图谱数据库中，所有三元组在一个事务里写入。
+    每个元素是包含 source_entity、relation、target_entity 的对象，
+    可单独指定 source_file，未指定时使用参数 source_file。
+    """
+    if not isinstance(triplets, list) or not triplets:
+        return "执行失败：triplets 必须是非空列表。"
+    if len(triplets) > BATCH_INGEST_MAX_ROWS:
+        return f"执行失败：单次最多写入 {BATCH_INGEST_MAX_ROWS} 条三元组，本次收到 {len(triplets)} 条，请分批调用。"
+    
+    # 1. 逐行校验，同时剔除批内重复
+    rows = []
+    row_indexes = []
+    errors = []
+    seen = set()
+    duplicates = 0
+    for index, item in enumerate(triplets, 1):
+        row, error = normalize_triplet(item, source_file)
+        if error:
+            errors.append((index, error))
+        elif row in seen:
+            duplicates += 1
+        else:
+            seen.add(row)
+            rows.append(row)
+            row_indexes.append(index)
+    
+    # 2. executemany 一次写入；若整体失败，逐行重试以定位具体出错的行
+    inserted = 0
+    failed_rows = 0
+    try:
+        if rows:
+            try:
+                with get_manager().writer() as conn:
+                    inserted = insert_triplet_rows(conn, rows)
+            except sqlite3.DatabaseError:
+                inserted = 0
+                with get_manager().writer() as conn:
+                    for index, row in zip(row_indexes, rows):
+                        conn.execute("SAVEPOINT batch_row")
+                        try:
+                            inserted += insert_triplet_rows(conn, [row])
+                        except sqlite3.DatabaseError as e:
+                            conn.execute("ROLLBACK TO batch_row")
+                            errors.append((index, str(e)))
+                            failed_rows += 1
+                        conn.execute("RELEASE batch_row")
+    except Exception as e:
+        return f"❌ 批量写入数据库失败，底层错误：{str(e)}"
+    
+    # 3. 一次性返回紧凑的汇总结果 (库中已存在的三元组也计入重复)
+    duplicates += len(rows) - inserted - failed_rows
+    output = [
+        f"批量写入完成：收到 {len(triplets)} 条，写入 {inserted} 条，"
+        f"重复跳过 {duplicates} 条，失败 {len(errors)} 条。"
+    ]
+    for index, error in sorted(errors):
+        output.append(f"- 第 {index} 条失败：{error}")
+    return "\n".join(output)
+
+
+def query_knowledge_graph(sql_query: str, offset: int = 0, output_format: str = "table",
+                          max_rows: int = QUERY_MAX_ROWS) -> str:
     """
     执行 SQL 查询语句，从知识图谱数据库中检索信息。
     当你需要回答用户关于已有知识的问题时，使用此工具。
     
     【重要提示】数据库表结构如下：
-    表名: knowledge_triplets
+    表名: knowledge_triplets (视图，底层为规范化存储)
     字段: 
       - id (INTEGER)
       - source_entity (TEXT) 实体A
@@ -70,36 +179,65 @@ def query_knowledge_graph(sql_query: str) -> str:
       - target_entity (TEXT) 实体B
       - source_file (TEXT) 来源文件
     
+    对实体、关系、来源文件使用等值条件 (=) 会走索引，比 LIKE '%...%' 快得多。
+    
+    结果分页返回：每页最多 max_rows 行、QUERY_MAX_CHARS 个字符，还有更多结果时会给出下一页的 offset。
+    output_format 可选 table (默认) / tsv / compact (省略本页取值都相同的列)，后两者更省 token。
+    
     注意：为了安全，你只能执行 SELECT 查询。
     """
     # 1. 防御性编程：只读限制 (极简版的安全校验)
     if not sql_query.strip().upper().startswith("SELECT"):
         return "安全拦截：为了保护图谱数据，当前工具仅允许执行 SELECT 查询语句。"
+    if output_format not in FORMATS:
+        return f"执行失败：output_format 只能是 {' / '.join(FORMATS)}。"
+    offset = max(0, int(offset))
+    max_rows = max(1, min(int(max_rows), QUERY_MAX_ROWS))
         
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # 2. 从只读连接池借出连接，执行大模型生成的 SQL 语句；只按批读取需要的那一页
+        # 执行前先检查查询计划 (笛卡尔积等会被直接拒绝)，执行中受时间和指令数预算限制
+        with span("sql.query", offset=offset) as query_span, get_manager().reader() as conn:
+            plan, warnings = inspect_query(conn, sql_query)
+            with execution_budget(conn) as budget:
+                cursor = conn.execute(sql_query)
+                try:
+                    rows, has_more = fetch_page(cursor, offset, max_rows)
+                    # 3. 获取表头列名，方便大模型阅读
+                    column_names = [description[0] for description in cursor.description]
+                finally:
+                    # 没读完的语句要及时关闭，否则会一直占着读事务
+                    cursor.close()
+            query_span.set(rows=len(rows), has_more=has_more, plan_warnings=len(warnings),
+                           execute_ms=round(budget["elapsed_ms"], 3))
         
-        # 2. 执行大模型生成的 SQL 语句
-        cursor.execute(sql_query)
-        results = cursor.fetchall()
-        
-        # 3. 获取表头列名，方便大模型阅读
-        column_names = [description[0] for description in cursor.description]
-        conn.close()
-        
-        if not results:
-            return f"SQL执行成功: '{sql_query}'，但数据库中没有找到匹配的数据。"
-            
-        # 4. 将查询结果格式化为纯文本表格返回给大模型
-        output = f"SQL执行成功: '{sql_query}'\n找到 {len(results)} 条记录：\n"
-        output += " | ".join(column_names) + "\n"
-        output += "-" * 50 + "\n"
-        for row in results:
-            output += " | ".join(str(item) for item in row) + "\n"
+        stats = f"(耗时 {budget['elapsed_ms']:.1f} ms)"
+        if warnings:
+            stats += "\n⚠️ 查询计划提示：" + "；".join(warnings) + "\n查询计划：\n" + format_plan(plan)
+        if not rows:
+            if offset:
+                return f"SQL执行成功: '{sql_query}'，第 {offset} 行之后没有更多数据。{stats}"
+            return f"SQL执行成功: '{sql_query}'，但数据库中没有找到匹配的数据。{stats}"
             
-        return output
+        # 4. 将本页结果格式化为纯文本返回给大模型 (超出字符预算时在行边界截断)
+        body, shown = format_rows(column_names, rows, output_format, QUERY_MAX_CHARS)
+        has_more = has_more or shown < len(rows)
+        if offset == 0 and not has_more:
+            header = f"SQL执行成功: '{sql_query}'\n找到 {shown} 条记录："
+        else:
+            header = f"SQL执行成功: '{sql_query}'\n返回第 {offset + 1}-{offset + shown} 条记录："
+        footer = ""
+        if has_more:
+            footer = (f"\n(还有更多结果，设置 offset={offset + shown} 获取下一页；"
+                      f"也可以加上 WHERE / LIMIT 或 COUNT(*) 缩小结果)")
+        return "\n".join([header, body]) + footer + "\n" + stats
         
+    except QueryRejected as e:
+        return (f"执行失败：查询被拒绝，{e.reason}。\n查询计划：\n{format_plan(e.plan)}\n"
+                f"请改用等值条件 (=) 连接或过滤，或先用 COUNT(*) / LIMIT 缩小范围后重试。")
+    except QueryBudgetExceeded as e:
+        return (f"执行失败：查询{e.reason}，已被中断 (耗时 {e.elapsed_ms:.0f} ms)。\n"
+                f"请加上更严格的 WHERE 条件或 LIMIT，避免对大表做 LIKE '%...%'、递归或多层连接后重试。")
     except Exception as e:
         # 如果大模型 SQL 写错了，把错误信息返回给它，它会自动修正！
-        return f"SQL语法错误或执行失败：{str(e)}。请检查你的 SQL 语句并重试。"
\ No newline at end of file
+        return f"SQL语法错误或执行失败：{str(e)}。请检查你的 SQL 语句并重试。"
@@ -0,0 +1,98 @@
+"""
+DeepContext 全文检索数据模块
+负责笔记分块的写入/清理，以及基于 FTS5 + BM25 的三元组和笔记分块检索
+"""
+
+from database.connection import get_manager
+from database.tokenizer import build_match_query
+
+
+def note_chunks_stale(source_file: str, mtime_ns: int, size: int) -> bool:
+    """笔记的分块索引是否需要重建 (从未建立或文件 stat 已变化)"""
+    with get_manager().reader() as conn:
+        row = conn.execute(
+            "SELECT mtime_ns, size FROM note_chunk_sources WHERE source_file = ?", (source_file,)
+        ).fetchone()
+    return row is None or row != (mtime_ns, size)
+
+
+def replace_note_chunks(source_file: str, mtime_ns: int, size: int, chunks) -> int:
+    """
+    用新的分块替换一篇笔记的全部旧分块 (触发器会同步更新全文索引)。
+    chunks 为 (标题, 起始行, 结束行, 正文) 序列，返回写入的分块数。
+    """
+    rows = [(source_file, i, heading, start, end, content)
+            for i, (heading, start, end, content) in enumerate(chunks)]
+    with get_manager().writer() as conn:
+        conn.execute("DELETE FROM note_chunks WHERE source_file = ?", (source_file,))
+        conn.executemany(
+            '''
+            INSERT INTO note_chunks (source_file, chunk_no, heading, start_line, end_line, content)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''',
+            rows,
+        )
+        conn.execute(
+            '''
+            INSERT INTO note_chunk_sources (source_file, mtime_ns, size) VALUES (?, ?, ?)
+            ON CONFLICT (source_file) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size
+            ''',
+            (source_file, mtime_ns, size),
+        )
+    return len(rows)
+
+
+def delete_note_chunks(paths) -> int:
+    """删除给定笔记的全部分块，返回删除条数"""
+    paths = [(p,) for p in paths]
+    if not paths:
+        return 0
+    with get_manager().writer() as conn:
+        deleted = conn.executemany("DELETE FROM note_chunks WHERE source_file = ?", paths).rowcount
+        conn.executemany("DELETE FROM note_chunk_sources WHERE source_file = ?", paths)
+    return deleted
+
+
+def _search(sql: str, query: str, limit: int) -> list:
+    """先要求所有检索词同时出现 (AND)，没有结果时放宽为任意一个 (OR)"""
+    with get_manager().reader() as conn:
+        for operator in ("AND", "OR"):
+            match = build_match_query(query, operator)
+            if not match:
+                return []
+            rows = conn.execute(sql, (match, limit)).fetchall()
+            if rows:
+                return rows
+    return []
+
+
+def search_triplets(query: str, limit: int = 10) -> list:
+    """按 BM25 检索三元组，返回 (id, 实体A, 关系, 实体B, 来源文件, 得分) 列表，得分越小越相关"""
+    return _search(
+        '''
+        SELECT k.id, k.source_entity, k.relation, k.target_entity, k.source_file, f.rank
+        FROM triplets_fts f
+        JOIN knowledge_triplets k ON k.id = f.rowid
+        WHERE triplets_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+        ''',
+        query,
+        limit,
+    )
+
+
+def search_note_chunks(query: str, limit: int = 10) -> list:
+    """按 BM25 检索笔记分块，返回 (来源文件, 章节标题, 起始行, 结束行, 正文, 得分) 列表"""
+    return _search(
+        '''
+        SELECT c.source_file, c.heading, c.start_line, c.end_line, c.content, f.rank
+        FROM note_chunks_fts f
+        JOIN note_chunks c ON c.id = f.rowid
+        WHERE note_chunks_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+        ''',
+        query,
+        limit,
+    )
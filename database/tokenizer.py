@@ -0,0 +1,78 @@
+"""
+DeepContext 全文检索分词模块
+SQLite 自带的 unicode61 分词器会把一整段连续的中文当成一个词，无法检索其中的片段。
+这里在写入索引前把中日韩文字切成重叠的二元组 (bigram)，例如 "知识图谱" -> "知识 识图 图谱"，
+查询时用同样的方式切分并组成短语查询，从而支持任意长度 (>= 2 字) 的中文子串检索。
+"""
+
+import re
+import sqlite3
+import unicodedata
+
+# 中日韩统一表意文字、扩展 A、兼容表意文字、日文假名、韩文音节
+_CJK_CLASS = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_CJK_RUN = re.compile(f"[{_CJK_CLASS}]+")
+_QUERY_TERM = re.compile(f"[{_CJK_CLASS}]+|[^\\W{_CJK_CLASS}]+")
+_WHITESPACE = re.compile(r"\s+")
+# 实体名里常被随意增删的分隔符：空白、连字符、下划线、间隔号，以及不在两个数字之间的点 (保留版本号)
+_ENTITY_SEPARATORS = re.compile(r"[\s\-_·・]+|\.(?!\d)|(?<!\d)\.")
+
+
+def _bigrams(run: str) -> list:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def segment_text(text) -> str:
+    """把文本中的中日韩连续片段展开成空格分隔的二元组，其余文字保持原样"""
+    if not text:
+        return ""
+    return _CJK_RUN.sub(lambda m: " " + " ".join(_bigrams(m.group())) + " ", str(text))
+
+
+def build_match_query(query: str, operator: str = "AND") -> str:
+    """
+    把用户的自然语言查询转换成 FTS5 MATCH 表达式。
+    中文片段 -> 二元组短语 (要求相邻出现)；单个汉字 -> 前缀匹配；英文/数字 -> 前缀匹配。
+    返回空字符串表示查询中没有可检索的词。
+    """
+    clauses = []
+    for term in _QUERY_TERM.findall(query or ""):
+        if _CJK_RUN.fullmatch(term):
+            if len(term) == 1:
+                clauses.append(f'"{term}"*')
+            else:
+                clauses.append('"' + " ".join(_bigrams(term)) + '"')
+        else:
+            clauses.append(f'"{term}"*')
+    return f" {operator} ".join(clauses)
+
+
+def query_terms(query: str) -> list:
+    """查询中的检索词 (用于在原文中定位摘要片段)"""
+    return _QUERY_TERM.findall(query or "")
+
+
+def is_cjk_term(term: str) -> bool:
+    """检索词是否为连续的中日韩文字"""
+    return bool(_CJK_RUN.fullmatch(term))
+
+
+def normalize_entity_name(name) -> str:
+    """实体名的规范写法：NFKC (全角字母数字转半角、兼容字符归一) 并合并多余空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", str(name or ""))).strip()
+
+
+def entity_key(name) -> str:
+    """
+    实体的规范化键：在规范写法的基础上 casefold 并去掉分隔符，
+    "ＭＣＰ 协议"、"mcp协议"、"MCP-协议" 得到同一个键
+    """
+    return _ENTITY_SEPARATORS.sub("", normalize_entity_name(name).casefold())
+
+
+def register_sql_functions(conn: sqlite3.Connection):
+    """注册全文索引触发器依赖的 SQL 函数；所有会写入三元组或笔记分块的连接都必须调用"""
+    conn.create_function("dc_segment", 1, segment_text, deterministic=True)
+    conn.create_function("dc_entity_key", 1, entity_key, deterministic=True)
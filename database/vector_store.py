@@ -0,0 +1,311 @@
+"""
+DeepContext 向量存储模块
+追加写入的 NumPy 向量集合，持久化在数据库旁的目录里 (每个集合三个文件 + 可选的 IVF 索引)：
+  {name}.vec      N x dim 的 int8 / float32 原始数组，新增向量直接追加到文件末尾
+  {name}.ids      N 个 int64 外部 id，-1 表示已删除 (墓碑)，墓碑过多时整体压缩重写
+  {name}.json     元数据：维度、类型、行数以及调用方的同步水位，最后写入 (原子替换)
+  {name}.ivf.npz  IVF 近似索引的簇中心和每行所属的簇
+检索默认是分块的向量化暴力 top-k；行数达到 VECTOR_ANN_MIN_ROWS 后改用 IVF，只扫描最近的 nprobe 个簇。
+"""
+
+import json
+import os
+
+import numpy as np
+
+from config import (
+    VECTOR_DTYPE,
+    VECTOR_SEARCH_BLOCK,
+    VECTOR_ANN_MIN_ROWS,
+    VECTOR_ANN_NPROBE,
+)
+
+_INT8_SCALE = 127.0
+_COMPACT_RATIO = 0.25       # 墓碑超过该比例时压缩
+_IVF_REBUILD_GROWTH = 2.0   # 行数比建索引时翻倍后重新聚类
+
+
+class IVFIndex:
+    """倒排文件 (IVF) 索引：球面 k-means 把向量分成 nlist 个簇，查询时只扫描与查询最相似的 nprobe 个簇"""
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, built_rows: int):
+        self.centroids = centroids   # nlist x dim，float32，行已归一化
+        self.assign = assign         # 每行所属的簇 (int32)
+        self.built_rows = built_rows
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, scale: float = 1.0, nlist: int = None, iterations: int = 8,
+              sample_size: int = 50_000, seed: int = 0):
+        count = len(vectors)
+        nlist = nlist or max(8, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(count, max(sample_size, nlist * 16)), replace=False))
+        sample = vectors[sample_rows].astype(np.float32) * scale
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            # 空簇重新随机取一个样本点作为中心
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        index = cls(centroids.astype(np.float32), np.empty(0, dtype=np.int32), count)
+        index.extend(vectors, scale)
+        return index
+
+    def extend(self, vectors: np.ndarray, scale: float = 1.0):
+        """为新追加的行分配簇"""
+        labels = [np.argmax(_as_float(vectors[i:i + VECTOR_SEARCH_BLOCK], scale) @ self.centroids.T, axis=1)
+                  for i in range(0, len(vectors), VECTOR_SEARCH_BLOCK)]
+        self.assign = np.concatenate([self.assign] + [l.astype(np.int32) for l in labels])
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """与查询最相似的 nprobe 个簇中的全部行号"""
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self.assign, probes))
+
+
+def _as_float(block: np.ndarray, scale: float) -> np.ndarray:
+    if block.dtype == np.float32:
+        return block
+    return block.astype(np.float32) * scale
+
+
+def _scores(vectors: np.ndarray, query: np.ndarray, scale: float) -> np.ndarray:
+    """
+    分块计算 vectors @ query。int8 向量逐块转换到同一个 float32 缓冲区再相乘，
+    块足够小时缓冲区一直留在 CPU 缓存里，速度与直接用 float32 存储相当；量化比例最后统一乘上。
+    """
+    scores = np.empty(len(vectors), dtype=np.float32)
+    buffer = None
+    for i in range(0, len(vectors), VECTOR_SEARCH_BLOCK):
+        block = vectors[i:i + VECTOR_SEARCH_BLOCK]
+        if block.dtype != np.float32:
+            if buffer is None:
+                buffer = np.empty((min(VECTOR_SEARCH_BLOCK, len(vectors)), vectors.shape[1]), dtype=np.float32)
+            np.copyto(buffer[:len(block)], block, casting="unsafe")
+            block = buffer[:len(block)]
+        scores[i:i + len(block)] = block @ query
+    if scale != 1.0:
+        scores *= scale
+    return scores
+
+
+class VectorStore:
+    """
+    向量集合
+
+    写操作 (add / delete / save) 由调用方串行执行；search 开始时取一次数组引用，
+    写入只会追加到当前行数之后或整体换成新数组，因此可以和写操作并发执行。
+    """
+
+    def __init__(self, directory: str, name: str, dim: int, dtype: str = VECTOR_DTYPE,
+                 ann_min_rows: int = VECTOR_ANN_MIN_ROWS, nprobe: int = VECTOR_ANN_NPROBE):
+        self.directory = directory
+        self.name = name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.scale = 1.0 / _INT8_SCALE if self.dtype == np.int8 else 1.0
+        self.ann_min_rows = ann_min_rows
+        self.nprobe = nprobe
+        self.meta = {}
+        self._clear()
+
+    def _clear(self):
+        self._vectors = np.empty((0, self.dim), dtype=self.dtype)
+        self._ids = np.empty(0, dtype=np.int64)
+        self.count = 0
+        self.deleted = 0
+        self._persisted = 0       # 已写入文件的行数
+        self._rewrite = True      # 下次保存时整体重写 (而不是追加)
+        self._ivf = None
+        self._ivf_dirty = False
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"{self.name}.{suffix}")
+
+    @property
+    def live_count(self) -> int:
+        return self.count - self.deleted
+
+    @property
+    def nbytes(self) -> int:
+        return self.count * (self.dim * self.dtype.itemsize + 8)
+
+    # ---------- 持久化 ----------
+
+    def load(self, expected_meta: dict) -> bool:
+        """
+        从文件加载；文件不存在、损坏，或元数据与 expected_meta (如向量化器名称) 不一致时清空并返回 False。
+        文件里超出元数据行数的部分是上次保存中途失败留下的，直接忽略。
+        """
+        self._clear()
+        self.meta = {}
+        try:
+            with open(self._path("json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("dim") != self.dim or meta.get("dtype") != self.dtype.name:
+                return False
+            if any(meta.get(key) != value for key, value in expected_meta.items()):
+                return False
+            count = meta["count"]
+            vectors = np.fromfile(self._path("vec"), dtype=self.dtype, count=count * self.dim)
+            ids = np.fromfile(self._path("ids"), dtype=np.int64, count=count)
+            if len(vectors) != count * self.dim or len(ids) != count:
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self._vectors = vectors.reshape(count, self.dim)
+        self._ids = ids
+        self.count = count
+        self.deleted = int(np.count_nonzero(ids < 0))
+        self._persisted = count
+        self._rewrite = False
+        self.meta = meta
+        try:
+            data = np.load(self._path("ivf.npz"))
+            if len(data["assign"]) == count:
+                self._ivf = IVFIndex(data["centroids"], data["assign"], int(data["built_rows"]))
+        except (OSError, ValueError, KeyError):
+            self._ivf = None
+        return True
+
+    def reset(self, meta: dict):
+        """清空集合 (下次保存时覆盖旧文件)"""
+        self._clear()
+        self._ivf_dirty = True  # 删除旧的 IVF 文件
+        self.meta = dict(meta)
+
+    def save(self):
+        """把新增的行追加到向量文件，重写 id 文件和 IVF 索引 (有变化时)，最后原子替换元数据"""
+        os.makedirs(self.directory, exist_ok=True)
+        start = 0 if self._rewrite or not os.path.exists(self._path("vec")) else self._persisted
+        with open(self._path("vec"), "wb" if start == 0 else "r+b") as f:
+            f.seek(start * self.dim * self.dtype.itemsize)
+            f.write(np.ascontiguousarray(self._vectors[start:self.count]).tobytes())
+            f.truncate()
+        # 墓碑可能落在已保存的行上，id 文件每次整体重写 (每行 8 字节，代价很小)
+        self._ids[:self.count].tofile(self._path("ids"))
+        if self._ivf_dirty:
+            if self._ivf is None:
+                _remove(self._path("ivf.npz"))
+            else:
+                tmp = self._path("ivf.tmp.npz")
+                np.savez(tmp, centroids=self._ivf.centroids, assign=self._ivf.assign,
+                         built_rows=self._ivf.built_rows)
+                os.replace(tmp, self._path("ivf.npz"))
+            self._ivf_dirty = False
+        self.meta.update({"dim": self.dim, "dtype": self.dtype.name, "count": self.count})
+        tmp = self._path("json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, self._path("json"))
+        self._persisted = self.count
+        self._rewrite = False
+
+    # ---------- 写入 ----------
+
+    def add(self, ids, vectors: np.ndarray):
+        """追加向量 (float32，行已归一化)；同一 id 重复写入前应先 delete"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        if self.dtype == np.int8:
+            vectors = np.clip(np.rint(vectors * _INT8_SCALE), -_INT8_SCALE, _INT8_SCALE).astype(np.int8)
+        else:
+            vectors = vectors.astype(self.dtype, copy=False)
+        needed = self.count + len(ids)
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids), 1024)
+            grown = np.empty((capacity, self.dim), dtype=self.dtype)
+            grown[:self.count] = self._vectors[:self.count]
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_ids[:self.count] = self._ids[:self.count]
+            self._vectors, self._ids = grown, grown_ids
+        self._vectors[self.count:needed] = vectors
+        self._ids[self.count:needed] = ids
+        start, self.count = self.count, needed
+        if self._ivf is not None:
+            if self.count >= self._ivf.built_rows * _IVF_REBUILD_GROWTH:
+                self._ivf = None  # 下次检索时重新聚类
+            else:
+                self._ivf.extend(self._vectors[start:self.count], self.scale)
+            self._ivf_dirty = True
+
+    def delete(self, ids) -> int:
+        """把给定 id 的行标记为墓碑，返回删除行数；墓碑过多时压缩"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids) or not self.count:
+            return 0
+        rows = np.flatnonzero(np.isin(self._ids[:self.count], ids))
+        if not len(rows):
+            return 0
+        self._ids[rows] = -1
+        self.deleted += len(rows)
+        if self.deleted > self.count * _COMPACT_RATIO and self.count > 1024:
+            self._compact()
+        return len(rows)
+
+    def _compact(self):
+        keep = np.flatnonzero(self._ids[:self.count] >= 0)
+        self._vectors = self._vectors[keep]
+        self._ids = self._ids[keep]
+        self.count = len(keep)
+        self.deleted = 0
+        self._rewrite = True
+        if self._ivf is not None:
+            self._ivf = IVFIndex(self._ivf.centroids, self._ivf.assign[keep], self._ivf.built_rows)
+            self._ivf_dirty = True
+
+    # ---------- 检索 ----------
+
+    def build_ann(self, nlist: int = None):
+        """(重新) 建立 IVF 索引"""
+        self._ivf = IVFIndex.build(self._vectors[:self.count], self.scale, nlist)
+        self._ivf_dirty = True
+
+    @property
+    def has_ann(self) -> bool:
+        return self._ivf is not None
+
+    def uses_ann(self) -> bool:
+        return bool(self.ann_min_rows) and self.live_count >= self.ann_min_rows
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = None, exact: bool = False) -> list:
+        """
+        返回与 query (已归一化) 余弦相似度最高的 k 个 (id, 相似度)。
+        exact=True 时忽略 IVF 索引做暴力检索。IVF 索引缺失时需先由写入方调用 build_ann()。
+        """
+        count, ivf = self.count, self._ivf
+        vectors, ids = self._vectors[:count], self._ids[:count]
+        if not count or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+
+        if not exact and ivf is not None and self.uses_ann():
+            rows = ivf.candidates(query, nprobe or self.nprobe)
+            rows = rows[rows < count]
+            scores = _scores(vectors[rows], query, self.scale)
+        else:
+            rows = None
+            scores = _scores(vectors, query, self.scale)
+        row_ids = ids if rows is None else ids[rows]
+        scores[row_ids < 0] = -np.inf
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row_ids[i]), float(scores[i])) for i in top if scores[i] > -np.inf]
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -4,9 +4,20 @@ DeepContext 主程序入口
 """
 
 import asyncio
+import json
 import sys
 import argparse
+from config import (MCP_TRANSPORT, MCP_HTTP_PORT, MCP_SERVER_URL, BATCH_CONCURRENCY, INGEST_CONCURRENCY, LLM_CACHE_MODE,
+                    TRACE_EXPORT, TRACE_PATH, SNAPSHOT_PATH)
 from core.agent import DeepContextAgent
+from core.batch import run_batch
+from core.ingest import run_ingest
+from core.llm_cache import MODES as LLM_CACHE_MODES
+from core.llm_client import LLMClient
+from tracing import (EXPORT_FORMATS, get_logger, init_tracer, setup_logging, load_spans, summarize_spans,
+                     format_summary)
+
+logger = get_logger("main")
 
 
 def parse_args():
@@ -14,39 +25,241 @@ def parse_args():
     parser = argparse.ArgumentParser(description="DeepContext - 智能知识管理系统")
     parser.add_argument(
         "--mode", 
-        choices=["server", "agent"], 
+        choices=["server", "agent", "batch", "ingest", "recanonicalize", "register-alias", "trace-summary",
+                 "export-snapshot", "import-snapshot"], 
         default="agent",
-        help="运行模式: server (启动 MCP Server) 或 agent (启动 Agent Client)"
+        help="运行模式: server (启动 MCP Server)、agent (启动 Agent Client)、batch (批量查询)、"
+             "ingest (离线把笔记目录抽取入库)、recanonicalize (按实体消歧规则合并已有数据库中的重复实体)、"
+             "register-alias (手动登记实体的同义写法并合并已有实体)、"
+             "trace-summary (按 span 类型汇总追踪文件中的耗时)、"
+             "export-snapshot / import-snapshot (把整张图谱导出为列式快照文件 / 从快照文件导入)"
     )
     parser.add_argument(
         "--query", 
         type=str, 
         help="Agent 模式下的用户查询"
     )
+    parser.add_argument(
+        "--server-url",
+        type=str,
+        default=MCP_SERVER_URL,
+        help="Agent 模式下连接的常驻 Server 地址 (如 http://127.0.0.1:8765/mcp)，为空则启动子进程"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="batch 模式的输入文件 (JSONL，每行包含 query，或 title / body)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="-",
+        help="batch 模式的输出文件 (JSONL)，默认输出到标准输出"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"batch 模式同时运行的 Agent 数 (默认 {BATCH_CONCURRENCY})，"
+             f"ingest 模式同时进行的抽取请求数 (默认 {INGEST_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--notes-dir",
+        type=str,
+        help="ingest 模式要处理的笔记目录 (递归扫描其中新增或修改过的 .md 文件)"
+    )
+    parser.add_argument(
+        "--stub-llm",
+        action="store_true",
+        help="ingest 模式使用本地桩模型代替真实大模型 (不联网，用于验证流水线)"
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=LLM_CACHE_MODES,
+        default=LLM_CACHE_MODE,
+        help="大模型响应缓存：off (不缓存)、cache (命中即返回，未命中联网后写入)、"
+             "record (总是联网并录制) 或 replay (只从缓存回放，不联网，未命中时报错)"
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="agent / batch 模式不使用流式调用 (等整轮回复生成完再执行工具)"
+    )
+    parser.add_argument(
+        "--trace",
+        choices=EXPORT_FORMATS,
+        default=TRACE_EXPORT,
+        help="追踪导出格式：off、jsonl (每行一个 span) 或 otlp (OpenTelemetry OTLP/JSON)；"
+             "stdio 子进程 Server 的 span 写入同一个文件"
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        default=TRACE_PATH,
+        help="追踪文件路径 (追加写入)；trace-summary 模式读取的文件"
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        default=SNAPSHOT_PATH,
+        help="export-snapshot / import-snapshot 模式的快照文件路径"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="recanonicalize 模式只列出将要合并的实体，不修改数据库"
+    )
+    parser.add_argument(
+        "--alias",
+        type=str,
+        help="register-alias 模式要登记的同义写法 (如 MCP)"
+    )
+    parser.add_argument(
+        "--entity",
+        type=str,
+        help="register-alias 模式 alias 归并到的规范实体名 (如 Model Context Protocol)"
+    )
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http"],
+        default=MCP_TRANSPORT,
+        help="Server 模式的传输方式：stdio 或 streamable-http (本机常驻服务)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=MCP_HTTP_PORT,
+        help="streamable-http 模式监听的端口"
+    )
     return parser.parse_args()
 
 
-async def run_agent(query=None):
+async def run_agent(query=None, server_url=None, llm_cache=None, streaming=None):
     """运行 Agent 客户端"""
-    agent = DeepContextAgent()
+    agent = DeepContextAgent(server_url, LLMClient(cache_mode=llm_cache), streaming=streaming)
     await agent.run(query)
 
 
-def run_server():
-    """运行 MCP Server"""
-    import subprocess
-    print("🚀 启动 DeepContext MCP Server...")
-    subprocess.run([sys.executable, "server.py"])
+async def run_batch_queries(input_path, output_path, concurrency, server_url=None, llm_cache=None, streaming=None):
+    """批量运行 JSONL 中的问题，汇总信息输出到标准错误，避免和结果混在一起"""
+    agent = DeepContextAgent(server_url, LLMClient(cache_mode=llm_cache), verbose=False, streaming=streaming)
+    stats = await run_batch(input_path, output_path, concurrency, server_url, agent=agent)
+    print(f"📊 [批量查询完成]: {json.dumps(stats, ensure_ascii=False)}", file=sys.stderr)
+
+
+async def run_ingest_notes(directory, concurrency, stub_llm=False, llm_cache=None):
+    """离线入库：汇总信息输出到标准错误"""
+    from database import init_db
+    init_db()
+    if stub_llm:
+        # 桩模型放在 benchmarks 里，运行时代码不依赖它
+        from benchmarks.stub_llm import StubLLMClient
+        llm = StubLLMClient()
+    else:
+        llm = LLMClient(cache_mode=llm_cache)
+    stats = await run_ingest(directory, concurrency, llm)
+    print(f"📊 [离线入库完成]: {json.dumps(stats, ensure_ascii=False)}", file=sys.stderr)
+
+
+def run_recanonicalize(dry_run=False):
+    """按当前的实体消歧规则整理已有数据库，汇总信息输出到标准错误"""
+    from database import init_db
+    from database.entity_resolution import recanonicalize_entities
+    init_db()
+    stats = recanonicalize_entities(dry_run)
+    for alias, canonical, method, score in stats.pop("merges"):
+        print(f"{alias}\t->\t{canonical}\t{method}\t{score:.2f}")
+    action = "将合并" if dry_run else "已合并"
+    print(f"📊 [实体整理{'预览' if dry_run else '完成'}]: 共 {stats['entities']} 个实体，{action} {stats['merged']} 个，"
+          f"新增别名 {stats['aliases']} 个", file=sys.stderr)
+
+
+def run_register_alias(alias, entity):
+    """登记实体的同义写法，已有的同名实体合并到规范实体，汇总信息输出到标准错误"""
+    from database import init_db
+    from database.entity_resolution import register_alias
+    init_db()
+    try:
+        result = register_alias(alias, entity)
+    except ValueError as e:
+        sys.exit(f"登记别名失败：{e}")
+    merged = f"，合并实体 {result['merged']} ({result['triplets']} 条三元组)" if result["merged"] else ""
+    print(f"📊 [别名登记完成]: {result['alias']} -> {result['entity']}{merged}", file=sys.stderr)
+
+
+def run_export_snapshot(path):
+    """把图谱导出为快照文件，汇总信息输出到标准错误"""
+    from database import init_db
+    from database.snapshot import export_snapshot
+    init_db()
+    stats = export_snapshot(path)
+    print(f"📊 [快照导出完成] {path}: {json.dumps(stats, ensure_ascii=False)}", file=sys.stderr)
+
+
+def run_import_snapshot(path):
+    """从快照文件导入图谱 (空库原样还原，否则按名字合并)，汇总信息输出到标准错误"""
+    from database import init_db
+    from database.snapshot import SnapshotError, import_snapshot
+    init_db()
+    try:
+        stats = import_snapshot(path)
+    except FileNotFoundError:
+        sys.exit(f"快照文件不存在：{path}")
+    except SnapshotError as e:
+        sys.exit(f"快照导入失败：{e}")
+    print(f"📊 [快照导入完成] {path}: {json.dumps(stats, ensure_ascii=False)}", file=sys.stderr)
+
+
+def run_trace_summary(path):
+    """按 span 类型输出追踪文件中的次数、错误数和 p50 / p95 耗时"""
+    try:
+        spans = load_spans(path)
+    except FileNotFoundError:
+        sys.exit(f"追踪文件不存在：{path} (运行时加上 --trace jsonl 或 --trace otlp 生成)")
+    traces = len({s["trace_id"] for s in spans})
+    print(f"📊 [追踪汇总] {path}：{len(spans)} 个 span，{traces} 个 trace")
+    print(format_summary(summarize_spans(spans)))
+
+
+def run_server(transport=MCP_TRANSPORT, port=MCP_HTTP_PORT, trace=TRACE_EXPORT, trace_file=TRACE_PATH):
+    """在当前进程中运行 MCP Server (不再额外启动一个子进程)"""
+    logger.info("🚀 启动 DeepContext MCP Server...")
+    import server
+    server.run(transport=transport, port=port, trace=trace, trace_file=trace_file)
 
 
 def main():
     """主函数"""
     args = parse_args()
+    setup_logging()
+    if args.mode != "server":
+        init_tracer(args.trace, args.trace_file, service="deepcontext-agent")
     
     if args.mode == "server":
-        run_server()
+        run_server(args.transport, args.port, args.trace, args.trace_file)
     elif args.mode == "agent":
-        asyncio.run(run_agent(args.query))
+        asyncio.run(run_agent(args.query, args.server_url, args.llm_cache, False if args.no_stream else None))
+    elif args.mode == "batch":
+        if not args.input:
+            sys.exit("batch 模式需要通过 --input 指定输入文件")
+        asyncio.run(run_batch_queries(args.input, args.output, args.concurrency, args.server_url, args.llm_cache,
+                                      False if args.no_stream else None))
+    elif args.mode == "ingest":
+        if not args.notes_dir:
+            sys.exit("ingest 模式需要通过 --notes-dir 指定笔记目录")
+        asyncio.run(run_ingest_notes(args.notes_dir, args.concurrency, args.stub_llm, args.llm_cache))
+    elif args.mode == "recanonicalize":
+        run_recanonicalize(args.dry_run)
+    elif args.mode == "register-alias":
+        if not args.alias or not args.entity:
+            sys.exit("register-alias 模式需要通过 --alias 和 --entity 指定同义写法和规范实体名")
+        run_register_alias(args.alias, args.entity)
+    elif args.mode == "trace-summary":
+        run_trace_summary(args.trace_file)
+    elif args.mode == "export-snapshot":
+        run_export_snapshot(args.snapshot)
+    elif args.mode == "import-snapshot":
+        run_import_snapshot(args.snapshot)
 
 
 if __name__ == "__main__":
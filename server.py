@@ -3,50 +3,174 @@ DeepContext MCP Server
 提供工具和资源给 Agent 使用
 """
 
+import argparse
+import json
+
 from mcp.server.fastmcp import FastMCP
+from config import (
+    MCP_TRANSPORT, MCP_HTTP_HOST, MCP_HTTP_PORT, TRACE_EXPORT, TRACE_PATH,
+    NOTE_LIST_PAGE_SIZE, NOTE_LIST_MAX_PAGE_SIZE, QUERY_MAX_ROWS, SEARCH_DEFAULT_LIMIT,
+)
 from tools.file_tools import list_my_notes, read_note_content
-from tools.graph_tools import add_knowledge_triplet, query_knowledge_graph
+from tools.note_reader import read_note_outline, read_note_section, read_note_range
+from tools.note_indexer import list_changed_notes, mark_notes_ingested
+from tools.graph_tools import (
+    add_knowledge_triplet, add_knowledge_triplets_batch, register_entity_alias, query_knowledge_graph,
+)
+from tools.graph_traversal import graph_neighbors, graph_k_hop, graph_shortest_path
+from tools.search_tools import search
+from tools.semantic_search import semantic_search
+from tools.result_cache import get_result_cache, note_key, db_key, normalize_sql
+from tools.async_runner import get_tool_runner, run_tool
 from database import init_db
+from tracing import EXPORT_FORMATS, get_logger, init_tracer, setup_logging
+
+logger = get_logger("server")
 
 # 1. 初始化 MCP Server，命名为 DeepContext
 mcp = FastMCP("DeepContext")
 
-# 2. 在启动前先建好数据库
+# 2. 在启动前先建好数据库 (日志输出到标准错误，不会混进 stdio 传输)
+setup_logging()
 init_db()
 
+# 工具统一通过 run_tool 在线程池中执行 (见 tools/async_runner.py)，不阻塞事件循环；
+# 只读工具的结果会被缓存 (见 tools/result_cache.py)；以下前缀表示失败，可能是临时性错误，不缓存
+_FAILURE_PREFIXES = ("执行失败", "安全拦截", "SQL语法错误", "❌",
+                     "读取文件时发生底层系统错误", "图遍历时发生底层错误", "全文检索时发生底层错误",
+                     "语义检索时发生底层错误")
+
+
+def _succeeded(result: str) -> bool:
+    return not result.startswith(_FAILURE_PREFIXES)
+
+
+def _with_settings(fn):
+    """把工具说明里的 {NOTE_LIST_MAX_PAGE_SIZE} 等占位符替换为当前配置，说明与实际上限保持一致"""
+    fn.__doc__ = fn.__doc__.format(
+        NOTE_LIST_PAGE_SIZE=NOTE_LIST_PAGE_SIZE,
+        NOTE_LIST_MAX_PAGE_SIZE=NOTE_LIST_MAX_PAGE_SIZE,
+        QUERY_MAX_ROWS=QUERY_MAX_ROWS,
+    )
+    return fn
+
 # 3. 注册文件相关工具
 @mcp.tool()
-def list_my_notes_tool(directory_path: str) -> str:
+@_with_settings
+async def list_my_notes_tool(directory_path: str, max_depth: int = -1, pattern: str = "*.md",
+                       cursor: str = "", page_size: int = NOTE_LIST_PAGE_SIZE) -> str:
     """
-    核心技能：列出指定本地目录下的所有 Markdown 笔记文件。
+    核心技能：递归列出指定本地目录下的 Markdown 笔记文件，结果分页返回。
+    
+    参数说明：
+      - directory_path: 笔记目录
+      - max_depth: 递归深度，0 表示只看当前目录，-1 (默认) 不限
+      - pattern: 文件名通配符，如 "*学习*.md"；包含 / 时按相对路径匹配，如 "AI/*.md"
+      - cursor: 上一页返回的游标，首次调用留空
+      - page_size: 每页数量 (默认 {NOTE_LIST_PAGE_SIZE}，最多 {NOTE_LIST_MAX_PAGE_SIZE})
     """
-    return list_my_notes(directory_path)
+    return await run_tool("list_my_notes", list_my_notes, directory_path, max_depth, pattern, cursor, page_size)
 
 @mcp.tool()
-def read_note_content_tool(filepath: str) -> str:
+async def read_note_content_tool(filepath: str) -> str:
     """
     核心技能：读取指定 Markdown 笔记文件的全部文本内容。
     当用户询问某个具体笔记里写了什么，或者需要提取知识时，调用此工具。
+    笔记过大时只返回开头部分，其余内容请配合 read_note_outline_tool 和 read_note_section_tool 读取。
     """
-    return read_note_content(filepath)
+    return await run_tool("read_note_content", read_note_content, filepath,
+                          key=note_key("read_note_content", filepath), cacheable=_succeeded)
+
+@mcp.tool()
+async def read_note_outline_tool(filepath: str, max_level: int = 6) -> str:
+    """
+    核心技能：返回笔记的标题大纲 (每节的编号、行范围和大小)，不返回正文。
+    面对较大的笔记时先看大纲，再按章节读取需要的部分。
+    max_level 可只显示较高层级的标题 (如 2 表示只看 # 和 ##)。
+    """
+    return await run_tool("read_note_outline", read_note_outline, filepath, max_level,
+                          key=note_key("read_note_outline", filepath, max_level), cacheable=_succeeded)
+
+@mcp.tool()
+async def read_note_section_tool(filepath: str, section: str) -> str:
+    """
+    核心技能：按章节读取笔记。section 可以是大纲中的编号 (如 "3")，也可以是标题文字。
+    章节包含其下所有子标题的内容。
+    """
+    return await run_tool("read_note_section", read_note_section, filepath, section,
+                          key=note_key("read_note_section", filepath, section), cacheable=_succeeded)
+
+@mcp.tool()
+async def read_note_range_tool(filepath: str, start: int = 1, end: int = 0, unit: str = "line") -> str:
+    """
+    核心技能：按范围读取笔记。
+    unit="line" (默认) 时读取第 start 到第 end 行 (从 1 计，含两端，end=0 表示到文件末尾)；
+    unit="byte" 时读取字节区间 [start, end)。单次返回内容有上限，超出时会提示从哪里继续。
+    """
+    return await run_tool("read_note_range", read_note_range, filepath, start, end, unit,
+                          key=note_key("read_note_range", filepath, start, end, unit), cacheable=_succeeded)
+
+@mcp.tool()
+async def list_changed_notes_tool(directory_path: str) -> str:
+    """
+    核心技能：增量扫描目录，只列出自上次入库以来新增或修改过的 Markdown 笔记。
+    需要把笔记整理进知识图谱时，优先用此工具代替 list_my_notes_tool，未变化的笔记无需重复阅读。
+    已删除笔记的旧三元组会被自动清理；修改过的笔记的旧三元组在第一次写入它的新三元组时清理。
+    """
+    return await run_tool("list_changed_notes", list_changed_notes, directory_path, write=True)
+
+@mcp.tool()
+async def mark_notes_ingested_tool(filepaths: list[str]) -> str:
+    """
+    核心技能：在把一批笔记的三元组写入知识图谱之后调用，记录这些笔记已入库。
+    之后只要笔记内容没变，list_changed_notes_tool 就不会再列出它们。
+    """
+    return await run_tool("mark_notes_ingested", mark_notes_ingested, filepaths, write=True)
 
 # 4. 注册知识图谱相关工具
 @mcp.tool()
-def add_knowledge_triplet_tool(source_entity: str, relation: str, target_entity: str, source_file: str) -> str:
+async def add_knowledge_triplet_tool(source_entity: str, relation: str, target_entity: str, source_file: str) -> str:
     """
     核心技能：将提取到的知识三元组保存到本地知识图谱数据库中。
     当你阅读完笔记，提取出核心概念和它们之间的关系时，调用此工具进行存储。
     """
-    return add_knowledge_triplet(source_entity, relation, target_entity, source_file)
+    # 单条写入交给组提交写线程，不占写锁：并发的单条写入才能被合并进同一个事务
+    return await run_tool("add_knowledge_triplet", add_knowledge_triplet, source_entity, relation, target_entity, source_file)
 
 @mcp.tool()
-def query_knowledge_graph_tool(sql_query: str) -> str:
+async def add_knowledge_triplets_batch_tool(triplets: list[dict[str, str]], source_file: str = "") -> str:
+    """
+    核心技能：一次性批量保存多条知识三元组到知识图谱数据库，所有三元组在一个事务中写入。
+    读完一篇笔记后，请把提取出的全部三元组放进一个列表调用此工具，而不是逐条调用 add_knowledge_triplet_tool。
+    
+    参数说明：
+      - triplets: 三元组列表，每个元素形如
+        {"source_entity": "MCP协议", "relation": "作用于", "target_entity": "大模型与本地环境的解耦"}
+        元素中也可以单独带上 "source_file"
+      - source_file: 默认来源文件，元素未指定 source_file 时使用它
+    
+    返回写入条数、重复跳过条数以及每条失败记录的原因。
+    """
+    return await run_tool("add_knowledge_triplets_batch", add_knowledge_triplets_batch, triplets, source_file, write=True)
+
+@mcp.tool()
+async def register_entity_alias_tool(alias: str, entity: str) -> str:
+    """
+    登记实体的同义写法 (如缩写 "MCP" 与全称 "Model Context Protocol")：之后写入 alias 时自动归并到 entity。
+    如果 alias 已经作为独立实体写入过，它的三元组会合并到 entity 上，归并记录可在 entity_merges 中查询。
+    entity 不存在时会先创建。
+    """
+    return await run_tool("register_entity_alias", register_entity_alias, alias, entity, write=True)
+
+@mcp.tool()
+@_with_settings
+async def query_knowledge_graph_tool(sql_query: str, offset: int = 0, output_format: str = "table") -> str:
     """
     核心技能：执行 SQL 查询语句，从知识图谱数据库中检索信息。
     当你需要回答用户关于已有知识的问题时，使用此工具。
     
     【重要提示】数据库表结构如下：
-    表名: knowledge_triplets
+    表名: knowledge_triplets (视图，底层为规范化存储)
     字段: 
       - id (INTEGER)
       - source_entity (TEXT) 实体A
@@ -54,11 +178,134 @@ def query_knowledge_graph_tool(sql_query: str) -> str:
       - target_entity (TEXT) 实体B
       - source_file (TEXT) 来源文件
     
+    对实体、关系、来源文件使用等值条件 (=) 会走索引，比 LIKE '%...%' 快得多。
+    
+    结果分页返回 (每页最多 {QUERY_MAX_ROWS} 行)，还有更多结果时会提示下一页的 offset。
+    
+    参数说明：
+      - offset: 跳过前多少行，翻页时使用上一页给出的值
+      - output_format: table (默认) / tsv (制表符分隔) / compact (tsv 且省略本页取值都相同的列)，
+        结果较多时用 tsv 或 compact 更省 token
+    
+    对大表做全表扫描的查询会附带警告和查询计划，笛卡尔积会被拒绝，执行过久的查询会被中断，
+    遇到这些提示时请加上等值条件或改写连接方式后重试。
+    
     注意：为了安全，你只能执行 SELECT 查询。
     """
-    return query_knowledge_graph(sql_query)
+    return await run_tool("query_knowledge_graph", query_knowledge_graph, sql_query, offset, output_format,
+                          key=db_key("query_knowledge_graph", normalize_sql(sql_query), offset, output_format),
+                          cacheable=_succeeded)
+
+# 5. 注册图遍历工具 (基于内存邻接索引，多跳问题一次调用即可完成)
+@mcp.tool()
+async def graph_neighbors_tool(entity: str, direction: str = "both", relation: str = "", limit: int = 50) -> str:
+    """
+    核心技能：查询一个实体的直接邻居 (一跳关系)。
+    
+    参数说明：
+      - entity: 实体名，需与图谱中的名字完全一致 (找不到时会返回相近的候选实体)
+      - direction: out (实体 -> 别人) / in (别人 -> 实体) / both (默认)
+      - relation: 只看某种关系，留空表示全部
+      - limit: 最多返回多少条
+    """
+    return await run_tool("graph_neighbors", graph_neighbors, entity, direction, relation, limit,
+                          key=db_key("graph_neighbors", entity, direction, relation, limit), cacheable=_succeeded)
+
+@mcp.tool()
+async def graph_k_hop_tool(entity: str, hops: int = 2, direction: str = "out", relation: str = "",
+                     max_fanout: int = 50, max_nodes: int = 500) -> str:
+    """
+    核心技能：从一个实体出发做 k 跳扩展，一次调用返回多跳范围内的全部关系。
+    回答 "A 相关的东西又和什么有关" 这类多跳问题时，优先使用此工具，而不是手写多层自连接 SQL。
+    
+    参数说明：
+      - hops: 扩展的跳数
+      - direction: out (默认) / in / both
+      - relation: 只沿某种关系扩展，留空表示全部
+      - max_fanout: 每个实体最多展开的边数
+      - max_nodes: 最多访问的实体数
+    """
+    return await run_tool("graph_k_hop", graph_k_hop, entity, hops, direction, relation, max_fanout, max_nodes,
+                          key=db_key("graph_k_hop", entity, hops, direction, relation, max_fanout, max_nodes),
+                          cacheable=_succeeded)
+
+@mcp.tool()
+async def graph_shortest_path_tool(source_entity: str, target_entity: str, direction: str = "both", max_hops: int = 6) -> str:
+    """
+    核心技能：查找两个实体之间的最短关系路径，用于回答 "A 和 B 有什么联系" 这类问题。
+    direction 为 out 时只沿箭头方向走，both (默认) 时忽略方向。
+    """
+    return await run_tool("graph_shortest_path", graph_shortest_path, source_entity, target_entity, direction, max_hops,
+                          key=db_key("graph_shortest_path", source_entity, target_entity, direction, max_hops),
+                          cacheable=_succeeded)
+
+# 6. 注册全文检索 / 语义检索工具
+@mcp.tool()
+async def search_tool(query: str, scope: str = "all", limit: int = SEARCH_DEFAULT_LIMIT) -> str:
+    """
+    核心技能：用关键词全文检索知识图谱三元组和笔记内容，按相关度 (BM25) 排序，支持中文。
+    不确定实体的准确名字时，优先用此工具代替 LIKE '%...%' 查询。
+    
+    参数说明：
+      - query: 关键词，多个词用空格分隔 (如 "MCP 解耦")
+      - scope: all (默认) / triplets (只搜三元组) / notes (只搜笔记正文)
+      - limit: 每类结果最多返回多少条
+    
+    每条结果都带有 source_file，可据此用 read_note_range_tool 阅读原文。
+    """
+    return await run_tool("search", search, query, scope, limit,
+                          key=db_key("search", query, scope, limit), cacheable=_succeeded)
+
+@mcp.tool()
+async def semantic_search_tool(query: str, scope: str = "all", limit: int = SEARCH_DEFAULT_LIMIT) -> str:
+    """
+    核心技能：按语义相似度检索实体名和笔记内容 (本地向量索引)，不要求拼写与图谱中完全一致。
+    不知道实体在图谱里的准确写法时 (如 "我学过的那个协议")，先用此工具找到实体名，
+    再用等值条件查询或图遍历工具，不要靠猜测拼写写 LIKE 查询。
+    
+    参数说明：
+      - query: 自然语言描述或近似的实体名
+      - scope: all (默认) / entities (只搜实体) / notes (只搜笔记正文)
+      - limit: 每类结果最多返回多少条
+    """
+    return await run_tool("semantic_search", semantic_search, query, scope, limit,
+                          key=db_key("semantic_search", query, scope, limit), cacheable=_succeeded)
+
+# 7. 注册缓存 / 工具执行统计资源
+@mcp.resource("deepcontext://cache/stats", mime_type="application/json")
+def cache_stats_resource() -> str:
+    """只读工具结果缓存的命中/未命中次数 (总计及按工具)、条目数、占用字节数和当前数据库版本"""
+    return json.dumps(get_result_cache().stats(), ensure_ascii=False)
+
+@mcp.resource("deepcontext://tools/stats", mime_type="application/json")
+def tool_stats_resource() -> str:
+    """各工具的调用次数、正在排队 / 执行的调用数和峰值并发，以及线程池大小"""
+    return json.dumps(get_tool_runner().stats(), ensure_ascii=False)
+
+def run(transport: str = MCP_TRANSPORT, host: str = MCP_HTTP_HOST, port: int = MCP_HTTP_PORT,
+        trace: str = TRACE_EXPORT, trace_file: str = TRACE_PATH):
+    """
+    启动 Server。
+    stdio：由 Agent 作为子进程启动，一次运行一个进程；
+    streamable-http：作为本机常驻服务运行，多个 Agent / 多次查询复用同一个进程、数据库连接和内存索引。
+    trace 不为 off 时把 Server 端的 span 追加写入 trace_file。
+    """
+    init_tracer(trace, trace_file, service="deepcontext-server")
+    if transport == "streamable-http":
+        mcp.settings.host = host
+        mcp.settings.port = port
+        logger.info(f"🌐 DeepContext Server 监听 http://{host}:{port}{mcp.settings.streamable_http_path}")
+    mcp.run(transport=transport)
+
 
 if __name__ == "__main__":
-    # 5. 启动 Server
+    # 8. 启动 Server
     # 默认使用 stdio（标准输入输出）进行进程间通信 (IPC)，这是最安全、最轻量的本地 Agent 通信方式
-    mcp.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="DeepContext MCP Server")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default=MCP_TRANSPORT)
+    parser.add_argument("--host", default=MCP_HTTP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_HTTP_PORT)
+    parser.add_argument("--trace", choices=EXPORT_FORMATS, default=TRACE_EXPORT)
+    parser.add_argument("--trace-file", default=TRACE_PATH)
+    args = parser.parse_args()
+    run(args.transport, args.host, args.port, args.trace, args.trace_file)
\ No newline at end of file
@@ -4,11 +4,26 @@ DeepContext 业务逻辑层
 """
 
 from .file_tools import list_my_notes, read_note_content
-from .graph_tools import add_knowledge_triplet, query_knowledge_graph
+from .graph_tools import add_knowledge_triplet, add_knowledge_triplets_batch, register_entity_alias, query_knowledge_graph
+from .graph_traversal import graph_neighbors, graph_k_hop, graph_shortest_path
+from .note_reader import read_note_outline, read_note_section, read_note_range
+from .note_indexer import list_changed_notes, mark_notes_ingested
+from .search_tools import search
 
 __all__ = [
     'list_my_notes',
     'read_note_content', 
+    'read_note_outline',
+    'read_note_section',
+    'read_note_range',
     'add_knowledge_triplet',
-    'query_knowledge_graph'
+    'add_knowledge_triplets_batch',
+    'register_entity_alias',
+    'query_knowledge_graph',
+    'graph_neighbors',
+    'graph_k_hop',
+    'graph_shortest_path',
+    'list_changed_notes',
+    'mark_notes_ingested',
+    'search'
 ]
\ No newline at end of file
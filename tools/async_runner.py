@@ -0,0 +1,138 @@
+"""
+DeepContext 工具异步执行模块
+Server 的工具实现都是阻塞的 (文件读取、SQLite 查询)，直接在事件循环里执行时，
+一个慢调用会卡住同一个 Server 上的所有客户端。这里把它们放进有界线程池执行：
+  - 每个工具有自己的并发上限，超出的调用在事件循环中排队，不占用线程
+  - 直接持有 SQLite 写连接的工具共用一把异步写锁，同一时刻最多一个写工具占用线程
+  - 缓存命中在事件循环中直接返回，不进入线程池
+每次调用记录一个 tool.run span (排队时间、是否命中缓存)，父 span 来自客户端在 MCP 请求 _meta 中传来的 traceparent。
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp.server.lowlevel.server import request_ctx
+
+from config import TOOL_THREAD_POOL_SIZE, TOOL_DEFAULT_CONCURRENCY, TOOL_CONCURRENCY_LIMITS
+from tools.result_cache import cached_call_async
+from tracing import current_span, span
+
+
+class ToolRunner:
+    """
+    工具执行器
+
+    pool_size 为 0 时直接在事件循环中同步执行 (旧行为，仅用于对比测试)。
+    信号量和写锁在第一次使用时创建，绑定到 Server 所在的事件循环。
+    """
+
+    def __init__(self, pool_size: int = TOOL_THREAD_POOL_SIZE, limits: dict = None,
+                 default_limit: int = TOOL_DEFAULT_CONCURRENCY):
+        self.pool_size = pool_size
+        self.limits = dict(TOOL_CONCURRENCY_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self._executor = (ThreadPoolExecutor(pool_size, thread_name_prefix="deepcontext-tool")
+                          if pool_size > 0 else None)
+        self._semaphores = {}
+        self._writer_lock = None
+        self._stats = {}  # 工具名 -> {"calls", "waiting", "running", "max_running"}
+        self._stats_lock = threading.Lock()
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            semaphore = self._semaphores[tool] = asyncio.Semaphore(max(1, self.limits.get(tool, self.default_limit)))
+        return semaphore
+
+    def _count(self, tool: str, field: str, delta: int):
+        with self._stats_lock:
+            stats = self._stats.setdefault(tool, {"calls": 0, "waiting": 0, "running": 0, "max_running": 0})
+            stats[field] += delta
+            if field == "running":
+                stats["max_running"] = max(stats["max_running"], stats["running"])
+
+    async def run(self, tool: str, fn, *args, write: bool = False):
+        """在线程池中执行 fn(*args)；write=True 表示 fn 会直接使用 SQLite 写连接，需要先拿到写锁"""
+        self._count(tool, "calls", 1)
+        if self._executor is None:
+            return fn(*args)
+        if write and self._writer_lock is None:
+            self._writer_lock = asyncio.Lock()
+
+        lock = self._writer_lock if write else nullcontext()
+        self._count(tool, "waiting", 1)
+        waiting = True
+        queued = time.perf_counter()
+        try:
+            async with self._semaphore(tool), lock:
+                self._count(tool, "waiting", -1)
+                waiting = False
+                current_span().set(queue_ms=round((time.perf_counter() - queued) * 1000, 3))
+                self._count(tool, "running", 1)
+                try:
+                    # 复制上下文，线程中产生的 span (如 sql.query) 挂在本次调用下
+                    context = contextvars.copy_context()
+                    return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, fn, *args)
+                finally:
+                    self._count(tool, "running", -1)
+        finally:
+            if waiting:
+                self._count(tool, "waiting", -1)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "pool_size": self.pool_size,
+                "tools": {name: dict(s) for name, s in self._stats.items()},
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+_runner = ToolRunner()
+
+
+def get_tool_runner() -> ToolRunner:
+    return _runner
+
+
+def init_tool_runner(pool_size: int = TOOL_THREAD_POOL_SIZE, limits: dict = None,
+                     default_limit: int = TOOL_DEFAULT_CONCURRENCY) -> ToolRunner:
+    """用新的线程池大小 / 并发上限重建共享执行器 (用于基准测试)；应在没有调用进行时切换"""
+    global _runner
+    old, _runner = _runner, ToolRunner(pool_size, limits, default_limit)
+    old.shutdown()
+    return _runner
+
+
+async def run_tool(tool: str, fn, *args, key=None, cacheable=None, write: bool = False) -> str:
+    """
+    Server 工具的统一入口：先查结果缓存 (key 为 None 时不缓存)，未命中再交给执行器。
+    tool 为去掉 _tool 后缀的工具名，与缓存统计和 TOOL_CONCURRENCY_LIMITS 中的名字一致。
+    """
+    executed = False
+
+    def execute():
+        nonlocal executed
+        executed = True
+        return _runner.run(tool, fn, *args, write=write)
+
+    with span("tool.run", _request_traceparent(), tool=tool) as run_span:
+        result = await cached_call_async(key, execute, cacheable)
+        run_span.set(cached=not executed, result_chars=len(result) if isinstance(result, str) else None)
+    return result
+
+
+def _request_traceparent():
+    """当前 MCP 请求的 _meta 中客户端传来的 traceparent (不在请求中或没有传时为 None)"""
+    try:
+        meta = request_ctx.get().meta
+    except LookupError:
+        return None
+    return getattr(meta, "traceparent", None) if meta is not None else None
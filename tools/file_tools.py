@@ -5,10 +5,18 @@ DeepContext 文件工具模块
 
 from pathlib import Path
 
+from config import NOTE_LIST_PAGE_SIZE, NOTE_LIST_MAX_PAGE_SIZE, NOTE_READ_MAX_BYTES
+from database.text_search import note_chunks_stale, replace_note_chunks
+from tools.note_reader import check_note_path, get_note_index, read_lines, iter_note_chunks
+from tools.note_scanner import scan_page
 
-def list_my_notes(directory_path: str) -> str:
+
+def list_my_notes(directory_path: str, max_depth: int = -1, pattern: str = "*.md",
+                  cursor: str = "", page_size: int = NOTE_LIST_PAGE_SIZE) -> str:
     """
-    核心技能：列出指定本地目录下的所有 Markdown 笔记文件。
+    核心技能：递归列出指定本地目录下的 Markdown 笔记文件 (分页返回)。
+    max_depth 限制递归深度 (0 表示只看当前目录，-1 不限)，pattern 为文件名通配符，
+    结果较多时用返回的 cursor 继续获取下一页。
     """
     try:
         path = Path(directory_path)
@@ -16,19 +24,22 @@ def list_my_notes(directory_path: str) -> str:
         # 基础的防御性编程：防止大模型幻觉瞎编路径，或者越权访问系统文件
         if not path.exists() or not path.is_dir():
             return f"执行失败：目录 '{directory_path}' 不存在或不是一个有效的文件夹。"
-            
-        # 筛选 .md 文件
-        md_files = [f.name for f in path.iterdir() if f.is_file() and f.suffix == '.md']
+        
+        # 单页大小限制，避免一次返回几万行撑爆上下文
+        page_size = max(1, min(page_size, NOTE_LIST_MAX_PAGE_SIZE))
+        md_files, next_cursor = scan_page(directory_path, page_size, cursor, max_depth, pattern)
         
         if not md_files:
+            if cursor:
+                return f"目录 '{directory_path}' 在游标 '{cursor}' 之后没有更多笔记了。"
             return f"在目录 '{directory_path}' 中没有找到任何 Markdown (.md) 笔记。"
             
-        # 返回格式化的字符串给大模型
-        result = f"成功读取目录 '{directory_path}'，包含以下笔记：\n"
-        for i, file in enumerate(md_files, 1):
-            result += f"{i}. {file}\n"
-            
-        return result
+        # 返回格式化的字符串给大模型 (相对于 directory_path 的路径)
+        lines = [f"成功读取目录 '{directory_path}'，本页包含以下笔记："]
+        lines.extend(f"{i}. {file}" for i, file in enumerate(md_files, 1))
+        if next_cursor:
+            lines.append(f"还有更多笔记，传入 cursor='{next_cursor}' 获取下一页。")
+        return "\n".join(lines) + "\n"
         
     except Exception as e:
         # 捕获异常并返回给模型，让模型知道调用出错了，而不是直接让服务端崩溃
@@ -37,23 +48,33 @@ def list_my_notes(directory_path: str) -> str:
 
 def read_note_content(filepath: str) -> str:
     """
-    核心技能：读取指定 Markdown 笔记文件的全部文本内容。
+    核心技能：读取指定 Markdown 笔记文件的全部文本内容 (大文件只返回开头部分)。
     当用户询问某个具体笔记里写了什么，或者需要提取知识时，调用此工具。
     """
     try:
-        path = Path(filepath)
+        # 1. 防御性编程：检查文件是否存在、是不是文件，并限制只能读取 .md 文件
+        path, error = check_note_path(filepath)
+        if error:
+            return error
         
-        # 1. 防御性编程：检查文件是否存在，以及是不是文件
-        if not path.exists():
-            return f"执行失败：找不到文件 '{filepath}'。请检查路径是否正确。"
-        if not path.is_file():
-            return f"执行失败：'{filepath}' 不是一个有效的文件（可能是一个目录）。"
-            
-        # 2. 防御性编程：限制只能读取 .md 文件，防止大模型越权读取系统密码文件 (如 /etc/passwd)
-        if path.suffix.lower() != '.md':
-            return f"安全拦截：为了系统安全，当前仅允许读取 Markdown (.md) 文件。"
+        # 2. 顺带为全文检索建立分块索引 (笔记未变化时只需一次主键查询)；索引失败不影响读取
+        try:
+            index_note_chunks(path)
+        except Exception:
+            pass
+        
+        # 3. 大文件只返回开头一段，其余部分通过大纲 + 分段读取按需获取，避免撑爆上下文
+        size = path.stat().st_size
+        if size > NOTE_READ_MAX_BYTES:
+            index = get_note_index(path)
+            text, last, _, cut_at = read_lines(path, index, 1, index.line_count)
+            return (
+                f"文件 '{filepath}' 较大 ({size / 1024:.1f} KB，共 {index.line_count} 行)，"
+                f"以下仅为第 1-{last} 行{'的开头部分' if cut_at is not None else ''}：\n\n{text}\n\n"
+                f"(其余内容请先调用 read_note_outline 查看大纲，再用 read_note_section 或 read_note_range 按需读取)"
+            )
 
-        # 3. 读取并返回内容 (指定 utf-8 编码防止中文乱码)
+        # 4. 读取并返回内容 (指定 utf-8 编码防止中文乱码)
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
             
@@ -62,4 +83,16 @@ def read_note_content(filepath: str) -> str:
     except UnicodeDecodeError:
         return f"执行失败：文件 '{filepath}' 不是标准的 UTF-8 文本编码，无法读取。"
     except Exception as e:
-        return f"读取文件时发生底层系统错误：{str(e)}"
\ No newline at end of file
+        return f"读取文件时发生底层系统错误：{str(e)}"
+
+
+def index_note_chunks(path) -> int:
+    """
+    为笔记建立全文检索分块 (source_file 为绝对路径)，笔记自上次建索引后未变化时直接跳过。
+    返回写入的分块数，跳过时返回 0。
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    if not note_chunks_stale(str(path), st.st_mtime_ns, st.st_size):
+        return 0
+    return replace_note_chunks(str(path), st.st_mtime_ns, st.st_size, iter_note_chunks(path))
\ No newline at end of file
@@ -1,9 +1,15 @@
 """
 DeepContext 知识图谱工具模块
-包含 add_knowledge_triplet 和 query_knowledge_graph 功能
+包含 add_knowledge_triplet、register_entity_alias 和 query_knowledge_graph 功能
 """
 
-from database.sqlite_db import add_knowledge_triplet as db_add_triplet, query_knowledge_graph as db_query
+from database.sqlite_db import (
+    add_knowledge_triplet as db_add_triplet,
+    add_knowledge_triplets_batch as db_add_triplets_batch,
+    query_knowledge_graph as db_query,
+)
+from database.entity_resolution import register_alias
+from tools.note_indexer import purge_rewritten_note
 
 
 def add_knowledge_triplet(source_entity: str, relation: str, target_entity: str, source_file: str) -> str:
@@ -11,16 +17,47 @@ def add_knowledge_triplet(source_entity: str, relation: str, target_entity: str,
     核心技能：将提取到的知识三元组保存到本地知识图谱数据库中。
     当你阅读完笔记，提取出核心概念和它们之间的关系时，调用此工具进行存储。
     """
+    purge_rewritten_note(source_file)
     return db_add_triplet(source_entity, relation, target_entity, source_file)
 
 
-def query_knowledge_graph(sql_query: str) -> str:
+def add_knowledge_triplets_batch(triplets: list, source_file: str = "") -> str:
+    """
+    核心技能：一次性批量保存多条知识三元组，比逐条调用 add_knowledge_triplet 快得多。
+    读完一篇笔记后，把提取出的全部三元组放进一个列表调用此工具。
+    """
+    items = triplets if isinstance(triplets, list) else []
+    files = {item.get("source_file") or source_file for item in items if isinstance(item, dict)}
+    for path in files:
+        if path:
+            purge_rewritten_note(path)
+    return db_add_triplets_batch(triplets, source_file)
+
+
+def register_entity_alias(alias: str, entity: str) -> str:
+    """
+    登记同义写法：之后写入 alias 时归并到 entity；alias 已是独立实体时，它的三元组合并到 entity。
+    用于缩写与全称这类自动消歧无法识别的同义词。
+    """
+    try:
+        result = register_alias(alias, entity)
+    except ValueError as e:
+        return f"执行失败：{e}。"
+    except Exception as e:
+        return f"❌ 登记别名失败，底层错误：{str(e)}"
+    if result["merged"] is None:
+        return f"已登记别名 [{result['alias']}] -> [{result['entity']}]。"
+    return (f"已登记别名 [{result['alias']}] -> [{result['entity']}]，并把实体 [{result['merged']}] 合并进来 "
+            f"(涉及 {result['triplets']} 条三元组)。")
+
+
+def query_knowledge_graph(sql_query: str, offset: int = 0, output_format: str = "table") -> str:
     """
     核心技能：执行 SQL 查询语句，从知识图谱数据库中检索信息。
     当你需要回答用户关于已有知识的问题时，使用此工具。
     
     【重要提示】数据库表结构如下：
-    表名: knowledge_triplets
+    表名: knowledge_triplets (视图，底层为规范化存储)
     字段: 
       - id (INTEGER)
       - source_entity (TEXT) 实体A
@@ -28,6 +65,11 @@ def query_knowledge_graph(sql_query: str) -> str:
       - target_entity (TEXT) 实体B
       - source_file (TEXT) 来源文件
     
+    对实体、关系、来源文件使用等值条件 (=) 会走索引，比 LIKE '%...%' 快得多。
+    
+    结果分页返回，还有更多结果时会给出下一页的 offset；
+    output_format 可选 table (默认) / tsv / compact (省略本页取值都相同的列)。
+    
     注意：为了安全，你只能执行 SELECT 查询。
     """
-    return db_query(sql_query)
\ No newline at end of file
+    return db_query(sql_query, offset, output_format)
\ No newline at end of file
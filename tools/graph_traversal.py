@@ -0,0 +1,363 @@
+"""
+DeepContext 知识图谱遍历模块
+基于内存邻接索引实现邻居查询、k 跳扩展和最短路径，
+一次工具调用即可完成多跳推理，不再需要大模型手写多层自连接 SQL
+"""
+
+import threading
+from collections import defaultdict
+
+from database.connection import get_manager, get_write_generation
+
+DIRECTIONS = ("out", "in", "both")
+
+# 邻接表中每条边压缩成一个整数：高 32 位是关系 id，低 32 位是邻居实体 id
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+class GraphIndex:
+    """
+    内存邻接索引
+
+    首次使用时从 SQLite 全量加载，之后每次查询前按 triplets.id 水位增量追加新边
+    (triplets 使用 AUTOINCREMENT，id 单调递增)，因此写入后立即可见。
+    数据库版本 (本进程写入代数 + PRAGMA data_version) 没变时不查库；变了但三元组或实体的行数
+    与 "只追加" 对不上 (其他进程删除、清理、合并实体或导入快照) 时全量重建。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._db_path = None
+        self._reset()
+
+    def _reset(self):
+        self.entity_ids = {}        # 实体名 -> id
+        self.entity_names = {}      # id -> 实体名
+        self.relation_ids = {}      # 关系名 -> id
+        self.relation_names = {}    # id -> 关系名
+        self._out = defaultdict(list)
+        self._in = defaultdict(list)
+        self._edge_keys = set()     # 去重：同一事实来自多篇笔记时只算一条边
+        self._last_triplet_id = 0
+        self._last_entity_id = 0
+        self._last_relation_id = 0
+        self._triplet_count = 0
+        self._entity_count = 0
+        self._version = None        # 上次同步时的数据库版本
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edge_keys)
+
+    def invalidate(self):
+        """丢弃内存索引，下次查询时全量重建"""
+        with self._lock:
+            self._reset()
+
+    def refresh(self):
+        """把数据库中新增的实体、关系和三元组追加到内存索引；有追加以外的变化时全量重建"""
+        manager = get_manager()
+        with self._lock:
+            if manager.db_path != self._db_path:
+                self._reset()
+                self._db_path = manager.db_path
+            version = (get_write_generation(), manager.data_version())
+            if version == self._version:
+                return
+            if not self._sync(manager):
+                self._reset()
+                self._sync(manager)
+            self._version = version
+
+    def _sync(self, manager) -> bool:
+        """在一个读事务里读出水位之后的新行；行数说明有行被删除或替换时返回 False (不改动索引)"""
+        with manager.reader() as conn:
+            conn.execute("BEGIN")
+            try:
+                triplet_count = conn.execute("SELECT COUNT(*) FROM triplets").fetchone()[0]
+                entity_count = conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+                # entities 没有 AUTOINCREMENT，最大的 id 被合并删掉后可能分给新实体，名字对不上也要重建
+                last_entity = conn.execute(
+                    "SELECT name FROM entities WHERE id = ?", (self._last_entity_id,)
+                ).fetchone()
+                rows = conn.execute(
+                    "SELECT id, source_id, relation_id, target_id FROM triplets WHERE id > ? ORDER BY id",
+                    (self._last_triplet_id,),
+                ).fetchall()
+                entities = conn.execute(
+                    "SELECT id, name FROM entities WHERE id > ?", (self._last_entity_id,)
+                ).fetchall()
+                relations = conn.execute(
+                    "SELECT id, name FROM relations WHERE id > ?", (self._last_relation_id,)
+                ).fetchall()
+            finally:
+                conn.rollback()
+        if (triplet_count != self._triplet_count + len(rows)
+                or entity_count != self._entity_count + len(entities)
+                or (self._last_entity_id and (last_entity is None
+                                              or last_entity[0] != self.entity_names.get(self._last_entity_id)))):
+            return False
+        for entity_id, name in entities:
+            self.entity_ids[name] = entity_id
+            self.entity_names[entity_id] = name
+            self._last_entity_id = max(self._last_entity_id, entity_id)
+        for relation_id, name in relations:
+            self.relation_ids[name] = relation_id
+            self.relation_names[relation_id] = name
+            self._last_relation_id = max(self._last_relation_id, relation_id)
+        for triplet_id, source_id, relation_id, target_id in rows:
+            self._add_edge(source_id, relation_id, target_id)
+        if rows:
+            self._last_triplet_id = rows[-1][0]
+        self._triplet_count = triplet_count
+        self._entity_count = entity_count
+        return True
+
+    def _add_edge(self, source_id: int, relation_id: int, target_id: int):
+        key = (source_id << (2 * _ID_BITS)) | (relation_id << _ID_BITS) | target_id
+        if key in self._edge_keys:
+            return
+        self._edge_keys.add(key)
+        self._out[source_id].append((relation_id << _ID_BITS) | target_id)
+        self._in[target_id].append((relation_id << _ID_BITS) | source_id)
+
+    def edges(self, entity_id: int, direction: str = "both", relation_id=None):
+        """
+        遍历一个实体的边，产出 (关系 id, 邻居 id, 边方向)。
+        边方向为 "out" 表示 实体 -> 邻居，"in" 表示 邻居 -> 实体。
+        """
+        if direction in ("out", "both"):
+            for packed in self._out.get(entity_id, ()):
+                rel = packed >> _ID_BITS
+                if relation_id is None or rel == relation_id:
+                    yield rel, packed & _ID_MASK, "out"
+        if direction in ("in", "both"):
+            for packed in self._in.get(entity_id, ()):
+                rel = packed >> _ID_BITS
+                if relation_id is None or rel == relation_id:
+                    yield rel, packed & _ID_MASK, "in"
+
+    def k_hop(self, start_id: int, hops: int, direction: str = "out", relation_id=None,
+              max_fanout: int = 50, max_nodes: int = 500):
+        """
+        广度优先扩展 k 跳，返回 (边列表, 是否因上限被截断)。
+        边列表元素为 (跳数, 起点 id, 关系 id, 终点 id)，起点/终点按真实边方向给出。
+        """
+        visited = {start_id}
+        frontier = [start_id]
+        result = []
+        reported = set()
+        truncated = False
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                fanout = 0
+                for rel, neighbor, edge_dir in self.edges(node, direction, relation_id):
+                    if fanout >= max_fanout:
+                        truncated = True
+                        break
+                    fanout += 1
+                    edge = (node, rel, neighbor) if edge_dir == "out" else (neighbor, rel, node)
+                    if edge not in reported:
+                        reported.add(edge)
+                        result.append((hop, *edge))
+                    if neighbor not in visited:
+                        if len(visited) >= max_nodes:
+                            truncated = True
+                            continue
+                        visited.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+            if not frontier:
+                break
+        return result, truncated
+
+    def shortest_path(self, source_id: int, target_id: int, direction: str = "out", max_hops: int = 6):
+        """
+        双向广度优先搜索最短路径，返回按路径顺序排列的 (起点 id, 关系 id, 终点 id) 列表；
+        不可达时返回 None。
+        """
+        if source_id == target_id:
+            return []
+        backward = {"out": "in", "in": "out", "both": "both"}[direction]
+        fwd_parent = {source_id: None}
+        bwd_parent = {target_id: None}
+        fwd_frontier = [source_id]
+        bwd_frontier = [target_id]
+        for _ in range(max_hops):
+            if not fwd_frontier or not bwd_frontier:
+                return None
+            # 每次扩展较小的一侧，搜索量约为单向 BFS 的平方根
+            if len(fwd_frontier) <= len(bwd_frontier):
+                fwd_frontier, meet = self._expand(fwd_frontier, fwd_parent, bwd_parent, direction)
+            else:
+                bwd_frontier, meet = self._expand(bwd_frontier, bwd_parent, fwd_parent, backward)
+            if meet is not None:
+                return self._trace(meet, fwd_parent)[::-1] + self._trace(meet, bwd_parent)
+        return None
+
+    def _expand(self, frontier, parent, other_parent, direction):
+        next_frontier = []
+        for node in frontier:
+            for rel, neighbor, edge_dir in self.edges(node, direction):
+                if neighbor in parent:
+                    continue
+                parent[neighbor] = (node, rel, edge_dir)
+                if neighbor in other_parent:
+                    return next_frontier, neighbor
+                next_frontier.append(neighbor)
+        return next_frontier, None
+
+    @staticmethod
+    def _trace(node, parent):
+        """从相遇点沿 parent 回溯，产出真实方向的边"""
+        path = []
+        while parent[node] is not None:
+            prev, rel, edge_dir = parent[node]
+            path.append((prev, rel, node) if edge_dir == "out" else (node, rel, prev))
+            node = prev
+        return path
+
+
+_index = GraphIndex()
+
+
+def get_graph_index() -> GraphIndex:
+    """获取已同步到最新数据的共享图索引"""
+    _index.refresh()
+    return _index
+
+
+def invalidate_graph_index():
+    """三元组被删除后调用，让共享图索引在下次查询时全量重建"""
+    _index.invalidate()
+
+
+def _format_edge(index: GraphIndex, source_id: int, relation_id: int, target_id: int) -> str:
+    return f"({index.entity_names[source_id]}) -[{index.relation_names[relation_id]}]-> ({index.entity_names[target_id]})"
+
+
+def _resolve_entity(index: GraphIndex, entity: str):
+    """实体名 -> id；找不到时返回 (None, 带候选实体的提示)"""
+    entity_id = index.entity_ids.get(entity.strip())
+    if entity_id is not None:
+        return entity_id, None
+    needle = entity.strip().lower()
+    candidates = [name for name in index.entity_ids if needle and needle in name.lower()][:10]
+    hint = f"执行失败：知识图谱中不存在实体 '{entity}'。"
+    if candidates:
+        hint += "你是不是想找：" + "、".join(candidates)
+    return None, hint
+
+
+def _resolve_relation(index: GraphIndex, relation: str):
+    """关系名 -> id；空字符串表示不过滤"""
+    if not relation:
+        return None, None
+    relation_id = index.relation_ids.get(relation.strip())
+    if relation_id is None:
+        return None, f"执行失败：知识图谱中不存在关系 '{relation}'。"
+    return relation_id, None
+
+
+def _check_direction(direction: str):
+    if direction not in DIRECTIONS:
+        return f"执行失败：direction 只能是 {' / '.join(DIRECTIONS)}。"
+    return None
+
+
+def graph_neighbors(entity: str, direction: str = "both", relation: str = "", limit: int = 50) -> str:
+    """
+    核心技能：查询一个实体的直接邻居 (一跳关系)。
+    direction: out (实体指向别人) / in (别人指向实体) / both
+    relation: 只看某种关系，留空表示全部
+    """
+    try:
+        error = _check_direction(direction)
+        if error:
+            return error
+        index = get_graph_index()
+        entity_id, error = _resolve_entity(index, entity)
+        if error:
+            return error
+        relation_id, error = _resolve_relation(index, relation)
+        if error:
+            return error
+
+        lines = []
+        total = 0
+        for rel, neighbor, edge_dir in index.edges(entity_id, direction, relation_id):
+            total += 1
+            if len(lines) < limit:
+                edge = (entity_id, rel, neighbor) if edge_dir == "out" else (neighbor, rel, entity_id)
+                lines.append(_format_edge(index, *edge))
+        if not total:
+            return f"实体 '{entity}' 在方向 {direction} 上没有符合条件的邻居。"
+        header = f"实体 '{entity}' 共有 {total} 条相邻关系"
+        if total > limit:
+            header += f"，仅显示前 {limit} 条"
+        return header + "：\n" + "\n".join(lines)
+    except Exception as e:
+        return f"图遍历时发生底层错误：{str(e)}"
+
+
+def graph_k_hop(entity: str, hops: int = 2, direction: str = "out", relation: str = "",
+                max_fanout: int = 50, max_nodes: int = 500) -> str:
+    """
+    核心技能：从一个实体出发做 k 跳扩展，一次调用返回多跳范围内的所有关系。
+    max_fanout 限制每个节点展开的边数，max_nodes 限制访问的实体总数。
+    """
+    try:
+        error = _check_direction(direction)
+        if error:
+            return error
+        if hops < 1:
+            return "执行失败：hops 至少为 1。"
+        index = get_graph_index()
+        entity_id, error = _resolve_entity(index, entity)
+        if error:
+            return error
+        relation_id, error = _resolve_relation(index, relation)
+        if error:
+            return error
+
+        edges, truncated = index.k_hop(entity_id, hops, direction, relation_id, max_fanout, max_nodes)
+        if not edges:
+            return f"实体 '{entity}' 在 {hops} 跳内没有找到任何关系。"
+        lines = [f"从 '{entity}' 出发 {hops} 跳内共找到 {len(edges)} 条关系："]
+        lines.extend(f"[{hop}跳] {_format_edge(index, s, r, t)}" for hop, s, r, t in edges)
+        if truncated:
+            lines.append(f"(结果已按 max_fanout={max_fanout} / max_nodes={max_nodes} 截断)")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"图遍历时发生底层错误：{str(e)}"
+
+
+def graph_shortest_path(source_entity: str, target_entity: str, direction: str = "both", max_hops: int = 6) -> str:
+    """
+    核心技能：查找两个实体之间的最短关系路径。
+    direction 为 out 时只沿箭头方向走，both 时忽略方向。
+    """
+    try:
+        error = _check_direction(direction)
+        if error:
+            return error
+        index = get_graph_index()
+        source_id, error = _resolve_entity(index, source_entity)
+        if error:
+            return error
+        target_id, error = _resolve_entity(index, target_entity)
+        if error:
+            return error
+
+        path = index.shortest_path(source_id, target_id, direction, max_hops)
+        if path is None:
+            return f"在 {max_hops} 跳内没有找到从 '{source_entity}' 到 '{target_entity}' 的路径。"
+        if not path:
+            return f"'{source_entity}' 与 '{target_entity}' 是同一个实体。"
+        lines = [f"找到长度为 {len(path)} 的最短路径："]
+        lines.extend(_format_edge(index, *edge) for edge in path)
+        return "\n".join(lines)
+    except Exception as e:
+        return f"图遍历时发生底层错误：{str(e)}"
@@ -0,0 +1,178 @@
+"""
+DeepContext 增量笔记索引模块
+对比笔记清单找出新增 / 修改 / 删除的笔记，只让大模型处理真正变化的部分
+"""
+
+import hashlib
+import os
+import threading
+
+from config import NOTE_LIST_PAGE_SIZE
+from database.note_manifest import (
+    load_manifest,
+    load_manifest_entry,
+    mark_purged,
+    upsert_manifest,
+    touch_manifest,
+    delete_manifest,
+    purge_triplets_by_source,
+    clear_checkpoints,
+)
+from database.text_search import delete_note_chunks
+from tools.file_tools import index_note_chunks
+from tools.graph_traversal import invalidate_graph_index
+from tools.note_scanner import iter_markdown_files
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_purge_lock = threading.Lock()
+
+
+def hash_file(path: str) -> str:
+    """分块计算文件内容哈希，避免把大文件整个读进内存"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_markdown_stats(directory: str):
+    """递归遍历目录下的 .md 文件，产出 (绝对路径, mtime_ns, size)"""
+    for _, entry in iter_markdown_files(directory):
+        st = entry.stat()
+        yield entry.path, st.st_mtime_ns, st.st_size
+
+
+def scan_note_changes(directory: str) -> dict:
+    """
+    对比磁盘与笔记清单，返回 {"new": [...], "changed": [...], "deleted": [...], "unchanged": 数量}。
+    只用 stat 判断是否变化；mtime 或 size 变了才重新计算哈希，哈希一致则视为未变化。
+    """
+    directory = os.path.abspath(directory)
+    manifest = load_manifest(directory)
+    new, changed, touched = [], [], []
+    unchanged = 0
+    seen = set()
+
+    for path, mtime_ns, size in _iter_markdown_stats(directory):
+        seen.add(path)
+        record = manifest.get(path)
+        if record is None:
+            new.append(path)
+            continue
+        old_mtime, old_size, old_hash = record
+        if old_mtime == mtime_ns and old_size == size:
+            unchanged += 1
+        elif old_size == size and hash_file(path) == old_hash:
+            # 只是被 touch 过，内容没变：刷新 stat，下次直接命中快路径
+            touched.append((path, mtime_ns, size))
+            unchanged += 1
+        else:
+            changed.append(path)
+
+    deleted = [path for path in manifest if path not in seen and not os.path.exists(path)]
+    touch_manifest(touched)
+    return {"new": sorted(new), "changed": sorted(changed), "deleted": sorted(deleted), "unchanged": unchanged}
+
+
+def forget_notes(paths) -> int:
+    """
+    清理一批笔记的三元组、检索分块和入库检查点 (已删除或需要重新提取)，返回删除的三元组数。
+    检查点必须和三元组一起清理，否则离线入库续跑时会跳过三元组已被删掉的分块。
+    """
+    paths = list(paths)
+    purged = purge_triplets_by_source(paths)
+    delete_note_chunks(paths)
+    clear_checkpoints(paths)
+    if purged:
+        invalidate_graph_index()
+    return purged
+
+
+def purge_rewritten_note(source_file: str) -> int:
+    """
+    在写入一篇笔记的三元组之前调用：笔记在入库后被改写过时，清理旧版本留下的三元组、检索分块和检查点，
+    返回删除的三元组数。按内容哈希只清理一次 (记入 note_manifest.purged_hash)，
+    重新提取过程中的后续写入不会删掉刚写入的三元组；未入库过或内容未变的笔记不做任何事。
+    """
+    path = os.path.abspath(source_file)
+    # 并发的单条写入可能同时走到这里，检查和清理放在同一把锁里，只有第一个调用会清理
+    with _purge_lock:
+        record = load_manifest_entry(path)
+        if record is None:
+            return 0
+        mtime_ns, size, content_hash, purged_hash = record
+        try:
+            st = os.stat(path)
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size):
+                return 0
+            current = hash_file(path)
+        except OSError:
+            return 0
+        if current in (content_hash, purged_hash):
+            return 0
+        purged = forget_notes([path])
+        mark_purged(path, current)
+        return purged
+
+
+def list_changed_notes(directory_path: str) -> str:
+    """
+    核心技能：递归列出目录下自上次入库以来新增或修改过的笔记，未变化的笔记不会出现在结果中。
+    只清理已删除笔记的三元组和检索分块；修改过的笔记的旧三元组在第一次写入新三元组时清理
+    (见 purge_rewritten_note)，重复扫描不会删掉已经写入的数据。
+    """
+    try:
+        if not os.path.isdir(directory_path):
+            return f"执行失败：目录 '{directory_path}' 不存在或不是一个有效的文件夹。"
+
+        changes = scan_note_changes(directory_path)
+        purged = forget_notes(changes["deleted"])
+        delete_manifest(changes["deleted"])
+
+        summary = (
+            f"扫描目录 '{directory_path}'：新增 {len(changes['new'])} 篇，修改 {len(changes['changed'])} 篇，"
+            f"删除 {len(changes['deleted'])} 篇，未变化 {changes['unchanged']} 篇；已清理已删除笔记的三元组 {purged} 条。"
+        )
+        pending = [("新增", p) for p in changes["new"]] + [("修改", p) for p in changes["changed"]]
+        if not pending:
+            return summary + "\n没有需要处理的笔记。"
+
+        lines = [summary, "需要处理的笔记 (写入三元组时请用下面的完整路径作为 source_file)："]
+        lines.extend(f"{i}. [{kind}] {path}" for i, (kind, path) in enumerate(pending[:NOTE_LIST_PAGE_SIZE], 1))
+        if len(pending) > NOTE_LIST_PAGE_SIZE:
+            lines.append(f"(仅显示前 {NOTE_LIST_PAGE_SIZE} 篇，处理并记录后再次扫描即可看到其余笔记)")
+        if changes["changed"]:
+            lines.append("修改过的笔记的旧三元组会在第一次写入它的新三元组时自动清理。")
+        lines.append("处理完成后调用 mark_notes_ingested 记录，下次扫描就会跳过它们。")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"扫描笔记变化时发生底层系统错误：{str(e)}"
+
+
+def mark_notes_ingested(filepaths: list) -> str:
+    """
+    核心技能：记录笔记已完成入库 (保存其 mtime、大小和内容哈希)，之后未修改的笔记不会再被列出。
+    """
+    recorded = []
+    errors = []
+    for filepath in filepaths:
+        path = os.path.abspath(filepath)
+        if not path.endswith('.md') or not os.path.isfile(path):
+            errors.append(f"- '{filepath}' 不是存在的 Markdown (.md) 文件")
+            continue
+        try:
+            st = os.stat(path)
+            recorded.append((path, st.st_mtime_ns, st.st_size, hash_file(path)))
+            index_note_chunks(path)
+        except OSError as e:
+            errors.append(f"- '{filepath}' 读取失败：{str(e)}")
+
+    try:
+        upsert_manifest(recorded)
+    except Exception as e:
+        return f"❌ 写入笔记清单失败，底层错误：{str(e)}"
+
+    output = [f"已记录 {len(recorded)} 篇笔记的入库状态，失败 {len(errors)} 篇。"]
+    output.extend(errors)
+    return "\n".join(output)
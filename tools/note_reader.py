@@ -0,0 +1,296 @@
+"""
+DeepContext 分段笔记读取模块
+解析一次 Markdown 标题结构并缓存行/章节偏移，按大纲、章节或行/字节范围读取，
+大文件通过内存映射按需读取，单次返回的内容始终受 NOTE_READ_MAX_BYTES 限制
+"""
+
+import mmap
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import NOTE_READ_MAX_BYTES, NOTE_MMAP_THRESHOLD, NOTE_OUTLINE_CACHE_SIZE, NOTE_CHUNK_BYTES
+
+
+def check_note_path(filepath: str):
+    """校验笔记路径，返回 (Path, 错误信息)；只允许读取存在的 .md 文件"""
+    path = Path(filepath)
+    if not path.exists():
+        return None, f"执行失败：找不到文件 '{filepath}'。请检查路径是否正确。"
+    if not path.is_file():
+        return None, f"执行失败：'{filepath}' 不是一个有效的文件（可能是一个目录）。"
+    # 限制只能读取 .md 文件，防止大模型越权读取系统密码文件 (如 /etc/passwd)
+    if path.suffix.lower() != '.md':
+        return None, "安全拦截：为了系统安全，当前仅允许读取 Markdown (.md) 文件。"
+    return path, None
+
+
+@contextmanager
+def open_note_buffer(path: Path, size: int):
+    """小文件直接读入内存，大文件使用只读内存映射，按切片访问时只触及需要的页"""
+    if size < NOTE_MMAP_THRESHOLD or size == 0:
+        with open(path, 'rb') as f:
+            yield f.read()
+        return
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+class NoteIndex:
+    """一篇笔记的行偏移表和标题列表"""
+
+    __slots__ = ("size", "line_offsets", "headings")
+
+    def __init__(self, size: int, line_offsets: array, headings: list):
+        self.size = size
+        self.line_offsets = line_offsets  # 第 i 行 (从 0 计) 的起始字节
+        self.headings = headings          # [(级别, 标题, 起始行号 (从 1 计))]
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_offsets)
+
+    def section_lines(self, i: int):
+        """第 i 个标题 (从 0 计) 所辖章节的行范围 [起始行, 结束行]，包含所有子标题"""
+        level, _, start = self.headings[i]
+        for next_level, _, next_start in self.headings[i + 1:]:
+            if next_level <= level:
+                return start, next_start - 1
+        return start, self.line_count
+
+    def line_to_byte(self, line: int) -> int:
+        """行号 (从 1 计) -> 起始字节；超出末尾时返回文件大小"""
+        if line > self.line_count:
+            return self.size
+        return self.line_offsets[line - 1]
+
+
+def _build_index(buf, size: int) -> NoteIndex:
+    """单遍扫描：记录每行起始偏移，识别 ATX 标题 (# ~ ######)，跳过围栏代码块内的 #"""
+    offsets = array('Q')
+    headings = []
+    in_fence = False
+    pos = 0
+    line_no = 0
+    while pos < size:
+        offsets.append(pos)
+        line_no += 1
+        end = buf.find(b'\n', pos)
+        if end == -1:
+            end = size
+        first = buf[pos:pos + 1]
+        if first in (b'`', b'~'):
+            if buf[pos:pos + 3] in (b'```', b'~~~'):
+                in_fence = not in_fence
+        elif first == b'#' and not in_fence:
+            line = bytes(buf[pos:end]).rstrip(b'\r')
+            level = len(line) - len(line.lstrip(b'#'))
+            if level <= 6 and (len(line) == level or line[level:level + 1] in (b' ', b'\t')):
+                title = line[level:].strip().rstrip(b'#').strip().decode('utf-8', errors='replace')
+                headings.append((level, title, line_no))
+        pos = end + 1
+    return NoteIndex(size, offsets, headings)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_note_index(path: Path):
+    """获取笔记的结构索引，按 (路径, mtime, size) 缓存，文件修改后自动重新解析"""
+    st = path.stat()
+    key = str(path.resolve())
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+            _cache.move_to_end(key)
+            return cached[1]
+    with open_note_buffer(path, st.st_size) as buf:
+        index = _build_index(buf, st.st_size)
+    with _cache_lock:
+        _cache[key] = ((st.st_mtime_ns, st.st_size), index)
+        _cache.move_to_end(key)
+        while len(_cache) > NOTE_OUTLINE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def _align_utf8(buf, pos: int, size: int) -> int:
+    """把字节位置向后挪到 UTF-8 字符边界，避免切断多字节的中文字符"""
+    while pos < size and (buf[pos] & 0xC0) == 0x80:
+        pos += 1
+    return pos
+
+
+def read_lines(path: Path, index: NoteIndex, start_line: int, end_line: int):
+    """
+    读取 [start_line, end_line] 行 (从 1 计，含两端)，超过字节预算时在行边界截断。
+    返回 (文本, 实际结束行, 下一次应从哪一行继续；读完为 None,
+    单独一行就超过预算而被切断时该行剩余部分的起始字节；否则为 None)。
+    """
+    start_line = max(1, start_line)
+    end_line = min(end_line, index.line_count)
+    if start_line > end_line:
+        return "", start_line - 1, None, None
+    start = index.line_to_byte(start_line)
+    end = index.line_to_byte(end_line + 1)
+    next_line = None
+    cut = False
+    if end - start > NOTE_READ_MAX_BYTES:
+        # 在预算内能完整容纳的最后一行；一行就超预算时至少返回这一行的前半部分
+        last = bisect_right(index.line_offsets, start + NOTE_READ_MAX_BYTES) - 1
+        if last + 1 > start_line:
+            end_line = last
+            end = index.line_offsets[last]
+            next_line = last + 1
+        else:
+            end = start + NOTE_READ_MAX_BYTES
+            next_line = start_line + 1 if start_line < end_line else None
+            end_line = start_line
+            cut = True
+    with open_note_buffer(path, index.size) as buf:
+        if (next_line is not None or cut) and end < index.size:
+            end = _align_utf8(buf, end, index.size)
+        text = bytes(buf[start:end]).decode('utf-8')
+    return text, end_line, next_line, end if cut else None
+
+
+def iter_note_chunks(path: Path, index: NoteIndex = None, chunk_bytes: int = NOTE_CHUNK_BYTES):
+    """
+    把笔记切成适合检索的分块，产出 (所在章节标题, 起始行, 结束行, 正文)。
+    每个标题开启一个新分块，章节过长时再在行边界处按 chunk_bytes 切分。
+    """
+    index = index or get_note_index(path)
+    if not index.line_count:
+        return
+    # 每个标题行都是一个切分点；第一个标题之前的内容归入空标题
+    boundaries = [(1, "")] + [(line, title) for _, title, line in index.headings if line > 1]
+    with open_note_buffer(path, index.size) as buf:
+        for n, (start_line, heading) in enumerate(boundaries):
+            end_line = boundaries[n + 1][0] - 1 if n + 1 < len(boundaries) else index.line_count
+            chunk_start = start_line
+            for line in range(start_line, end_line + 1):
+                size = index.line_to_byte(line + 1) - index.line_to_byte(chunk_start)
+                if size >= chunk_bytes or line == end_line:
+                    text = bytes(buf[index.line_to_byte(chunk_start):index.line_to_byte(line + 1)])
+                    text = text.decode('utf-8', errors='replace').strip()
+                    if text:
+                        yield heading, chunk_start, line, text
+                    chunk_start = line + 1
+
+
+def _continue_hint(next_line, cut_at=None, line=None):
+    if cut_at is not None:
+        hint = (f"\n\n(第 {line} 行过长，只返回了开头部分；调用 read_note_range 并设置 unit=\"byte\", start={cut_at} "
+                f"读取该行其余内容")
+        return hint + (f"，或设置 start={next_line} 从下一行继续读取)" if next_line is not None else ")")
+    if next_line is None:
+        return ""
+    return f"\n\n(内容过长已截断，调用 read_note_range 并设置 start={next_line} 继续读取)"
+
+
+def read_note_outline(filepath: str, max_level: int = 6) -> str:
+    """
+    核心技能：返回笔记的标题大纲 (每节的编号、行范围和大小)，不返回正文。
+    面对较大的笔记时先看大纲，再按章节读取需要的部分。max_level 可只显示较高层级的标题。
+    """
+    try:
+        path, error = check_note_path(filepath)
+        if error:
+            return error
+        index = get_note_index(path)
+        header = f"文件 '{filepath}' 共 {index.line_count} 行，{index.size / 1024:.1f} KB"
+        if not index.headings:
+            return header + "，没有 Markdown 标题，请使用 read_note_range 按行读取。"
+        lines = [header + f"，包含 {len(index.headings)} 个标题："]
+        budget = NOTE_READ_MAX_BYTES
+        for i, (level, title, _) in enumerate(index.headings):
+            if level > max_level:
+                continue
+            start, end = index.section_lines(i)
+            size_kb = (index.line_to_byte(end + 1) - index.line_to_byte(start)) / 1024
+            line = f"{'  ' * (level - 1)}[{i + 1}] {'#' * level} {title} (第 {start}-{end} 行, {size_kb:.1f} KB)"
+            budget -= len(line.encode('utf-8')) + 1
+            if budget < 0:
+                lines.append(f"(大纲过长，已截断于第 [{i + 1}] 个标题；可设置 max_level 只看高层级标题)")
+                break
+            lines.append(line)
+        return "\n".join(lines)
+    except Exception as e:
+        return f"读取文件时发生底层系统错误：{str(e)}"
+
+
+def read_note_section(filepath: str, section: str) -> str:
+    """
+    核心技能：按章节读取笔记。section 可以是大纲中的编号 (如 "3")，也可以是标题文字。
+    """
+    try:
+        path, error = check_note_path(filepath)
+        if error:
+            return error
+        index = get_note_index(path)
+        section = str(section).strip()
+        target = None
+        if section.isdigit() and 1 <= int(section) <= len(index.headings):
+            target = int(section) - 1
+        else:
+            titles = [title for _, title, _ in index.headings]
+            if section in titles:
+                target = titles.index(section)
+            else:
+                matches = [i for i, title in enumerate(titles) if section and section in title]
+                target = matches[0] if matches else None
+        if target is None:
+            return f"执行失败：文件 '{filepath}' 中没有找到章节 '{section}'，请先调用 read_note_outline 查看大纲。"
+
+        level, title, _ = index.headings[target]
+        start, end = index.section_lines(target)
+        text, last, next_line, cut_at = read_lines(path, index, start, end)
+        return (f"文件 '{filepath}' 第 [{target + 1}] 节「{title}」(第 {start}-{last} 行)：\n\n{text}"
+                + _continue_hint(next_line if next_line and next_line <= end else None, cut_at, last))
+    except UnicodeDecodeError:
+        return f"执行失败：文件 '{filepath}' 不是标准的 UTF-8 文本编码，无法读取。"
+    except Exception as e:
+        return f"读取文件时发生底层系统错误：{str(e)}"
+
+
+def read_note_range(filepath: str, start: int = 1, end: int = 0, unit: str = "line") -> str:
+    """
+    核心技能：按范围读取笔记。
+    unit="line" 时读取第 start 到第 end 行 (从 1 计，含两端，end=0 表示到文件末尾)；
+    unit="byte" 时读取字节区间 [start, end) (从 0 计)，会自动对齐到完整的 UTF-8 字符。
+    单次返回内容有上限，超出时会提示从哪里继续。
+    """
+    try:
+        path, error = check_note_path(filepath)
+        if error:
+            return error
+        index = get_note_index(path)
+        if unit == "byte":
+            end = index.size if end <= 0 else min(end, index.size)
+            if start < 0 or start >= end:
+                return f"执行失败：字节范围无效，文件大小为 {index.size} 字节。"
+            end = min(end, start + NOTE_READ_MAX_BYTES)
+            with open_note_buffer(path, index.size) as buf:
+                lo = _align_utf8(buf, start, index.size)
+                hi = _align_utf8(buf, end, index.size)
+                text = bytes(buf[lo:hi]).decode('utf-8')
+            hint = f"\n\n(未读完，设置 start={hi} 继续读取)" if hi < index.size else ""
+            return f"文件 '{filepath}' 第 {lo}-{hi} 字节：\n\n{text}{hint}"
+        if unit != "line":
+            return "执行失败：unit 只能是 line 或 byte。"
+
+        end = index.line_count if end <= 0 else end
+        if start < 1 or start > index.line_count:
+            return f"执行失败：行号超出范围，文件共 {index.line_count} 行。"
+        text, last, next_line, cut_at = read_lines(path, index, start, end)
+        return (f"文件 '{filepath}' 第 {start}-{last} 行 (共 {index.line_count} 行)：\n\n{text}"
+                + _continue_hint(next_line, cut_at, last))
+    except UnicodeDecodeError:
+        return f"执行失败：文件 '{filepath}' 不是标准的 UTF-8 文本编码，无法读取。"
+    except Exception as e:
+        return f"读取文件时发生底层系统错误：{str(e)}"
@@ -0,0 +1,77 @@
+"""
+DeepContext 笔记目录扫描模块
+基于 os.scandir 的递归扫描器：直接复用目录项自带的类型信息 (无需逐个 stat)，
+按路径字典序流式产出结果，支持深度限制、通配符过滤和基于游标的分页
+"""
+
+import fnmatch
+import os
+
+CURSOR_SEP = "/"
+
+
+def _parse_cursor(cursor: str):
+    """游标是上一页最后一项的相对路径 (用 / 分隔)，转成路径分量元组便于比较"""
+    if not cursor:
+        return None
+    return tuple(part for part in cursor.split(CURSOR_SEP) if part)
+
+
+def iter_markdown_files(root: str, max_depth: int = -1, pattern: str = "*.md", after: str = "",
+                        include_hidden: bool = False):
+    """
+    递归遍历 root 下的 Markdown 文件，产出 (相对路径分量元组, os.DirEntry)。
+
+    - 产出顺序等价于按路径分量字典序排序，因此可以用 after 游标从上次的位置继续，
+      游标之前的整棵子目录会被直接跳过，不会重复扫描
+    - max_depth: 0 只看 root 本身，-1 表示不限深度
+    - pattern: 文件名通配符；包含 / 时按相对路径匹配
+    - 默认跳过以 . 开头的隐藏目录和文件 (如 .git / .obsidian)，不跟随目录软链接
+    """
+    match_path = CURSOR_SEP in pattern
+    after_parts = _parse_cursor(after)
+
+    def walk(directory, prefix, depth, after_parts):
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            return
+        for entry in entries:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
+            parts = prefix + (name,)
+            child_after = None
+            if after_parts is not None:
+                if parts == after_parts[:len(parts)]:
+                    # 位于游标路径上：文件就是游标本身 (跳过)，目录需要进去继续比较
+                    child_after = after_parts
+                    if len(parts) == len(after_parts):
+                        continue
+                elif parts < after_parts:
+                    continue
+            if entry.is_dir(follow_symlinks=False):
+                if max_depth < 0 or depth < max_depth:
+                    yield from walk(entry.path, parts, depth + 1, child_after)
+            elif name.endswith(".md") and entry.is_file():
+                target = CURSOR_SEP.join(parts) if match_path else name
+                if fnmatch.fnmatch(target, pattern):
+                    yield parts, entry
+
+    yield from walk(root, (), 0, after_parts)
+
+
+def scan_page(root: str, page_size: int, cursor: str = "", max_depth: int = -1, pattern: str = "*.md"):
+    """
+    取一页扫描结果，返回 (相对路径列表, 下一页游标)；没有更多结果时游标为空字符串。
+    只多看一项来判断是否还有下一页，不会为了统计总数而扫完整个目录。
+    """
+    paths = []
+    has_more = False
+    for parts, _ in iter_markdown_files(root, max_depth, pattern, cursor):
+        if len(paths) == page_size:
+            has_more = True
+            break
+        paths.append(CURSOR_SEP.join(parts))
+    return paths, (paths[-1] if has_more else "")
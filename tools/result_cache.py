@@ -0,0 +1,146 @@
+"""
+DeepContext 工具结果缓存模块
+为只读工具缓存完整的返回文本，LRU 淘汰，同时限制条目数和总字节数。
+缓存键自带版本信息，数据变化后旧条目自然不再命中，无需主动清理：
+  - 笔记读取：文件绝对路径 + mtime_ns + size
+  - 数据库查询：规范化后的 SQL + 数据库版本 (本进程的写入代数 + PRAGMA data_version，
+    其他进程对同一个数据库的写入也能发现)
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from config import TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_MAX_BYTES
+from database.connection import get_db_version, get_write_generation
+
+# 引号内的字符串字面量 / 标识符保持原样，其余部分规范化
+_SQL_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])""")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """去掉首尾空白和末尾分号，合并连续空白，引号外的关键字和标识符统一小写 (SQLite 对它们不区分大小写)"""
+    parts = _SQL_QUOTED.split(sql.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(" ", parts[i]).lower()
+    return "".join(parts)
+
+
+class ResultCache:
+    """线程安全的 LRU 缓存，按条目数和值的 UTF-8 字节数双重限制"""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, max_bytes: int = TOOL_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {}               # 命名空间 -> {"hits", "misses"}
+        self.evictions = 0
+
+    def _count(self, namespace: str, field: str):
+        stats = self._stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        stats[field] += 1
+
+    def get(self, key):
+        """命中时返回缓存的值并移到最近使用端，否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            self._count(key[0], "misses" if entry is None else "hits")
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {name: dict(s) for name, s in self._stats.items()}
+            hits = sum(s["hits"] for s in namespaces.values())
+            misses = sum(s["misses"] for s in namespaces.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "evictions": self.evictions,
+                "write_generation": get_write_generation(),
+                "data_version": get_db_version()[1],
+                "tools": namespaces,
+            }
+
+
+_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    return _cache
+
+
+def note_key(namespace: str, filepath: str, *args):
+    """笔记读取类工具的缓存键；文件不存在时返回 None (不缓存，交给工具本身返回错误信息)"""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (namespace, os.path.realpath(filepath), st.st_mtime_ns, st.st_size) + args
+
+
+def db_key(namespace: str, *args):
+    """数据库查询类工具的缓存键，带上当前数据库版本 (其他进程的写入也会让旧条目失效)"""
+    return (namespace, get_db_version()) + args
+
+
+def cached_call(key, fn, cacheable=None, cache: ResultCache = None) -> str:
+    """
+    命中缓存直接返回，否则调用 fn() 并把结果放入缓存 (默认使用进程级共享缓存)。
+    key 为 None 时不使用缓存；cacheable(结果) 返回 False 的结果 (如临时性错误) 不缓存。
+    """
+    if key is None:
+        return fn()
+    cache = cache or _cache
+    result = cache.get(key)
+    if result is not None:
+        return result
+    result = fn()
+    if isinstance(result, str) and (cacheable is None or cacheable(result)):
+        cache.put(key, result)
+    return result
+
+
+async def cached_call_async(key, fn, cacheable=None, cache: ResultCache = None) -> str:
+    """cached_call 的异步版本：fn() 返回 awaitable；命中缓存时直接返回，不进入线程池"""
+    if key is None:
+        return await fn()
+    cache = cache or _cache
+    result = cache.get(key)
+    if result is not None:
+        return result
+    result = await fn()
+    if isinstance(result, str) and (cacheable is None or cacheable(result)):
+        cache.put(key, result)
+    return result
@@ -0,0 +1,57 @@
+"""
+DeepContext 全文检索工具模块
+在三元组和笔记分块上做 BM25 排序的关键词检索，结果附带摘要和来源文件
+"""
+
+from config import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
+from database.text_search import search_triplets, search_note_chunks
+from database.tokenizer import query_terms
+
+SCOPES = ("all", "triplets", "notes")
+_SNIPPET_BEFORE = 30
+_SNIPPET_AFTER = 90
+
+
+def make_snippet(content: str, terms) -> str:
+    """在原文中定位第一个命中的检索词，截取前后一段并用【】标出命中位置"""
+    lowered = content.lower()
+    hits = [(lowered.find(t.lower()), t) for t in terms]
+    hits = [(pos, t) for pos, t in hits if pos >= 0]
+    if not hits:
+        snippet = content[:_SNIPPET_BEFORE + _SNIPPET_AFTER]
+        return snippet.replace("\n", " ") + ("…" if len(content) > len(snippet) else "")
+    pos, term = min(hits)
+    start = max(0, pos - _SNIPPET_BEFORE)
+    end = min(len(content), pos + len(term) + _SNIPPET_AFTER)
+    snippet = (content[start:pos] + "【" + content[pos:pos + len(term)] + "】" + content[pos + len(term):end])
+    snippet = snippet.replace("\n", " ")
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+
+
+def search(query: str, scope: str = "all", limit: int = SEARCH_DEFAULT_LIMIT) -> str:
+    """
+    核心技能：全文检索知识图谱三元组和笔记内容，按相关度 (BM25) 排序，支持中文。
+    scope: all (默认) / triplets (只搜三元组) / notes (只搜笔记正文)
+    """
+    try:
+        if scope not in SCOPES:
+            return f"执行失败：scope 只能是 {' / '.join(SCOPES)}。"
+        terms = query_terms(query)
+        if not terms:
+            return "执行失败：查询中没有可检索的关键词。"
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+        lines = []
+        if scope in ("all", "triplets"):
+            for _, source, relation, target, source_file, _ in search_triplets(query, limit):
+                lines.append(f"[三元组] ({source}) -[{relation}]-> ({target})  来源: {source_file}")
+        if scope in ("all", "notes"):
+            for source_file, heading, start, end, content, _ in search_note_chunks(query, limit):
+                title = f"「{heading}」" if heading else ""
+                lines.append(f"[笔记] {source_file} 第 {start}-{end} 行{title}：{make_snippet(content, terms)}")
+
+        if not lines:
+            return f"没有找到与 '{query}' 相关的三元组或笔记内容。"
+        return f"检索 '{query}' 共找到 {len(lines)} 条结果 (按相关度排序)：\n" + "\n".join(lines)
+    except Exception as e:
+        return f"全文检索时发生底层错误：{str(e)}"
\ No newline at end of file
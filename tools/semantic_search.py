@@ -0,0 +1,204 @@
+"""
+DeepContext 语义检索模块
+为实体名和笔记分块维护本地向量索引 (哈希向量化 + NumPy 向量存储)，按相似度检索，
+不要求大模型写出实体的准确拼写。
+向量文件保存在数据库旁的 <DB_PATH>.vectors/ 目录，首次使用时加载或全量构建，
+之后每次检索前按 vector_changes 日志的 seq 水位增量同步 (新增 / 改名 / 删除)。
+"""
+
+import threading
+
+from config import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, VECTOR_DTYPE
+from database.connection import get_manager
+from database.embedding import HashingEmbedder
+from database.tokenizer import query_terms
+from database.vector_store import VectorStore
+from tools.search_tools import make_snippet
+
+SCOPES = ("all", "entities", "notes")
+
+# 集合名 -> (vector_changes.kind, 全量读取的 SQL, 按 id 读取文本的 SQL)
+_COLLECTIONS = {
+    "entities": ("entity",
+                 "SELECT id, name FROM entities",
+                 "SELECT id, name FROM entities WHERE id IN ({})"),
+    "notes": ("chunk",
+              "SELECT id, heading || char(10) || content FROM note_chunks",
+              "SELECT id, heading || char(10) || content FROM note_chunks WHERE id IN ({})"),
+}
+_BATCH = 4096
+_IN_BATCH = 500
+_MIN_SCORE = 0.2       # 低于该相似度的结果基本只是碰巧共享一两个字或哈希冲突，不返回
+
+
+class SemanticIndex:
+    """
+    实体和笔记分块的向量索引
+
+    同步 (refresh) 在锁内串行执行；检索只读取向量数组的快照，不持锁。
+    同一个向量目录只应由一个进程 (通常是 Server) 维护。
+    """
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.RLock()
+        self._db_path = None
+        self.stores = {}
+
+    def _expected_meta(self) -> dict:
+        return {"embedder": self.embedder.name}
+
+    def refresh(self):
+        """加载 / 全量构建向量文件，再应用 vector_changes 中的新日志"""
+        manager = get_manager()
+        with self._lock:
+            if manager.db_path != self._db_path:
+                directory = f"{manager.db_path}.vectors"
+                self.stores = {name: VectorStore(directory, name, self.embedder.dim, VECTOR_DTYPE)
+                               for name in _COLLECTIONS}
+                with manager.reader() as conn:
+                    last_seq = _last_seq(conn)
+                for name, store in self.stores.items():
+                    # 水位比数据库里的序号还大，说明数据库被替换过，向量文件作废
+                    if not store.load(self._expected_meta()) or store.meta.get("seq", 0) > last_seq:
+                        self._rebuild(name, store)
+                self._db_path = manager.db_path
+            self._apply_changes()
+            for store in self.stores.values():
+                if store.uses_ann() and not store.has_ann:
+                    store.build_ann()
+                    store.save()
+
+    def _rebuild(self, name: str, store: VectorStore):
+        """在一个读事务里取日志水位并读出全部文本，保证快照与水位一致"""
+        store.reset(self._expected_meta())
+        with get_manager().reader() as conn:
+            conn.execute("BEGIN")
+            try:
+                seq = _last_seq(conn)
+                cursor = conn.execute(_COLLECTIONS[name][1])
+                while rows := cursor.fetchmany(_BATCH):
+                    store.add([r[0] for r in rows], self.embedder.embed(r[1] for r in rows))
+            finally:
+                conn.execute("COMMIT")
+        store.meta["seq"] = seq
+        store.save()
+
+    def _apply_changes(self):
+        """
+        把日志中的变化应用到各集合：涉及的 id 先全部删除，仍然存在的再按当前文本重新向量化。
+        这样重复应用同一段日志也不会产生重复向量。
+        日志由写入端的触发器限长 (见 schema v7)，水位之后的日志已被清理的集合全量重建；
+        同步过程只读数据库。
+        """
+        while True:
+            stale = self._apply_log()
+            if not stale:
+                return
+            for name in stale:
+                self._rebuild(name, self.stores[name])
+
+    def _apply_log(self) -> list:
+        """按水位逐批应用日志；遇到日志空缺时停下，返回需要全量重建的集合名"""
+        seq = min(store.meta.get("seq", 0) for store in self.stores.values())
+        with get_manager().reader() as conn:
+            while True:
+                conn.execute("BEGIN")
+                try:
+                    rows = conn.execute(
+                        "SELECT seq, kind, item_id FROM vector_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (seq, _BATCH),
+                    ).fetchall()
+                    first = rows[0][0] if rows else _last_seq(conn) + 1
+                finally:
+                    conn.execute("COMMIT")
+                # seq 连续递增，水位与日志中最早的一条之间有空缺，说明中间的日志已被清理
+                stale = [name for name, store in self.stores.items() if store.meta.get("seq", 0) < first - 1]
+                if stale or not rows:
+                    return stale
+                seq = rows[-1][0]
+                for name, store in self.stores.items():
+                    kind, _, fetch_sql = _COLLECTIONS[name]
+                    touched = sorted({item_id for row_seq, row_kind, item_id in rows
+                                      if row_kind == kind and row_seq > store.meta.get("seq", 0)})
+                    if touched:
+                        store.delete(touched)
+                        for i in range(0, len(touched), _IN_BATCH):
+                            chunk = touched[i:i + _IN_BATCH]
+                            found = conn.execute(fetch_sql.format(",".join("?" * len(chunk))), chunk).fetchall()
+                            store.add([r[0] for r in found], self.embedder.embed(r[1] for r in found))
+                    store.meta["seq"] = seq
+                    store.save()
+
+
+def _last_seq(conn) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'vector_changes'").fetchone()
+    return row[0] if row else 0
+
+
+_index = SemanticIndex()
+
+
+def get_semantic_index() -> SemanticIndex:
+    """获取进程级共享的语义索引 (已同步到数据库最新状态)"""
+    _index.refresh()
+    return _index
+
+
+def _fetch_by_ids(sql: str, ids: list) -> dict:
+    if not ids:
+        return {}
+    with get_manager().reader() as conn:
+        return {row[0]: row[1:] for row in conn.execute(sql.format(",".join("?" * len(ids))), ids)}
+
+
+def semantic_search(query: str, scope: str = "all", limit: int = SEARCH_DEFAULT_LIMIT) -> str:
+    """
+    核心技能：按语义相似度检索实体名和笔记分块，不要求拼写与图谱中完全一致。
+    scope: all (默认) / entities (只搜实体) / notes (只搜笔记正文)
+    """
+    try:
+        if scope not in SCOPES:
+            return f"执行失败：scope 只能是 {' / '.join(SCOPES)}。"
+        if not query_terms(query):
+            return "执行失败：查询中没有可检索的文字。"
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        index = get_semantic_index()
+        vector = index.embedder.embed([query])[0]
+
+        lines = []
+        if scope in ("all", "entities"):
+            hits = [(i, s) for i, s in index.stores["entities"].search(vector, limit) if s >= _MIN_SCORE]
+            entities = _fetch_by_ids(
+                '''
+                SELECT e.id, e.name,
+                       (SELECT COUNT(*) FROM triplets WHERE source_id = e.id) +
+                       (SELECT COUNT(*) FROM triplets WHERE target_id = e.id)
+                FROM entities e WHERE e.id IN ({})
+                ''',
+                [i for i, _ in hits],
+            )
+            for entity_id, score in hits:
+                if entities.get(entity_id, (None, 0))[1]:  # 三元组都被清理掉的孤立实体不再返回
+                    name, degree = entities[entity_id]
+                    lines.append(f"[实体] {name}  相似度 {score:.2f}，出现在 {degree} 条三元组中")
+        if scope in ("all", "notes"):
+            hits = [(i, s) for i, s in index.stores["notes"].search(vector, limit) if s >= _MIN_SCORE]
+            chunks = _fetch_by_ids(
+                "SELECT id, source_file, heading, start_line, end_line, content FROM note_chunks WHERE id IN ({})",
+                [i for i, _ in hits],
+            )
+            terms = query_terms(query)
+            for chunk_id, score in hits:
+                if chunk_id in chunks:
+                    source_file, heading, start, end, content = chunks[chunk_id]
+                    title = f"「{heading}」" if heading else ""
+                    lines.append(f"[笔记] {source_file} 第 {start}-{end} 行{title}  相似度 {score:.2f}："
+                                 f"{make_snippet(content, terms)}")
+
+        if not lines:
+            return f"没有找到与 '{query}' 语义相近的实体或笔记内容。"
+        hint = "\n实体名可直接用于 query_knowledge_graph 的等值条件或图遍历工具。" if lines[0].startswith("[实体]") else ""
+        return f"语义检索 '{query}' 共找到 {len(lines)} 条结果 (按相似度排序)：\n" + "\n".join(lines) + hint
+    except Exception as e:
+        return f"语义检索时发生底层错误：{str(e)}"
@@ -0,0 +1,337 @@
+"""
+DeepContext 结构化追踪与日志
+记录 Agent 运行中各环节的 span (开始时间、耗时、属性、父子关系)，用来判断一次慢运行的时间花在了哪里：
+
+  agent.query     一个问题的完整运行
+  agent.turn      一轮 ReAct 循环 (大模型调用 + 本轮工具执行)
+  llm.call        一次大模型调用 (token 用量、缓存命中、重试次数、首 token 延迟)
+  mcp.call_tool   客户端一次工具调用的往返 (含 stdio / HTTP 传输)
+  tool.run        Server 端工具的执行 (排队时间、结果缓存命中)
+  sql.query       SQL 查询的执行 (返回行数)
+  sql.insert      三元组写入 (写入行数)
+
+span 的父子关系通过 contextvars 传递 (asyncio 任务和线程池中都能继承)；
+客户端通过 MCP 请求的 _meta.traceparent (W3C 格式) 把 trace 传给 Server，两边的 span 属于同一个 trace。
+TRACE_EXPORT 为 jsonl 时每行一个 span，为 otlp 时每行一批 OpenTelemetry OTLP/JSON (ExportTraceServiceRequest)，
+客户端和 stdio 子进程 Server 追加写同一个文件；python main.py --mode trace-summary 按 span 类型汇总 p50 / p95。
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from config import LOG_LEVEL, TRACE_EXPORT, TRACE_PATH, TRACE_FLUSH_SPANS
+
+EXPORT_FORMATS = ("off", "jsonl", "otlp")
+
+# OpenTelemetry SpanKind：大模型调用和工具调用往返是客户端，Server 端的工具执行是服务端，其余为内部
+_SPAN_KINDS = {"llm.call": 3, "mcp.call_tool": 3, "tool.run": 2}
+
+_current = contextvars.ContextVar("deepcontext_span", default=None)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """项目内的日志统一挂在 deepcontext 下，级别由 LOG_LEVEL 控制，不影响第三方库的日志"""
+    return logging.getLogger(f"deepcontext.{name}")
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """输出到标准错误 (stdio 模式下标准输出是 MCP 的传输通道)，只保留消息本身；重复调用只更新级别"""
+    logger = logging.getLogger("deepcontext")
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+class Span:
+    """一个已开始的 span；set() 追加属性"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "local_root", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id, local_root: bool, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.local_root = local_root
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan:
+    """追踪关闭时使用：所有操作都是空操作"""
+
+    traceparent = None
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _NoopContext:
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_CONTEXT = _NoopContext()
+
+
+def parse_traceparent(value):
+    """解析 W3C traceparent，返回 (trace_id, parent_span_id)；格式不对时返回 None"""
+    parts = value.split("-") if isinstance(value, str) else ()
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+class _SpanContext:
+    def __init__(self, tracer, name: str, remote_parent, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.remote_parent = remote_parent
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        parent = _current.get()
+        remote = parse_traceparent(self.remote_parent) if parent is None and self.remote_parent else None
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif remote is not None:
+            trace_id, parent_id = remote
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        self.span = Span(self.name, trace_id, parent_id, parent is None, self.attributes)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self.token)
+        self.tracer.export(span)
+        return False
+
+
+class Tracer:
+    """
+    span 的创建与导出
+
+    export 为 off 时 span() 直接返回空操作的上下文，几乎没有开销。
+    结束的 span 先放进缓冲区，攒够 TRACE_FLUSH_SPANS 个、或者本进程内的根 span 结束时，一次性追加到文件。
+    """
+
+    def __init__(self, export: str = TRACE_EXPORT, path: str = TRACE_PATH, service: str = "deepcontext"):
+        if export not in EXPORT_FORMATS:
+            raise ValueError(f"追踪导出格式只能是 {' / '.join(EXPORT_FORMATS)}，收到 {export!r}")
+        self.export_format = export
+        self.enabled = export != "off"
+        self.path = path
+        self.service = service
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, remote_parent: str = None, **attributes):
+        """开始一个 span：with tracer.span("sql.query", rows=0) as span: ...；remote_parent 为对端传来的 traceparent"""
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        return _SpanContext(self, name, remote_parent, attributes)
+
+    def export(self, span: Span):
+        with self._lock:
+            self._buffer.append(span)
+            if span.local_root or len(self._buffer) >= TRACE_FLUSH_SPANS:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        if self.export_format == "otlp":
+            text = json.dumps(self._otlp(spans), ensure_ascii=False) + "\n"
+        else:
+            text = "".join(json.dumps(self._flat(span), ensure_ascii=False) + "\n" for span in spans)
+        # 一次 write 追加整批，多个进程写同一个文件时行不会交错
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    def _flat(self, span: Span) -> dict:
+        return {
+            "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+            "name": span.name, "service": self.service,
+            "start": span.start_ns / 1e9, "duration_ms": round(span.duration_ms, 3),
+            "status": "error" if span.error else "ok", "error": span.error,
+            "attributes": span.attributes,
+        }
+
+    def _otlp(self, spans) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service)]},
+            "scopeSpans": [{"scope": {"name": "deepcontext"}, "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": _SPAN_KINDS.get(span.name, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items() if v is not None],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            } for span in spans]}],
+        }]}
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for field in ("doubleValue", "boolValue", "stringValue"):
+        if field in value:
+            return value[field]
+    return None
+
+
+_tracer = Tracer()
+atexit.register(lambda: _tracer.flush())
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def init_tracer(export: str = TRACE_EXPORT, path: str = TRACE_PATH, service: str = "deepcontext") -> Tracer:
+    """按命令行参数重建进程级的追踪器 (先写出旧追踪器缓冲的 span)"""
+    global _tracer
+    _tracer.flush()
+    _tracer = Tracer(export, path, service)
+    return _tracer
+
+
+def span(name: str, remote_parent: str = None, **attributes):
+    """使用进程级追踪器开始一个 span"""
+    return _tracer.span(name, remote_parent, **attributes)
+
+
+def current_span():
+    """当前上下文中的 span (没有时返回空操作对象)，用于给外层 span 补充属性"""
+    return _current.get() or _NOOP_SPAN
+
+
+# ==========================================================
+# 汇总：python main.py --mode trace-summary
+# ==========================================================
+
+def load_spans(path: str = TRACE_PATH) -> list:
+    """读取追踪文件 (jsonl 与 otlp 两种格式可以混在同一个文件中)，返回扁平的 span 列表"""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "resourceSpans" not in record:
+                spans.append(record)
+                continue
+            for resource in record["resourceSpans"]:
+                service = next((_otlp_value(a["value"]) for a in resource.get("resource", {}).get("attributes", ())
+                                if a["key"] == "service.name"), "")
+                for scope in resource.get("scopeSpans", ()):
+                    for item in scope.get("spans", ()):
+                        status = item.get("status", {})
+                        spans.append({
+                            "trace_id": item["traceId"], "span_id": item["spanId"],
+                            "parent_id": item.get("parentSpanId") or None,
+                            "name": item["name"], "service": service,
+                            "start": int(item["startTimeUnixNano"]) / 1e9,
+                            "duration_ms": (int(item["endTimeUnixNano"]) - int(item["startTimeUnixNano"])) / 1e6,
+                            "status": "error" if status.get("code") == 2 else "ok",
+                            "error": status.get("message"),
+                            "attributes": {a["key"]: _otlp_value(a["value"]) for a in item.get("attributes", ())},
+                        })
+    return spans
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize_spans(spans) -> list:
+    """按 span 类型 (工具相关的 span 再按工具名) 汇总次数、错误数、p50 / p95 / 最大耗时和总耗时"""
+    groups = {}
+    for record in spans:
+        groups.setdefault(record["name"], []).append(record)
+        tool = record.get("attributes", {}).get("tool")
+        if tool:
+            groups.setdefault(f"{record['name']} {tool}", []).append(record)
+    rows = []
+    for name in sorted(groups):
+        records = groups[name]
+        durations = sorted(r["duration_ms"] for r in records)
+        rows.append({
+            "span": name if " " not in name else "  " + name.split(" ", 1)[1],
+            "count": len(records),
+            "errors": sum(r["status"] == "error" for r in records),
+            "p50 ms": _percentile(durations, 50),
+            "p95 ms": _percentile(durations, 95),
+            "max ms": durations[-1],
+            "total s": sum(durations) / 1000,
+        })
+    return rows
+
+
+def format_summary(rows) -> str:
+    if not rows:
+        return "追踪文件中没有 span。"
+    columns = list(rows[0])
+    cells = [[f"{v:.1f}" if isinstance(v, float) else str(v) for v in row.values()] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = [" | ".join(c.ljust(w) for c, w in zip(columns, widths)),
+             "-+-".join("-" * w for w in widths)]
+    lines += [" | ".join(v.ljust(w) for v, w in zip(r, widths)) for r in cells]
+    return "\n".join(lines)